@@ -566,7 +566,7 @@ class AugmentedAssignIcon(icon.Icon):
         bodyWidth, bodyHeight = self.bodySize
         valueListLayouts = self.valuesList.calcLayouts(argRequired=True)
         targetIcon = self.sites.targetIcon.att
-        tgtLayouts = [None] if targetIcon is None else targetIcon.calcLayouts()
+        tgtLayouts = [None] if targetIcon is None else targetIcon.calcLayoutsCached()
         layouts = []
         for valueListLayout, tgtLayout in iconlayout.allCombinations(
                 (valueListLayouts, tgtLayouts)):
@@ -476,7 +476,7 @@ class WhileIcon(icon.Icon):
     def calcLayouts(self):
         width, height = self.bodySize
         condIcon = self.sites.condIcon.att
-        condLayouts = [None] if condIcon is None else condIcon.calcLayouts()
+        condLayouts = [None] if condIcon is None else condIcon.calcLayoutsCached()
         layouts = []
         for condLayout in condLayouts:
             layout = iconlayout.Layout(self, width, height+2, height // 2)
@@ -1016,7 +1016,7 @@ class IfIcon(icon.Icon):
     def calcLayouts(self):
         width, height = self.bodySize
         condIcon = self.sites.condIcon.att
-        condLayouts = [None] if condIcon is None else condIcon.calcLayouts()
+        condLayouts = [None] if condIcon is None else condIcon.calcLayoutsCached()
         layouts = []
         for condLayout in condLayouts:
             layout = iconlayout.Layout(self, width, height + icon.BLOCK_SEQ_MARGIN,
@@ -1168,7 +1168,7 @@ class ElifIcon(icon.Icon):
     def calcLayouts(self):
         width, height = self.bodySize
         condIcon = self.sites.condIcon.att
-        condLayouts = [None] if condIcon is None else condIcon.calcLayouts()
+        condLayouts = [None] if condIcon is None else condIcon.calcLayoutsCached()
         layouts = []
         for condLayout in condLayouts:
             layout = iconlayout.Layout(self, width, height, height // 2)
@@ -1450,7 +1450,7 @@ class ExceptIcon(icon.Icon):
     def calcLayouts(self):
         width, height = self.bodySize
         typeIcon = self.sites.typeIcon.att
-        condLayouts = [None] if typeIcon is None else typeIcon.calcLayouts()
+        condLayouts = [None] if typeIcon is None else typeIcon.calcLayoutsCached()
         layouts = []
         for condLayout in condLayouts:
             layout = iconlayout.Layout(self, width, height, height // 2)
@@ -2074,12 +2074,12 @@ class DefOrClassIcon(icon.Icon):
         bodyWidth, bodyHeight = self.bodySize
         argListLayouts = self.argList.calcLayouts() if self.hasArgs else [None]
         nameIcon = self.sites.nameIcon.att
-        nameLayouts = [None] if nameIcon is None else nameIcon.calcLayouts()
+        nameLayouts = [None] if nameIcon is None else nameIcon.calcLayoutsCached()
         nameXOff = bodyWidth - 1
         cntrYOff = bodyHeight // 2
         layouts = []
         if self.hasSite('returnType') and self.childAt('returnType') is not None:
-            returnTypeLayouts = self.childAt('returnType').calcLayouts()
+            returnTypeLayouts = self.childAt('returnType').calcLayoutsCached()
             layoutsIn = nameLayouts, argListLayouts, returnTypeLayouts
         else:
             layoutsIn = nameLayouts, argListLayouts, [None]
@@ -2759,7 +2759,7 @@ class LambdaIcon(icon.Icon):
         bodyWidth, bodyHeight = self.bodySize
         argListLayouts = self.argList.calcLayouts()
         exprIcon = self.sites.exprIcon.att
-        exprLayouts = [None] if exprIcon is None else exprIcon.calcLayouts()
+        exprLayouts = [None] if exprIcon is None else exprIcon.calcLayoutsCached()
         cntrYOff = bodyHeight // 2
         layouts = []
         for argListLayout, exprLayout in iconlayout.allCombinations(
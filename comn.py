@@ -1,6 +1,8 @@
 # Copyright Mark Edel  All rights reserved
 # Constants and low-level utility functions used across modules
 from PIL import Image
+import collections
+import threading
 
 # Number of pixels to indent a code block
 BLOCK_INDENT = 24
@@ -12,6 +14,16 @@ OUTLINE_COLOR = (255, 255, 255, 1)
 
 ICON_BG_COLOR = (255, 255, 255, 255)
 
+# Maximum number of separate rectangles that a DamageRects region will hold before it
+# starts merging them regardless of cost.
+DAMAGE_MAX_RECTS = 8
+
+# Estimated fixed cost (expressed in square pixels of redraw area) of redrawing a
+# separate rectangle (searching for icons, clearing, and transferring it to the display),
+# used by DamageRects to decide when merging two rectangles is cheaper than keeping them
+# separate.
+DAMAGE_RECT_OVERHEAD = 64 * 64
+
 def asciiToImage(asciiPixmap, tint=None):
     if asciiToImage.asciiMap is None:
         asciiToImage.asciiMap = {'.':(0, 0, 0, 0), 'o': OUTLINE_COLOR,
@@ -70,6 +82,16 @@ def combineRects(rect1, rect2):
     l2, t2, r2, b2 = rect2
     return min(l1, l2), min(t1, t2), max(r1, r2), max(b1, b2)
 
+def clipRect(rect, clip):
+    """Return the portion of rect lying within the rectangle, clip, or None if rect lies
+    entirely outside of it"""
+    l1, t1, r1, b1 = rect
+    l2, t2, r2, b2 = clip
+    l, t, r, b = max(l1, l2), max(t1, t2), min(r1, r2), min(b1, b2)
+    if l > r or t > b:
+        return None
+    return l, t, r, b
+
 class AccumRects:
     """Make one big rectangle out of all rectangles added."""
     def __init__(self, initRect=None):
@@ -90,43 +112,221 @@ class AccumRects:
     def clear(self):
         self.rect = None
 
-def findTextOffset(font, text, pixelOffset):
-    # We use proportionally-spaced fonts, but don't have full access to the font
-    # rendering code, so the only tool we have to see how it got laid out is the
-    # font.getsize method, which can only answer the question: "how many pixels long is
-    # this entire string".  Rather than try to measure individual characters and adjust
-    # for kerning and other oddness, this code makes a statistical starting guess and
-    # brutally iterates until it finds the right place.
-    nChars = len(text)
-    if nChars == 0:
-        return 0
-    textLength = font.getsize(text)[0]
-    guessedPos = (nChars * pixelOffset) // textLength
-    lastGuess = None
-    lastGuessDist = textLength
-    while True:
-        pixelOfGuess = font.getsize(text[:guessedPos])[0]
-        guessDist = abs(pixelOfGuess - pixelOffset)
-        if pixelOfGuess > pixelOffset:
-            if lastGuess == '<':
-                return guessedPos if guessDist < lastGuessDist else lastGuessedPos
-            lastGuess = '>'
-            lastGuessDist = guessDist
-            lastGuessedPos = guessedPos
-            guessedPos -= 1
-            if guessedPos <= 0:
-                return 0 if pixelOffset < guessDist else lastGuessedPos
-        elif pixelOfGuess < pixelOffset:
-            if lastGuess == '>':
-                return guessedPos if guessDist < lastGuessDist else lastGuessedPos
-            lastGuess = '<'
-            lastGuessDist = guessDist
-            lastGuessedPos = guessedPos
-            guessedPos += 1
-            if guessedPos >= nChars:
-                return nChars if textLength - pixelOffset < guessDist else lastGuessedPos
+def rectArea(rect):
+    l, t, r, b = rect
+    return (r - l) * (b - t)
+
+class DamageRects:
+    """Accumulate a region to be redrawn as a (small) list of rectangles.  Unlike
+    AccumRects, which makes one big rectangle covering everything added, rectangles are
+    only merged when the merged rectangle is (estimated to be) cheaper to redraw than the
+    two rectangles separately, so that unrelated changes far apart do not force redraw
+    of everything between them.  Beyond DAMAGE_MAX_RECTS rectangles, the pair whose
+    merge adds the least area is merged.  Rectangles or other DamageRects objects can be
+    added.  Like AccumRects, .get() returns a single enclosing rectangle (or None if
+    empty), and the individual rectangles are available in .rects."""
+    def __init__(self, initRect=None):
+        self.rects = []
+        self.add(initRect)
+
+    def add(self, rect):
+        if rect is None:
+            return
+        if isinstance(rect, DamageRects):
+            for r in rect.rects:
+                self.add(r)
+            return
+        # Merge with any existing rectangle where that is cheaper.  Since the merged
+        # rectangle is larger, it may then also merge with others, so keep looking.
+        merged = True
+        while merged:
+            merged = False
+            rectCost = rectArea(rect) + DAMAGE_RECT_OVERHEAD
+            for i, existing in enumerate(self.rects):
+                combined = combineRects(rect, existing)
+                if rectArea(combined) <= rectCost + rectArea(existing):
+                    del self.rects[i]
+                    rect = combined
+                    merged = True
+                    break
+        self.rects.append(rect)
+        if len(self.rects) > DAMAGE_MAX_RECTS:
+            self._mergeCheapestPair()
+
+    def _mergeCheapestPair(self):
+        bestCost = bestPair = None
+        for i in range(len(self.rects)):
+            for j in range(i + 1, len(self.rects)):
+                r1, r2 = self.rects[i], self.rects[j]
+                cost = rectArea(combineRects(r1, r2)) - rectArea(r1) - rectArea(r2)
+                if bestCost is None or cost < bestCost:
+                    bestCost = cost
+                    bestPair = i, j
+        i, j = bestPair
+        combined = combineRects(self.rects[i], self.rects[j])
+        del self.rects[j]
+        del self.rects[i]
+        self.add(combined)
+
+    def get(self):
+        """Return a single rectangle enclosing the entire region.  Returns None if no
+        rectangles were added"""
+        if len(self.rects) == 0:
+            return None
+        rect = self.rects[0]
+        for r in self.rects[1:]:
+            rect = combineRects(rect, r)
+        return rect
+
+    def isEmpty(self):
+        return len(self.rects) == 0
+
+    def clear(self):
+        self.rects = []
+
+class LRUCache:
+    """Cache which, when full, discards its least recently used entries to make room for
+    new ones.  The cache can be limited by number of entries (maxEntries), and/or by an
+    estimate of the memory it occupies (maxBytes), in which case sizeOf must be provided:
+    a function taking a key and value and returning the number of bytes to charge for the
+    entry.  Counts hits, misses, and evictions, so the limits can be tuned (see stats).
+    Lookups and insertions are serialized with a lock, so the cache can be shared with
+    the worker threads of a parallel redraw (see Window.redraw in python_g.py)."""
+    def __init__(self, maxEntries=None, maxBytes=None, sizeOf=None):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.sizeOf = sizeOf
+        self.entries = collections.OrderedDict()
+        self.byteCount = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value cached under key (and mark it as most recently used), or
+        default if there is none."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = 0 if self.sizeOf is None else self.sizeOf(key, value)
+        with self.lock:
+            oldEntry = self.entries.pop(key, None)
+            if oldEntry is not None:
+                self.byteCount -= oldEntry[1]
+            self.entries[key] = value, size
+            self.byteCount += size
+            self._evict()
+
+    def setLimits(self, maxEntries=None, maxBytes=None):
+        """Change the limits on the cache size, discarding entries as needed to meet
+        them immediately."""
+        with self.lock:
+            self.maxEntries = maxEntries
+            self.maxBytes = maxBytes
+            self._evict()
+
+    def _evict(self):
+        while len(self.entries) > 0 and (
+                self.maxEntries is not None and len(self.entries) > self.maxEntries or
+                self.maxBytes is not None and self.byteCount > self.maxBytes):
+            _, (_, size) = self.entries.popitem(last=False)
+            self.byteCount -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.byteCount = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        """Return a printable summary of the cache size and counters"""
+        lookups = self.hits + self.misses
+        hitRate = 100.0 * self.hits / lookups if lookups else 0.0
+        entries = f"{len(self.entries)}" if self.maxEntries is None else \
+            f"{len(self.entries)}/{self.maxEntries}"
+        if self.sizeOf is not None:
+            entries += f" entries, {self.byteCount // 1024}KB"
+            if self.maxBytes is not None:
+                entries += f"/{self.maxBytes // 1024}KB"
         else:
-            return guessedPos
+            entries += " entries"
+        return f"{entries}, {self.hits} hits, {self.misses} misses ({hitRate:.1f}% " \
+            f"hit rate), {self.evictions} evictions"
+
+class PrefixWidths:
+    """Pixel widths of the prefixes of a string (text[:i] for i from 0 to len(text)) in
+    a given font.  We use proportionally-spaced fonts, but don't have full access to the
+    font rendering code, so the only tool we have to see how text got laid out is the
+    font.getsize method, which can only answer the question: "how many pixels long is
+    this entire string".  Widths are therefore measured on demand (prefix by prefix), and
+    remembered, so that mapping from pixel offset to character offset is a binary search,
+    and repeated lookups in the same text (clicks and cursor movement in long strings
+    and comments) are mostly answered without measuring anything."""
+    def __init__(self, font, text):
+        self.font = font
+        self.text = text
+        self.widths = [0] + [None] * len(text)
+
+    def width(self, charOffset):
+        """Return the width in pixels of text[:charOffset]"""
+        width = self.widths[charOffset]
+        if width is None:
+            width = self.widths[charOffset] = \
+                self.font.getsize(self.text[:charOffset])[0]
+        return width
+
+    def nearestOffset(self, pixelOffset):
+        """Return the character offset whose position is closest to pixelOffset"""
+        nChars = len(self.text)
+        if nChars == 0 or pixelOffset <= 0:
+            return 0
+        if pixelOffset >= self.width(nChars):
+            return nChars
+        # Binary search for the first prefix at least pixelOffset wide
+        low, high = 1, nChars
+        while low < high:
+            mid = (low + high) // 2
+            if self.width(mid) < pixelOffset:
+                low = mid + 1
+            else:
+                high = mid
+        if self.width(low) - pixelOffset < pixelOffset - self.width(low - 1):
+            return low
+        return low - 1
+
+# Number of (text, font) combinations for which findTextOffset and textPrefixWidth keep
+# measured prefix widths (see PrefixWidths).  Since entries are keyed by the text
+# itself, a change to the text simply starts a new entry, and the old one ages out.
+PREFIX_WIDTH_CACHE_SIZE = 200
+prefixWidthCache = LRUCache(PREFIX_WIDTH_CACHE_SIZE)
+
+def prefixWidths(font, text):
+    """Return the (cached) PrefixWidths object for text in font"""
+    key = text, font
+    widths = prefixWidthCache.get(key)
+    if widths is None:
+        widths = PrefixWidths(font, text)
+        prefixWidthCache.put(key, widths)
+    return widths
+
+def findTextOffset(font, text, pixelOffset):
+    """Return the character offset in text (drawn in font) closest to pixelOffset"""
+    return prefixWidths(font, text).nearestOffset(pixelOffset)
+
+def textPrefixWidth(font, text, charOffset):
+    """Return the width in pixels of text[:charOffset] drawn in font"""
+    return prefixWidths(font, text).width(charOffset)
 
 def splitWords(text):
     """Split the string at the end of whitespace of word boundaries, and return a
@@ -3,7 +3,10 @@
 # rather than icon.py, because it needs to know about many icon types, and icon.py, being
 # the base class for icons, will tie the import system in knots if it tries to import its
 # own subclasses).
-import winsound
+try:
+    import winsound
+except ImportError:
+    winsound = None
 from PIL import Image
 from operator import itemgetter
 from dataclasses import dataclass
@@ -126,6 +129,12 @@ class Cursor:
         self.lastDrawRect = None
         self.blinkState = False
         self.anchorHint = None
+        # Saved images for blinking the cursor in place without touching the window
+        # image: a tuple of the cursor rectangle (content coordinates), the cursor
+        # image, and the window content with and without the cursor, converted for the
+        # display backend.  The window discards them (invalidatePatches) when it
+        # redraws or refreshes the area under the cursor, or scrolls.
+        self.patches = None
 
     def setTo(self, cursorType, ic=None, site=None, pos=None, eraseOld=True,
             drawNew=False, placeEntryText=True):
@@ -507,13 +516,27 @@ class Cursor:
         if cursorImg is None:
             return
         cursorRegion = (x, y, x + cursorImg.width, y + cursorImg.height)
+        if self.patches is None or self.patches[0] != cursorRegion or \
+                self.patches[1] is not cursorImg:
+            imageRegion = self.window.contentToImageRect(cursorRegion)
+            offImg = self.window.image.crop(imageRegion)
+            onImg = offImg.copy()
+            onImg.paste(cursorImg, mask=cursorImg)
+            display = self.window.display
+            self.patches = cursorRegion, cursorImg, display.prepare(onImg), \
+                display.prepare(offImg)
         self.lastDrawRect = cursorRegion
-        cursorRegion = self.window.contentToImageRect(cursorRegion)
-        cursorDrawImg = self.window.image.crop(cursorRegion)
-        cursorDrawImg.paste(cursorImg, mask=cursorImg)
-        self.window.drawImage(cursorDrawImg, cursorRegion[:2])
+        self.window.display.drawPrepared(self.patches[2],
+            self.window.contentToImageCoord(x, y))
         self.blinkState = True
 
+    def invalidatePatches(self, region=None):
+        """Discard the saved images of the window content under the cursor (see draw),
+        if region (content coordinates, or None for the whole window) overlaps them."""
+        if self.patches is not None and (region is None or
+                comn.rectsTouch(region, self.patches[0])):
+            self.patches = None
+
     def _getImgAndPos(self):
         if self.type == "window":
             cursorImg = inputSiteCursorImage
@@ -563,9 +586,14 @@ class Cursor:
             return None, 0, 0
         return cursorImg, x, y
 
-    def drawAndHold(self, holdTime=python_g.CURSOR_BLINK_RATE):
+    def drawAndHold(self, holdTime=None):
         """Redraw cursor and reset the blink timer to keep it visible for a full blink
         cycle (or longer/shorter if holdTime (milliseconds) is explicitly specified)."""
+        # (The default blink rate is looked up at call time, rather than in the
+        # signature, as python_g is only partially initialized when it imports this
+        # module, and the blink code in python_g calls this on every cursor move)
+        if holdTime is None:
+            holdTime = python_g.CURSOR_BLINK_RATE
         self.draw()
         self.window.resetBlinkTimer(holdTime=holdTime)
 
@@ -706,7 +734,11 @@ class Cursor:
 
     def erase(self):
         if self.lastDrawRect is not None and self.window.dragging is None:
-            self.window.refresh(self.lastDrawRect, redraw=False)
+            if self.patches is not None and self.patches[0] == self.lastDrawRect:
+                self.window.display.drawPrepared(self.patches[3],
+                    self.window.contentToImageCoord(*self.lastDrawRect[:2]))
+            else:
+                self.window.refresh(self.lastDrawRect, redraw=False)
             self.lastDrawRect = None
             self.blinkState = False
 
@@ -965,8 +997,10 @@ def tkCharFromEvt(evt):
 def beep():
     # Another platform dependent bit.  tkinter has a .bell() method, but it generates
     # an elaborate sound that's supposed to alert the user of a dialog popping up, which
-    # is not appropriate for the tiny nudge for your keystroke being rejected.
-    winsound.Beep(1500, 120)
+    # is not appropriate for the tiny nudge for your keystroke being rejected.  On
+    # other platforms (without winsound), we just stay quiet.
+    if winsound is not None:
+        winsound.Beep(1500, 120)
 
 def _isTextIcBodySite(ic, siteId):
     """Return True if ic is an entry icon and siteId is the site adjacent to the icon
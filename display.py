@@ -0,0 +1,166 @@
+# Copyright Mark Edel  All rights reserved
+# Display backends for transferring the (PIL) window image to the screen, and other
+# OS-dependent bits of window handling.
+#
+# Tkinter canvas can't handle individual images for each icon.  After about 4000
+# pixmaps, it breaks and dies.  Drawing directly to the screen is also problematic.
+# The original (and on Windows, still the fastest) solution is the ImageWin module of
+# pillow.  This is a kind-of messed up module which gets very little use due to bugs and
+# poor documentation.  While it doesn't give us direct access to the windows
+# framebuffer, it does allow us to copy data there from a PIL image in a two-step
+# process that is sufficiently fast for the purposes of this program.  For other
+# platforms, the Tk photo image backend displays a single window-sized Tk photo image,
+# and updates just the regions that are drawn.  The null backend displays nothing, but
+# records what would have been drawn, so that layout and drawing can be benchmarked and
+# profiled without an (on-screen) window.
+import os
+import sys
+import ctypes
+import tkinter as tk
+from PIL import ImageTk, ImageWin
+
+# Which display backend new windows should use: 'dib' (Windows only), 'photo' (Tk photo
+# image), or 'null' (no display).  None selects 'dib' on Windows and 'photo' elsewhere.
+# The PYTHON_G_DISPLAY environment variable, if set, overrides this.
+DEFAULT_BACKEND = None
+
+class DibDisplay:
+    """Draws to a Tk widget via a Windows device independent bitmap (Windows only)."""
+    def __init__(self, widget):
+        self.widget = widget
+        self.dc = None
+
+    def draw(self, image, location):
+        """Draw image at location (in widget coordinates)."""
+        self.drawPrepared(self.prepare(image), location)
+
+    def prepare(self, image):
+        """Convert image to the form that the backend draws from, for an image that will
+        be drawn repeatedly (see drawPrepared)."""
+        dib = ImageWin.Dib('RGB', (image.width, image.height))
+        dib.paste(image)
+        return dib
+
+    def drawPrepared(self, dib, location):
+        """Draw an image previously converted with the prepare method at location."""
+        x, y = location
+        width, height = dib.size
+        # While the documentation says that Dib.draw can take a window handle,
+        # it really can't.  If you pass the integer ID, it doesn't know that
+        # it has a window handle.  And if you pass it the output from
+        # ImageWin.HWND, it tries to use it as an integer and fails.  Here,
+        # we're using an undocumented internal function to get the device
+        # context from the window ID
+        if self.dc is None:
+            self.dc = dib.image.getdc(self.widget.winfo_id())
+        dib.draw(self.dc, (x, y, x + width, y + height))
+
+    def resize(self, width, height):
+        """Called when the widget changes size (the Dib backend draws directly to the
+        window, so has nothing to reallocate)."""
+        pass
+
+class PhotoImageDisplay:
+    """Draws to a Tk widget by way of a widget-sized Tk photo image, displayed in a
+    label covering the widget.  Rather than re-transferring the whole window image on
+    every draw, only the region being drawn is converted and copied in to the photo
+    image (via the Tk photo "copy" command), so small updates stay cheap."""
+    def __init__(self, widget):
+        self.widget = widget
+        self.photo = ImageTk.PhotoImage('RGB', (max(1, widget.winfo_width()),
+            max(1, widget.winfo_height())))
+        self.label = tk.Label(widget, image=self.photo, borderwidth=0,
+            highlightthickness=0, anchor=tk.NW)
+        self.label.place(x=0, y=0, relwidth=1, relheight=1)
+        # Mouse events land on the label, rather than the widget it covers.  Add the
+        # widget's binding tag to the label, so the widget's bindings still see them.
+        # Since the label sits at the widget origin, event coordinates are unchanged.
+        self.label.bindtags((str(widget),) + self.label.bindtags())
+
+    def draw(self, image, location):
+        """Draw image at location (in widget coordinates)."""
+        x, y = location
+        if x == 0 and y == 0 and image.size == (self.photo.width(),
+                self.photo.height()):
+            self.photo.paste(image)
+            return
+        self.drawPrepared(self.prepare(image), location)
+
+    def prepare(self, image):
+        return ImageTk.PhotoImage(image)
+
+    def drawPrepared(self, patch, location):
+        # The photo "copy" command won't take a negative destination, so for images
+        # extending beyond the top or left of the widget, copy just the visible part
+        x, y = location
+        self.widget.tk.call(str(self.photo), 'copy', str(patch), '-from', max(0, -x),
+            max(0, -y), '-to', max(0, x), max(0, y))
+
+    def resize(self, width, height):
+        """Reallocate the photo image to match a new widget size."""
+        if (width, height) == (self.photo.width(), self.photo.height()):
+            return
+        self.photo = ImageTk.PhotoImage('RGB', (max(1, width), max(1, height)))
+        self.label.configure(image=self.photo)
+
+class NullDisplay:
+    """Off-screen backend that draws nothing, but records the rectangles that would
+    have been drawn (in widget coordinates) in .regions, along with a count of the
+    pixels transferred.  Call clear() to reset the record."""
+    def __init__(self, widget=None):
+        self.widget = widget
+        self.regions = []
+        self.pixelsDrawn = 0
+
+    def draw(self, image, location):
+        x, y = location
+        self.regions.append((x, y, x + image.width, y + image.height))
+        self.pixelsDrawn += image.width * image.height
+
+    def prepare(self, image):
+        return image
+
+    def drawPrepared(self, image, location):
+        self.draw(image, location)
+
+    def resize(self, width, height):
+        pass
+
+    def clear(self):
+        self.regions = []
+        self.pixelsDrawn = 0
+
+backends = {'dib': DibDisplay, 'photo': PhotoImageDisplay, 'null': NullDisplay}
+
+def createDisplay(widget, backend=None):
+    """Create a display object for drawing to widget.  If backend is not specified,
+    use the PYTHON_G_DISPLAY environment variable, or DEFAULT_BACKEND, or failing both,
+    the preferred backend for the platform.  Raises ValueError if the backend name is
+    not one of those in backends (rather than quietly falling back to one that may
+    display nothing)."""
+    if backend is None:
+        backend = os.environ.get('PYTHON_G_DISPLAY', DEFAULT_BACKEND)
+    if backend is None:
+        backend = 'dib' if sys.platform == 'win32' else 'photo'
+    if backend not in backends:
+        raise ValueError(f"Unknown display backend {backend!r}, choose from: "
+            f"{', '.join(backends)}")
+    return backends[backend](widget)
+
+class POINT(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+
+def nudgeMouseCursor(widget, x, y):
+    """Move the mouse pointer by x, y pixels.  widget can be any Tk widget in the
+    window containing the pointer (it is needed only on non-Windows platforms, where
+    the pointer is moved by warping it relative to a widget)."""
+    if sys.platform == 'win32':
+        cursorPos = POINT()
+        ctypes.windll.user32.GetCursorPos(ctypes.byref(cursorPos))
+        cursorPos.x += x
+        cursorPos.y += y
+        ctypes.windll.user32.SetCursorPos(cursorPos.x, cursorPos.y)
+    else:
+        ptrX, ptrY = widget.winfo_pointerxy()
+        widget.event_generate('<Motion>', warp=True,
+            x=ptrX - widget.winfo_rootx() + x, y=ptrY - widget.winfo_rooty() + y)
@@ -2665,7 +2665,7 @@ class EntryIcon(icon.Icon):
             else:
                 argIc = getattr(self.sites, siteOrSeries.name).att
                 if argIc is not None:
-                    argLayoutGroups.append(argIc.calcLayouts())
+                    argLayoutGroups.append(argIc.calcLayoutsCached())
                     argNames.append(siteOrSeries.name)
                     y = icon.ATTR_SITE_OFFSET if siteOrSeries.type == 'attrIn' else 0
                     argYOffs.append(y)
@@ -2680,7 +2680,7 @@ class EntryIcon(icon.Icon):
             if forCursorArg is None:
                 layouts = [iconlayout.Layout(self, baseWidth, self.height, siteOffset)]
             else:
-                for forCursorLayout in forCursorArg.calcLayouts():
+                for forCursorLayout in forCursorArg.calcLayoutsCached():
                     layout = iconlayout.Layout(self, baseWidth, self.height, siteOffset)
                     layout.addSubLayout(forCursorLayout, 'forCursor',
                         baseWidth - icon.ATTR_SITE_DEPTH, 0)
@@ -2841,7 +2841,8 @@ class EntryIcon(icon.Icon):
 
     def cursorWindowPos(self):
         x, y = self.rect[:2]
-        x += self.textOffset + icon.globalFont.getsize(self.text[:self.cursorPos])[0]
+        x += self.textOffset + comn.textPrefixWidth(icon.globalFont, self.text,
+            self.cursorPos)
         y += self.sites.output.yOffset
         return x, y
 
@@ -1,10 +1,15 @@
 # Copyright Mark Edel  All rights reserved
-from PIL import Image, ImageDraw, ImageFont, ImageMath
+from PIL import Image, ImageDraw, ImageFont, ImageMath, ImageChops
 import comn
 import iconlayout
 import iconsites
 import filefmt
 import ast
+import weakref
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # Some general notes on drawing and layout:
 #
@@ -33,9 +38,23 @@ import ast
 # This prototype code, is much more pixel-oriented than it should be, given the current
 # variety of higher density displays, which may make it difficult to port to such an
 # environment.
-globalFont = ImageFont.truetype('c:/Windows/fonts/arial.ttf', 12)
-boldFont = ImageFont.truetype('c:/Windows/fonts/arialbd.ttf', 12)
-textFont = ImageFont.truetype('c:/Windows/fonts/consola.ttf', 13)
+def loadFont(fileName, size, substitutes):
+    """Load TrueType font fileName from the Windows font directory or, failing that (on
+    other platforms), the first of the (metrically similar) substitute font files that
+    PIL can find on its font search path."""
+    for path in ('c:/Windows/fonts/' + fileName, *substitutes):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass
+    print(f"Could not find font {fileName} or a substitute, using PIL default font")
+    return ImageFont.load_default()
+
+globalFont = loadFont('arial.ttf', 12, ('LiberationSans-Regular.ttf', 'DejaVuSans.ttf'))
+boldFont = loadFont('arialbd.ttf', 12, ('LiberationSans-Bold.ttf',
+    'DejaVuSans-Bold.ttf'))
+textFont = loadFont('consola.ttf', 13, ('LiberationMono-Regular.ttf',
+    'DejaVuSansMono.ttf'))
 
 stmtAstClasses = {ast.Assign, ast.AugAssign, ast.While, ast.For, ast.AsyncFor, ast.If,
  ast.Try, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Return, ast.With,
@@ -271,7 +290,67 @@ seqOutBumpImage = comn.asciiToImage((
 
 emptyImage = Image.new('RGBA', (0, 0))
 
-renderCache = {}
+# Default memory budget (bytes) for caching rendered text (see setTextCacheBudget),
+# which can be changed in the Settings dialog or via the PYTHON_G_TEXT_CACHE_KB
+# environment variable.  Identifiers, numbers, and operators are rendered to small
+# images, so this holds several thousand distinct tokens.  Common tokens are used
+# constantly, so stay cached, while one-offs from files opened earlier in the session
+# age out.
+DEFAULT_TEXT_CACHE_BUDGET = 16 * 1024 * 1024
+
+# Estimated memory cost (bytes) of an entry in textSizeCache: the key tuple, the text
+# string, and the size tuple.  This is used to convert the text cache budget to an
+# entry count for textSizeCache, whose entries are small and similar in size.
+TEXT_SIZE_CACHE_ENTRY_BYTES = 250
+
+# Compose text in iconBoxedText from per-character images rendered once per font (see
+# GlyphAtlas), rather than rendering each new string with ImageDraw.text.
+GLYPH_ATLAS_TEXT = True
+# GlyphAtlas objects by font
+glyphAtlases = {}
+
+# Rendered text images from iconBoxedText (keyed by text, font, and color), charged by
+# their pixel data size, and text sizes from getTextSize (keyed by text and font).
+renderCache = comn.LRUCache(maxBytes=DEFAULT_TEXT_CACHE_BUDGET,
+    sizeOf=lambda key, img: img.width * img.height * 4)
+textSizeCache = comn.LRUCache(
+    maxEntries=DEFAULT_TEXT_CACHE_BUDGET // TEXT_SIZE_CACHE_ENTRY_BYTES)
+
+def setTextCacheBudget(budgetBytes):
+    """Set the memory budget (in bytes) for caching rendered text images and text sizes,
+    discarding least-recently-used entries as needed to bring the caches within it."""
+    renderCache.setLimits(maxBytes=budgetBytes)
+    textSizeCache.setLimits(maxEntries=budgetBytes // TEXT_SIZE_CACHE_ENTRY_BYTES)
+
+# Memory budget (bytes) for the tinted and outlined images that tintSelectedImage keeps
+# in tintCache.  In outline mode, every part of every visible icon needs its own
+# outlined version, so this should comfortably exceed twice (source and result) the
+# pixel data of a window full of code.
+TINT_CACHE_BUDGET = 32 * 1024 * 1024
+
+# Tinted and outlined images from tintSelectedImage, charged for the pixel data of both
+# the source image (which the entry holds to keep its id from being reused) and the
+# tinted result.  Selected icons drawn from sprites (see FLATTEN_DRAW_LISTS) make
+# entries whose sizes vary widely, so the cache is limited by memory rather than by
+# entry count.
+tintCache = comn.LRUCache(maxBytes=TINT_CACHE_BUDGET,
+    sizeOf=lambda key, entry: (entry[0].width * entry[0].height +
+        entry[1].width * entry[1].height) * 4)
+
+# Composite the parts of each icon's drawList in to a single image (sprite) the first
+# time it is drawn, and draw that, rather than pasting each part separately.  This
+# trades memory (an extra image per icon, see spriteMemoryUsage) for fewer paste
+# operations in every redraw.
+FLATTEN_DRAW_LISTS = True
+# Icons holding flattened drawList sprites, for reporting memory use.  Icons are weakly
+# referenced, so this does not hold on to deleted icons.
+spriteIcons = weakref.WeakSet()
+
+# Save the list of layouts that each (non-top-level) icon returns from calcLayouts, and
+# reuse it until something changes in the icon's subtree (see calcLayoutsCached).  An
+# edit then recalculates only the layouts along the path from the changed icon to the
+# top of its statement, rather than every layout in the statement.
+MEMOIZE_LAYOUTS = True
 
 # Icon to insert when createIconFromAst fails (set by registerAstDecodeFallback())
 astDecodeFallback = None
@@ -321,10 +400,9 @@ def clipboardDataToIcons(clipData, window, offset):
     return pastedIcons
 
 def iconBoxedText(text, font=globalFont, color=BLACK, typeover=None):
-    if typeover is None and (text, font, color) in renderCache:
-        txtImg = renderCache[(text, font, color)]
-    else:
-        width, height = font.getsize(text)
+    txtImg = None if typeover is not None else renderCache.get((text, font, color))
+    if txtImg is None:
+        width, height = getTextSize(text, font)
         if height < minTxtHgt:
             height = minTxtHgt
         width += 2 * TEXT_MARGIN + 1
@@ -332,23 +410,103 @@ def iconBoxedText(text, font=globalFont, color=BLACK, typeover=None):
         txtImg = Image.new('RGBA', (width, height), color=comn.ICON_BG_COLOR)
         draw = ImageDraw.Draw(txtImg)
         if typeover is None:
-            draw.text((TEXT_MARGIN, TEXT_MARGIN), text, font=font, fill=color)
+            drawText(txtImg, (TEXT_MARGIN, TEXT_MARGIN), text, font, color)
         else:
             typeoverOffset = getTextSize(text[:typeover], font)[0]
-            draw.text((TEXT_MARGIN, TEXT_MARGIN), text[:typeover], font=font, fill=color)
-            draw.text((TEXT_MARGIN + typeoverOffset, TEXT_MARGIN), text=text[typeover:],
-                font=font, fill=TYPEOVER_COLOR)
+            drawText(txtImg, (TEXT_MARGIN, TEXT_MARGIN), text[:typeover], font, color)
+            drawText(txtImg, (TEXT_MARGIN + typeoverOffset, TEXT_MARGIN),
+                text[typeover:], font, TYPEOVER_COLOR)
         draw.rectangle((0, 0, width-1, height-1), fill=None, outline=comn.OUTLINE_COLOR)
         if typeover is None:
-            renderCache[(text, font, color)] = txtImg
+            renderCache.put((text, font, color), txtImg)
     return txtImg
 
-textSizeCache = {}
+class GlyphAtlas:
+    """Rasterized characters of a single font, for composing text without asking
+    FreeType to render every new string.  Each character is rendered once, to a
+    grayscale coverage mask, and text is drawn by pasting the character masks (in the
+    requested color) at positions advanced per the font's character advance widths and
+    pair kerning.  Since the masks are color-independent, one atlas serves all colors.
+    Overlapping glyphs (such as an underscore running under a descender) are combined
+    into a single coverage mask before painting, as FreeType does when rendering the
+    whole string, so the result is pixel-identical to ImageDraw.text for the fonts the
+    editor uses (see perfbench 'glyphs' and tests/test_glyphs.py for the comparison)."""
+    def __init__(self, font):
+        self.font = font
+        # Maps characters to (mask image (None if blank), (x, y) offset of the mask from
+        # the pen position, advance width)
+        self.glyphs = {}
+        # Maps character pairs to the kerning adjustment (added to the advance width of
+        # the first character) for the pair
+        self.kerning = {}
+
+    def glyph(self, char):
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            left, top, right, bottom = self.font.getbbox(char)
+            if right > left and bottom > top:
+                mask = Image.new('L', (right - left, bottom - top), color=0)
+                ImageDraw.Draw(mask).text((-left, -top), char, font=self.font, fill=255)
+            else:
+                mask = None
+            glyph = self.glyphs[char] = mask, (left, top), self.font.getlength(char)
+        return glyph
+
+    def kern(self, char1, char2):
+        pair = char1 + char2
+        adjust = self.kerning.get(pair)
+        if adjust is None:
+            adjust = self.kerning[pair] = self.font.getlength(pair) - \
+                self.glyph(char1)[2] - self.glyph(char2)[2]
+        return adjust
+
+    def drawText(self, image, location, text, color):
+        """Draw text on image with its origin (as for ImageDraw.text) at location."""
+        # Place the character masks, then combine them in to a single coverage mask
+        # for the whole string, taking the maximum where characters overlap (as
+        # FreeType rendering does), rather than pasting each character separately,
+        # which would composite overlapping edges twice.
+        x, y = location
+        prevChar = None
+        placed = []
+        for char in text:
+            if prevChar is not None:
+                x += self.kern(prevChar, char)
+            mask, (offsetX, offsetY), advance = self.glyph(char)
+            if mask is not None:
+                placed.append((mask, round(x) + offsetX, y + offsetY))
+            x += advance
+            prevChar = char
+        if len(placed) == 0:
+            return
+        left = min(maskX for _, maskX, _ in placed)
+        top = min(maskY for _, _, maskY in placed)
+        right = max(maskX + mask.width for mask, maskX, _ in placed)
+        bottom = max(maskY + mask.height for mask, _, maskY in placed)
+        textMask = Image.new('L', (right - left, bottom - top), color=0)
+        for mask, maskX, maskY in placed:
+            box = (maskX - left, maskY - top, maskX - left + mask.width,
+                maskY - top + mask.height)
+            textMask.paste(ImageChops.lighter(textMask.crop(box), mask), box)
+        image.paste(color, (left, top), mask=textMask)
+
+def drawText(image, location, text, font, color):
+    """Draw text on image at location, via the glyph atlas for font if GLYPH_ATLAS_TEXT
+    is set, or ImageDraw.text if not."""
+    if not GLYPH_ATLAS_TEXT:
+        ImageDraw.Draw(image).text(location, text, font=font, fill=color)
+        return
+    atlas = glyphAtlases.get(font)
+    if atlas is None:
+        atlas = glyphAtlases[font] = GlyphAtlas(font)
+    atlas.drawText(image, location, text, color)
+
 def getTextSize(text, font=globalFont):
     key = text, font
     size = textSizeCache.get(key)
     if size is None:
-        size = textSizeCache[key] = font.getsize(text)
+        size = font.getsize(text)
+        textSizeCache.put(key, size)
     return size
 
 # Sadly, hand drawn components are drawn in pixels rather than being dynamically based
@@ -378,6 +536,20 @@ class Icon:
     # for example: [("del Statement", "reference/simple_stmts.html#the-del-statement")]
     pythonDocRef = None
 
+    # Backing storage for the rect property and for the cached hierarchical rectangle
+    # (see hierRect).  These are provided as class defaults so that they are valid even
+    # if a subclass sets .rect before calling Icon.__init__.
+    _rect = None
+    _hierRect = None
+    # Backing storage for the drawList property, and the pre-composited version of the
+    # drawList (see _flattenedDrawList) as an (offset, image) pair, or None if it has
+    # not been made since the drawList was last replaced.
+    _drawList = None
+    _sprite = None
+    # Layouts saved from the last call to calcLayouts (see calcLayoutsCached), as a
+    # tuple of: the window margin at the time, and the (tuple of) layouts
+    _cachedLayouts = None
+
     def __init__(self, window=None, canProcessCtx=False):
         self.window = window
         self.rect = None
@@ -390,6 +562,38 @@ class Icon:
             self.canProcessCtx = True
         window.undo.registerIconCreated(self)
 
+    @property
+    def rect(self):
+        """The icon's (content coordinate) rectangle, not including its children"""
+        return self._rect
+
+    @rect.setter
+    def rect(self, rect):
+        # The rectangle is a property, rather than a simple attribute, because there are
+        # far too many places that move and lay out icons to find and invalidate the
+        # cached hierarchical rectangles of the icon and its ancestors everywhere it
+        # changes.  If the icon has no cached value, neither do its ancestors (see
+        # invalidateHierRect).
+        self._rect = rect
+        if self._hierRect is not None:
+            self.invalidateHierRect()
+
+    @property
+    def drawList(self):
+        """List of (offset, image) pairs from which the icon is drawn (see
+        _drawFromDrawList), or None if the icon needs to build a new one."""
+        return self._drawList
+
+    @drawList.setter
+    def drawList(self, drawList):
+        # Like rect, drawList is a property so that the sprite made from it (see
+        # _flattenedDrawList) is discarded wherever it is replaced.  Note that this
+        # includes "+=", which reassigns the (extended) list.  Icons also extend their
+        # drawLists with append, but only while building a new one (after assigning it
+        # and before drawing from it), when there is no sprite to discard.
+        self._drawList = drawList
+        self._sprite = None
+
     def draw(self, image=None, location=None, clip=None):
         """Draw the icon.  The image to which it is drawn and the location at which it is
          drawn can be optionally overridden by specifying image and/or location."""
@@ -541,23 +745,43 @@ class Icon:
 
     def traverse(self, order="draw", includeSelf=True, inclStmtComment=False):
         """Iterator for traversing the tree below this icon.  Traversal can be in either
-        drawing (order="draw") or picking (order="pick") order."""
+        drawing (order="draw") or picking (order="pick") order.  Drawing order is parent-
+        first (pre-order), and picking order is child-first (post-order)."""
+        # This is the innermost loop of drawing, picking, layout, and saving, so rather
+        # than recursing (which would pass every icon up through a generator frame per
+        # level of nesting), it manages its own stack of icons remaining to be visited.
+        # Children are pushed in reverse so they pop off in order.  As with a recursive
+        # traversal, an icon's children are not fetched until the icon is reached.
         if order == 'pick':
             if inclStmtComment and hasattr(self, 'stmtComment'):
                 yield self.stmtComment
+            # For "pick" order to be the true opposite of "draw", children should be
+            # visited in reverse, but child icons are not intended to overlap in a
+            # detectable way.  Stack entries are (icon, childrenPushed) pairs, and icons
+            # are yielded on their second visit, after all of their children.
+            stack = [(self, False)]
+            while stack:
+                ic, childrenPushed = stack.pop()
+                if childrenPushed:
+                    if ic is not self or includeSelf:
+                        yield ic
+                    continue
+                stack.append((ic, True))
+                children = ic.children()
+                for i in range(len(children) - 1, -1, -1):
+                    stack.append((children[i], False))
         else:
             if includeSelf:
                 yield self
-        # For "pick" order to be the true opposite of "draw", this loop should run in
-        # reverse, but child icons are not intended to overlap in a detectable way.
-        for child in self.children():
-            if child is None:
-                print('icon has null child', self)
-            yield from child.traverse(order)
-        if order == "pick":
-            if includeSelf:
-                yield self
-        else:
+            stack = self.children()
+            stack.reverse()
+            while stack:
+                ic = stack.pop()
+                yield ic
+                children = ic.children()
+                if children:
+                    children.reverse()
+                    stack += children
             if inclStmtComment and hasattr(self, 'stmtComment'):
                 yield self.stmtComment
 
@@ -810,8 +1034,37 @@ class Icon:
         return self.rect
 
     def hierRect(self, inclStmtComment=True):
-        """Return a rectangle covering this icon and its children"""
-        return containingRect(self.traverse(inclStmtComment=inclStmtComment))
+        """Return a rectangle covering this icon and its children.  The result (not
+        including the statement comment, which is cheap to add) is cached, and the cache
+        is invalidated for the icon and its ancestors when any icon in the hierarchy is
+        moved, attached, or detached, so repeated calls are O(1)."""
+        hierRect = self._hierRect
+        if hierRect is None:
+            hierRect = self._rect
+            for child in self.children():
+                childRect = child.hierRect(inclStmtComment=False)
+                if hierRect is None:
+                    hierRect = childRect
+                elif childRect is not None:
+                    hierRect = comn.combineRects(hierRect, childRect)
+            self._hierRect = hierRect
+        if inclStmtComment and hasattr(self, 'stmtComment'):
+            commentRect = self.stmtComment.rect
+            if hierRect is None:
+                return commentRect
+            if commentRect is not None:
+                return comn.combineRects(hierRect, commentRect)
+        return hierRect
+
+    def invalidateHierRect(self):
+        """Discard the cached hierarchical rectangle (see hierRect) of this icon and its
+        ancestors.  A cached value is only ever computed from the (cached) values of the
+        icon's children, so if an ancestor has no cached value, neither does anything
+        above it, and the upward walk can stop there."""
+        ic = self
+        while ic is not None and ic._hierRect is not None:
+            ic._hierRect = None
+            ic = ic.parent()
 
     def needsLayout(self):
         """Returns True if the icon requires re-layout due to changes to child icons"""
@@ -832,6 +1085,13 @@ class Icon:
         if self._isTemporaryIcon():
             return True
         self.layoutDirty = True
+        self.invalidateHierRect()
+        # Whatever changed may also change the icon's own layouts, so the saved layouts of
+        # the icon and its ancestors (see calcLayoutsCached) must go, even if the page
+        # can't be found.  Callers also mark an icon dirty for changes that affect the
+        # layouts of the icons below it (such as debugLayoutFilterIdx), so those go, too
+        # (but only once the parent links are known to be free of cycles).
+        self.invalidateLayoutCache()
         # Dirty layouts are found through the window Page structure, then iterating over
         # just the top icons of the page sequence, so mark the page and the top icon.
         if self.window is None:
@@ -840,11 +1100,13 @@ class Icon:
         if topParent is None:
             print('parent cycle in markLayoutDirty')
             return False
+        for ic in self.traverse(includeSelf=False):
+            ic._cachedLayouts = None
         topParent.layoutDirty = True
         page = self.window.topIcons.get(topParent)
         if page is None:
             return False
-        page.layoutDirty = True
+        page.markLayoutDirty()
         return True
 
     def children(self):
@@ -1133,6 +1395,35 @@ class Icon:
     def calcLayouts(self):
         pass
 
+    def calcLayoutsCached(self):
+        """Return the same layouts as calcLayouts (as a tuple), but reuse those from the
+        previous call if neither the icon nor anything attached below it has changed
+        since.  Icons use this to get the layouts of their children.  A layout depends
+        only on the icon's subtree, its attachment, and the window margin (which comment
+        wrapping depends on), so the cache is discarded by markLayoutDirty (of the icon
+        or anything below it) and by attaching and detaching (see invalidateLayoutCache),
+        and is ignored if the margin changes.  The layout objects themselves are shared
+        with the cache, so callers must treat them as read-only.  Top-level icons don't
+        use this, because Icon.layout adjusts the badness of its own layouts in place."""
+        margin = self.window.margin
+        if self._cachedLayouts is not None and self._cachedLayouts[0] == margin:
+            return self._cachedLayouts[1]
+        layouts = tuple(self.calcLayouts())
+        if MEMOIZE_LAYOUTS:
+            self._cachedLayouts = margin, layouts
+        return layouts
+
+    def invalidateLayoutCache(self):
+        """Discard the saved layouts (see calcLayoutsCached) of this icon and of its
+        ancestors, all of which incorporate them.  Like topLevelParentSafe, tolerates
+        parent cycles (stopping when it finds one)."""
+        visited = set()
+        ic = self
+        while ic is not None and ic not in visited:
+            visited.add(ic)
+            ic._cachedLayouts = None
+            ic = ic.parent()
+
     def textEntryHandler(self, entryIc, text, onAttr):
         """Called when an icon or one of its children holds a text-entry box (entryIc),
         and a new character is typed in the box.  text provides the full text currently
@@ -1189,11 +1480,12 @@ class Icon:
         if location is None:
             location = self.rect[:2]
         if toDragImage is None:
-            outImg = self.window.image
-            x, y = self.window.contentToImageCoord(*location)
+            target = self.window.renderTarget()
+            outImg = target.image
+            x, y = target.contentToImageCoord(*location)
             if clip is not None:
-                clip = comn.offsetRect(clip, -self.window.scrollOrigin[0],
-                 -self.window.scrollOrigin[1])
+                clip = comn.offsetRect(clip, -target.scrollOrigin[0],
+                 -target.scrollOrigin[1])
         else:
             outImg = toDragImage
             x, y = location
@@ -1209,10 +1501,48 @@ class Icon:
         if self.window.immediateDragHighlight is not None and \
                 self in self.window.immediateDragHighlight:
             style |= STYLE_IMMEDIATE_COPY
-        for (imgOffsetX, imgOffsetY), img in self.drawList:
+        if FLATTEN_DRAW_LISTS and len(self.drawList) > 1 and not style & STYLE_OUTLINE:
+            drawList = (self._flattenedDrawList(),)
+        else:
+            drawList = self.drawList
+        for (imgOffsetX, imgOffsetY), img in drawList:
             pasteImageWithClip(outImg, tintSelectedImage(img, style),
                 (x + imgOffsetX, y + imgOffsetY), clip)
 
+    def _flattenedDrawList(self):
+        """Return the images of self.drawList composited in to a single image, as an
+        (offset, image) pair in the same form as a drawList entry, so the icon can be
+        drawn with one (masked) paste rather than one per part.  The sprite is saved and
+        reused until the drawList is replaced (see the drawList property).  Because
+        compositing is associative, drawing the sprite gives the same result as drawing
+        the parts in order (but for rounding, where translucent parts overlap, which icon
+        parts don't do).  This is not true in outline mode, where each part is drawn
+        over its own outline, so _drawFromDrawList draws the parts separately, there."""
+        if self._sprite is not None:
+            return self._sprite
+        drawList = self.drawList
+        left = min(x for (x, y), img in drawList)
+        top = min(y for (x, y), img in drawList)
+        right = max(x + img.width for (x, y), img in drawList)
+        bottom = max(y + img.height for (x, y), img in drawList)
+        sprite = Image.new('RGBA', (right - left, bottom - top), color=(0, 0, 0, 0))
+        for (x, y), img in drawList:
+            if img.width == 0 or img.height == 0:
+                continue
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+            sprite.alpha_composite(img, (x - left, y - top))
+        self._sprite = (left, top), sprite
+        spriteIcons.add(self)
+        return self._sprite
+
+    def prepareSprite(self):
+        """If the icon will be drawn from a sprite (see _flattenedDrawList), make sure
+        it's current.  A parallel redraw calls this for every icon before handing the
+        drawing off to worker threads, so the workers only ever read the sprite."""
+        if FLATTEN_DRAW_LISTS and self.drawList is not None and len(self.drawList) > 1:
+            self._flattenedDrawList()
+
     def _drawEmptySites(self, toDragImage, clip, skip=None, hilightEmptySeries=False,
             allowTrailingComma=False):
         """Draws highlighting for empty sites.  Since empty site width is standardized
@@ -1247,14 +1577,18 @@ class Icon:
         if len(sitesToDraw) == 0:
             return
         iconX, iconY, _, _ = self.rect
-        outImg = toDragImage if toDragImage is not None else self.window.image
+        if toDragImage is None:
+            target = self.window.renderTarget()
+            outImg = target.image
+        else:
+            outImg = toDragImage
         if clip is None:
             clip = 0, 0, outImg.width, outImg.height
         draw = alpha = None
         if toDragImage is None:
-            iconX, iconY = self.window.contentToImageCoord(iconX, iconY)
+            iconX, iconY = target.contentToImageCoord(iconX, iconY)
             clipLeft, clipTop, clipRight, clipBottom = comn.offsetRect(clip,
-                -self.window.scrollOrigin[0], -self.window.scrollOrigin[1])
+                -target.scrollOrigin[0], -target.scrollOrigin[1])
             alpha = EMPTY_ARG_COLOR[3] / 255.0
         else:
             clipLeft, clipTop, clipRight, clipBottom = clip
@@ -1284,6 +1618,10 @@ class Icon:
             if r - l > 0 and b - t > 0:
                 if toDragImage:
                     draw.rectangle((l, t, r-1, b-1), fill=color)
+                elif target.emptySiteTints is not None:
+                    # The window is collecting empty site tints to composite all at
+                    # once after the icon is drawn (see compositeEmptySiteTints)
+                    target.emptySiteTints.append(((l, t, r, b), color))
                 else:
                     tintImg = Image.new('RGB', (r-l, b-t), color)
                     contentImg = outImg.crop((l, t, r, b))
@@ -1722,12 +2060,56 @@ def pasteImageWithClip(dstImage, srcImage, pos, clipRect):
     # Paste the cropped image in the drawn area
     dstImage.paste(croppedImage, box=(dl, dt), mask=croppedImage)
 
+def compositeEmptySiteTints(image, tints):
+    """Alpha-blend a list of empty site highlights, given as (rectangle, color) pairs
+    (in image coordinates), in to image (the window image), in list order, with the
+    same result as blending each one with PIL.  Rather than creating a tint image,
+    cropping the window image, blending, and pasting back, for every site, the area
+    covering all of them is converted to a NumPy array once, each site is blended in
+    the array, and the result is pasted back once.  Sites are blended one at a time,
+    in order, so that overlapping sites combine as they would if blended separately.
+    If NumPy is not available, falls back to blending the sites individually with PIL.
+    """
+    if len(tints) == 0:
+        return
+    if numpy is None:
+        for (l, t, r, b), color in tints:
+            tintImg = Image.new('RGB', (r-l, b-t), color)
+            contentImg = image.crop((l, t, r, b))
+            image.paste(Image.blend(contentImg, tintImg, color[3] / 255.0), (l, t))
+        return
+    left = min(rect[0] for rect, color in tints)
+    top = min(rect[1] for rect, color in tints)
+    right = max(rect[2] for rect, color in tints)
+    bottom = max(rect[3] for rect, color in tints)
+    region = numpy.array(image.crop((left, top, right, bottom)))
+    for (l, t, r, b), color in tints:
+        area = region[t-top:b-top, l-left:r-left]
+        pixels = area.astype(numpy.float32)
+        tint = numpy.array(color[:3], dtype=numpy.float32)
+        area[...] = (pixels + numpy.float32(color[3] / 255.0) * (tint - pixels)).astype(
+            numpy.uint8)
+    image.paste(Image.fromarray(region), (left, top))
+
+def spriteMemoryUsage():
+    """Return the number of flattened drawList sprites (see FLATTEN_DRAW_LISTS) held by
+    live icons, and the approximate number of bytes of image data they occupy."""
+    count = byteCount = 0
+    for ic in spriteIcons:
+        if ic._sprite is not None:
+            sprite = ic._sprite[1]
+            count += 1
+            byteCount += sprite.width * sprite.height * 4
+    return count, byteCount
+
 def tintSelectedImage(image, style):
-    if style & STYLE_OUTLINE:
-        alphaImg = image.getchannel('A')
-        outlineMask = ImageMath.eval("convert(a*255, 'L')", a=alphaImg)
-    else:
-        outlineMask = None
+    """Return a version of image tinted and/or outlined per style.  Since the same icon
+    part images are drawn in the same style over and over (particularly in outline mode,
+    which redraws the whole window when a drag starts), results are cached in tintCache,
+    keyed by the identity of the source image and the tint and outline that the style
+    selects.  The cache entry holds a reference to the source image, so its id can't be
+    reused by another image while the entry exists."""
+    outline = style & STYLE_OUTLINE
     color = None
     # Note that the order of the if clauses below determines the relative priority of
     # each of the color highlights (rather than blending, we choose the most important)
@@ -1743,19 +2125,26 @@ def tintSelectedImage(image, style):
         color = SYNTAX_ERR_TINT
     elif style & STYLE_TYPE_ANN:
         color = TYPE_ANN_TINT
-    elif outlineMask is None:  # No outline and no additional coloring
+    elif not outline:  # No outline and no additional coloring
         return image
+    cacheKey = id(image), color, outline
+    cached = tintCache.get(cacheKey)
+    if cached is not None:
+        return cached[1]
+    srcImage = image
     if color is not None:
         alphaImg = image.getchannel('A')
         colorImg = Image.new('RGBA', (image.width, image.height), color=color)
         colorImg.putalpha(alphaImg)
         image = Image.blend(image, colorImg, color[3] / 255.0)
-    if outlineMask is not None:
+    if outline:
+        outlineMask = ImageMath.eval("convert(a*255, 'L')", a=srcImage.getchannel('A'))
         outlineImg = Image.new('RGBA', (image.width, image.height),
                 color=SHOW_OUTLINE_TINT)
         outlineImg.putalpha(outlineMask)
         outlineImg.paste(image, mask=image)
-        return outlineImg
+        image = outlineImg
+    tintCache.put(cacheKey, (srcImage, image))
     return image
 
 def incorporateStmtCommentLayouts(layouts, commentLayouts, margin):
@@ -1836,13 +2225,14 @@ def drawSeqSiteConnection(fromIcon, image=None, clip=None):
     _, toY = toIcon.posOfSite('seqIn')
     # If drawing to window, translate endpoints and clip rectangle to image coords
     if image is None:
-        draw = toIcon.window.draw
-        img = toIcon.window.image
-        x, fromY = toIcon.window.contentToImageCoord(x, fromY)
-        _, toY = toIcon.window.contentToImageCoord(x, toY)
+        target = toIcon.window.renderTarget()
+        draw = target.draw
+        img = target.image
+        x, fromY = target.contentToImageCoord(x, fromY)
+        _, toY = target.contentToImageCoord(x, toY)
         if clip is not None:
-            l, t = toIcon.window.contentToImageCoord(clip[0], clip[1])
-            r, b = toIcon.window.contentToImageCoord(clip[2], clip[3])
+            l, t = target.contentToImageCoord(clip[0], clip[1])
+            r, b = target.contentToImageCoord(clip[2], clip[3])
             clip = l, t, r, b
     else:
         draw = ImageDraw.Draw(image)
@@ -1950,9 +2340,10 @@ def drawSeqRule(ic, clip=None, image=None):
                 return
             toY = b
     if image is None:
-        draw = ic.window.draw
-        _x, fromY = ic.window.contentToImageCoord(x, fromY)
-        x, toY = ic.window.contentToImageCoord(x, toY)
+        target = ic.window.renderTarget()
+        draw = target.draw
+        _x, fromY = target.contentToImageCoord(x, fromY)
+        x, toY = target.contentToImageCoord(x, toY)
     else:
         draw = ImageDraw.Draw(image)
     draw.line((x, fromY, x, toY), SEQ_RULE_COLOR)
@@ -2481,7 +2872,7 @@ def cursorInText(textOriginPos, clickPos, font, text, padLeft=0, padRight=0):
     TEXT_MARGIN of the text, return (None, None)."""
     textOriginX, textCenterY = textOriginPos
     textXOffset = clickPos[0] - textOriginX
-    textWidth, textHeight = font.getsize(text)
+    textWidth, textHeight = getTextSize(text, font)
     textWidth += padLeft + padRight
     textBoxLeft = textOriginX - TEXT_MARGIN - padLeft
     textBoxTop = textCenterY - textHeight // 2 - TEXT_MARGIN
@@ -2491,7 +2882,7 @@ def cursorInText(textOriginPos, clickPos, font, text, padLeft=0, padRight=0):
     if not pointInRect(clickPos, textBox):
         return None, None
     cursorIdx = comn.findTextOffset(font, text, textXOffset)
-    cursorX = textOriginX + font.getsize(text[:cursorIdx])[0]
+    cursorX = textOriginX + comn.textPrefixWidth(font, text, cursorIdx)
     return cursorIdx, (cursorX, textCenterY)
 
 def isEntryIcon(ic):
@@ -7,6 +7,45 @@ import sys
 import icon
 import iconsites
 
+# Limit on the number of (partial) row combinations that ListLayoutMgr.calcLayouts may
+# build in exploring the layouts of a single list.  Exploring list layouts can explode
+# far beyond keypress time (particularly for long lists whose items have multiple
+# layouts of their own), so when a list reaches the limit, the margin it is working on
+# is finished greedily (following only the most promising partial layout), and rather
+# than stepping through every wider margin, it makes greedy layouts at half and full
+# window margin width, and returns those along with the layouts found so far, marked
+# (.refineLater) for another try, later.  The window then re-lays out the list, when
+# the user pauses, with the larger LIST_LAYOUT_REFINE_BUDGET.  So that a list doesn't
+# jump back from its refined layout on the next edit, a list that runs out of budget
+# also tries following the row breaks of the layout it currently has.  The limit is in
+# combinations, rather than time, so that layout does not depend on machine speed or
+# load (which would make lists jump between layouts on successive keystrokes).  None
+# removes the limit.
+LIST_LAYOUT_BUDGET = 2000
+LIST_LAYOUT_REFINE_BUDGET = 40000
+
+class ListLayoutStats:
+    """Counters for profiling list layout (see ListLayoutMgr.calcLayouts)"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.listsLaidOut = 0
+        self.combinationsExplored = 0
+        self.rowLayoutsCulled = 0
+        self.layoutsCulled = 0
+        self.budgetsExhausted = 0
+        self.refinements = 0
+
+    def stats(self):
+        """Return a printable summary of the counters"""
+        return f"{self.listsLaidOut} lists, {self.combinationsExplored} combinations " \
+            f"explored, {self.rowLayoutsCulled} row layouts and {self.layoutsCulled} " \
+            f"list layouts culled, {self.budgetsExhausted} over budget, " \
+            f"{self.refinements} refined"
+
+listLayoutStats = ListLayoutStats()
+
 class Layout:
     """Structure to store the information that the icon has calculated about how it
     should be laid out (in calcLayouts), until all the calculations are done and the
@@ -108,6 +147,12 @@ class ListLayoutMgr:
         self.bodySitePositions = None
         self.commaSitePositions = None
         self.rowWidths = None
+        # Indices of the list items that start each row in the current layout (set by
+        # doLayout), for calcLayouts to follow when it runs out of budget
+        self.rowStarts = None
+        # Set (by the window) to have the next calcLayouts call use the larger
+        # LIST_LAYOUT_REFINE_BUDGET, to refine a layout that ran out of budget
+        self.refining = False
 
     def drawListCommas(self, leftSiteX, leftSiteY, typeoverIdx=None):
         xOff = leftSiteX + icon.inSiteImage.width - icon.commaImage.width
@@ -200,16 +245,26 @@ class ListLayoutMgr:
         with the rest of the attached icons)."""
         # layout for managed list gets merged in to layout of entire icon. List-specific
         # data is added as an attribute based on site name
-        leftSublayoutOffset = icon.OUTPUT_SITE_DEPTH if self.simpleSpineWillDraw() else 0
+        spineWasDrawn = bool(self.simpleSpineWillDraw())
+        leftSublayoutOffset = icon.OUTPUT_SITE_DEPTH if spineWasDrawn else 0
         self.width, self.height, siteOffsets, self.rowWidths = getattr(layout,
                 self.siteSeriesName + 'ListMgrData')
+        # calcLayouts offsets the list items to make space for the simple spine based on
+        # whether it was drawn for the previous layout.  If that has changed, the saved
+        # layouts (see Icon.calcLayoutsCached) no longer match what calcLayouts would
+        # return, so discard them.
+        if bool(self.simpleSpineWillDraw()) != spineWasDrawn:
+            self.icon.invalidateLayoutCache()
         self.commaSitePositions = []
         self.bodySitePositions = []
+        rowStarts = []
         for i, offset in enumerate(siteOffsets.values()):
             if offset[0] == leftSublayoutOffset:
                 self.bodySitePositions.append(offset)
+                rowStarts.append(i)
             else:
                 self.commaSitePositions.append((i, offset))
+        self.rowStarts = rowStarts
         minBodySiteY = 0   # Include the anchor point (y == 0)
         maxBodySiteY = 0
         for bodySitePos in self.bodySitePositions:
@@ -231,7 +286,9 @@ class ListLayoutMgr:
         # list dimensions, can explode far beyond keypress time for even short lists.  The
         # method used here, is to work from narrow layouts to wide ones, caching the work
         # expended to layout the start of each row, and culling per-row as the layout
-        # develops.
+        # develops.  Even so, long lists of items with multiple layouts can take far too
+        # long, so the search is limited to LIST_LAYOUT_BUDGET row combinations, beyond
+        # which the best layouts found so far are returned, marked to be refined later.
         siteSeries = self.icon.sites.getSeries(self.siteSeriesName)
         if len(siteSeries) == 1 and siteSeries[0].att is None:
             # Empty argument list
@@ -251,13 +308,42 @@ class ListLayoutMgr:
                 childLayoutList = (None,)
                 minWidth = 1
             else:
-                childLayoutList = ic.calcLayouts()
+                childLayoutList = ic.calcLayoutsCached()
                 minWidth = min((lo.width for lo in childLayoutList))
             childLayoutLists.append(childLayoutList)
             margin = max(margin, minWidth)
         rowLayoutMgr = self.RowLayoutManager(childLayoutLists,
             self.allowsTrailingComma)
         finishedLayouts = []
+        refining = self.refining
+        self.refining = False
+        budget = LIST_LAYOUT_REFINE_BUDGET if refining else LIST_LAYOUT_BUDGET
+        combinationsBuilt = 0
+        budgetExhausted = False
+        greedyMargins = None
+        listLayoutStats.listsLaidOut += 1
+        # The row breaks of the current layout, and the margin at which they were laid
+        # out (the widest row), if they still fit the list
+        currentRowStarts = self.rowStarts
+        if currentRowStarts is None or self.rowWidths is None or \
+                len(currentRowStarts) != len(self.rowWidths) or \
+                len(currentRowStarts) == 0 or \
+                currentRowStarts[-1] >= len(childLayoutLists):
+            currentRowStarts = currentMargin = None
+        else:
+            currentMargin = max(self.rowWidths)
+            currentRowEnds = currentRowStarts[1:] + [len(childLayoutLists)]
+        def mostPromising(combinedLayout):
+            # Once out of budget, only the partial layout that has placed the most items
+            # (with the least badness and height) is followed, except that at the margin
+            # of the current layout, a partial layout that has the same row breaks is
+            # preferred, so that the list keeps its current layout if it still can.
+            height, rowData, badness, sublayouts = combinedLayout
+            followsCurrent = margin == currentMargin and \
+                len(rowData) <= len(currentRowStarts) and \
+                all(rd[0] == start for rd, start in zip(rowData, currentRowStarts)) and \
+                len(sublayouts) == currentRowEnds[len(rowData) - 1]
+            return not followsCurrent, -len(sublayouts), badness, height
         # Loop, increasing margin
         while margin < sys.maxsize:
             # Loop building row layout choices in to full layouts, one row at a time.
@@ -269,6 +355,9 @@ class ListLayoutMgr:
                 width, heightAbove, heightBelow, badness, sublayouts = rowLayout
                 combinedLayouts.append((heightAbove + heightBelow,
                         [(0, heightAbove, width)], badness, sublayouts))
+            combinationsBuilt += len(combinedLayouts)
+            if budgetExhausted and len(combinedLayouts) > 1:
+                combinedLayouts = [min(combinedLayouts, key=mostPromising)]
             perMarginLayouts = []
             while len(combinedLayouts) > 0:
                 newCombinedLayouts = []
@@ -277,7 +366,9 @@ class ListLayoutMgr:
                     rowStartIdx = len(sublayouts)
                     if rowStartIdx >= len(childLayoutLists):
                         maxWidth = max((rd[2] for rd in rowData))
-                        if maxWidth == margin:  # layout is a dup if maxWidth < margin
+                        # Layout is a dup if maxWidth < margin (unless out of budget,
+                        # since narrower margins may not have completed)
+                        if maxWidth == margin or budgetExhausted:
                             perMarginLayouts.append(combinedLayout)
                         continue
                     rowLayouts, rowNextMargin = rowLayoutMgr.rowLayoutChoices(rowStartIdx, margin)
@@ -289,17 +380,27 @@ class ListLayoutMgr:
                         newCombinedLayouts.append((height-1 + heightAbove + heightBelow,
                                 rowData + [(rowStartIdx, height-1 + heightAbove, width)],
                                 badness + rowBadness, sublayouts + rowSublayouts))
+                combinationsBuilt += len(newCombinedLayouts)
+                if budget is not None and combinationsBuilt > budget:
+                    budgetExhausted = True
+                if budgetExhausted and len(newCombinedLayouts) > 1:
+                    newCombinedLayouts = [min(newCombinedLayouts, key=mostPromising)]
                 combinedLayouts = newCombinedLayouts
             # Make Layout objects for the finished layouts for this margin
             leftSublayoutOffset = icon.OUTPUT_SITE_DEPTH if self.simpleSpineWillDraw() else 0
             for height, rowData, badness, sublayouts in perMarginLayouts:
+                # Layouts are all margin wide, except those finished after running out
+                # of budget, which may be narrower
+                layoutWidth = max((rd[2] for rd in rowData))
                 # Cull new layouts against finishedLayouts list
                 for finLo in tuple(finishedLayouts):
-                    if margin >= finLo.width and height >= finLo.height and \
+                    if layoutWidth >= finLo.width and height >= finLo.height and \
                             badness >= finLo.badness:
+                        listLayoutStats.layoutsCulled += 1
                         break  # Layout is provably worse than an existing layout
-                    if finLo.width >= margin and finLo.height >= height and \
+                    if finLo.width >= layoutWidth and finLo.height >= height and \
                             finLo.badness >= badness:
+                        listLayoutStats.layoutsCulled += 1
                         finishedLayouts.remove(finLo)
                 else:  # Layout is not provably worse than an existing layout: add
                     rowWidths = [width for _startIdx, _yOffset, width in rowData]
@@ -317,13 +418,33 @@ class ListLayoutMgr:
                         lo.addSubLayout(sublayout, siteName, x, rowYOffset - centerY)
                         x += (self.emptyArgWidth(siteNum) if sublayout is None else
                               sublayout.width) + icon.commaImage.width - 2
-                    lo.width = margin
+                    lo.width = layoutWidth
                     if self.simpleSpine and len(rowData) >= 2:
                         lo.width += icon.rSimpleSpineImage.width * 2 - 2
                     lo.height = height
                     lo.badness = badness
                     finishedLayouts.append(lo)
+            if budgetExhausted:
+                # Skip ahead to the (greedy) layouts at half and full window margin, and
+                # at the margin of the current layout
+                if greedyMargins is None:
+                    windowMargin = self.icon.window.margin
+                    greedyMargins = sorted({m for m in (windowMargin // 2, windowMargin,
+                        currentMargin) if m is not None and m > margin})
+                if len(greedyMargins) == 0:
+                    break
+                margin = greedyMargins.pop(0)
+                continue
             margin = nextMargin
+        listLayoutStats.combinationsExplored += combinationsBuilt
+        if budgetExhausted:
+            listLayoutStats.budgetsExhausted += 1
+            for lo in finishedLayouts:
+                lo.refineLater = True
+            if not refining:
+                self.icon.window.requestListLayoutRefinement(self)
+        elif refining:
+            listLayoutStats.refinements += 1
         # Incorporate layout shape in badness score (penalize tall, thin layouts)
         for i, lo in enumerate(finishedLayouts):
             if len(lo.rowWidths) > 0:
@@ -426,9 +547,11 @@ class ListLayoutMgr:
                     # indices for subsequent removals need to be adjusted (removedOffset)
                     del self.finishedLayouts[rowStartIdx][oldLayoutIdx - removedOffset]
                     removedOffset += 1
+                    listLayoutStats.rowLayoutsCulled += 1
                 elif newHeight >= oldHeight and newBadness >= oldBadness and \
                         newNItems <= oldNItems:
                     # Layout is worse than one of the existing layouts: don't add
+                    listLayoutStats.rowLayoutsCulled += 1
                     return False
             return True
 
@@ -454,7 +577,7 @@ class ListLayoutMgr:
         commaWidth = icon.commaImage.width - 1
         childLayoutLists = []
         for ic in (site.att for site in siteSeries):
-            childLayoutLists.append((None,) if ic is None else ic.calcLayouts())
+            childLayoutLists.append((None,) if ic is None else ic.calcLayoutsCached())
         layouts = []
         heightCull = 0
         for childLayouts in allCombinations(childLayoutLists, 200):
@@ -533,6 +656,9 @@ class ListMgrLayout(Layout):
     def __init__(self, siteSeriesName, rowWidths):
         Layout.__init__(self, None, 0, 0, 0)
         self.siteSeriesName = siteSeriesName
+        # Set if calcLayouts ran out of budget before finding this layout, so there may
+        # be better ones that it didn't get to (see LIST_LAYOUT_BUDGET)
+        self.refineLater = False
         self.rowWidths = rowWidths
 
     def mergeInto(self, destLayout, xOff, yOff):
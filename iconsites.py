@@ -27,6 +27,20 @@ class IconSite:
             self.cursorSkip = True
 
     def attach(self, ownerIcon, fromIcon, fromSiteId=None):
+        # Changing the attachment changes the extent of the icon hierarchy on both sides
+        # of the link, so discard cached hierarchical rectangles (see Icon.hierRect)
+        ownerIcon.invalidateHierRect()
+        if self.att:
+            self.att.invalidateHierRect()
+        if fromIcon is not None:
+            fromIcon.invalidateHierRect()
+        # ... and the layouts saved for the icons on both sides, since layouts depend on
+        # what's attached below, and some depend on the parent (see calcLayoutsCached)
+        ownerIcon.invalidateLayoutCache()
+        if self.att:
+            self.att.invalidateLayoutCache()
+        if fromIcon is not None:
+            fromIcon.invalidateLayoutCache()
         # Remove original link from attached site
         if self.att:
             backLinkSite = self.att.siteOf(ownerIcon)
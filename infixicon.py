@@ -107,9 +107,9 @@ class InfixIcon(icon.Icon):
     def calcLayouts(self):
         opWidth, opHeight = self.opImg.size
         lArg = self.leftArg()
-        lArgLayouts = [None] if lArg is None else lArg.calcLayouts()
+        lArgLayouts = [None] if lArg is None else lArg.calcLayoutsCached()
         rArg = self.rightArg()
-        rArgLayouts = [None] if rArg is None else rArg.calcLayouts()
+        rArgLayouts = [None] if rArg is None else rArg.calcLayoutsCached()
         layouts = []
         for lArgLayout, rArgLayout in iconlayout.allCombinations(
                 (lArgLayouts, rArgLayouts)):
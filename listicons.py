@@ -607,12 +607,12 @@ class ListTypeIcon(icon.Icon):
 
     def calcLayouts(self):
         argListLayouts = self.argList.calcLayouts(argRequired=self.isComprehension())
-        cprhLayoutLists = [(None,) if site.att is None else site.att.calcLayouts()
+        cprhLayoutLists = [(None,) if site.att is None else site.att.calcLayoutsCached()
                 for site in self.sites.cprhIcons]
         if not self.closed or self.sites.attrIcon.att is None:
             attrLayouts = (None,)
         else:
-            attrLayouts = self.sites.attrIcon.att.calcLayouts()
+            attrLayouts = self.sites.attrIcon.att.calcLayoutsCached()
         layouts = []
         for argListLayout, attrLayout, *cprhLayouts in iconlayout.allCombinations(
                 (argListLayouts, attrLayouts, *cprhLayoutLists)):
@@ -1689,7 +1689,7 @@ class CallIcon(icon.Icon):
         bodyWidth -= icon.ATTR_SITE_DEPTH
         argListLayouts = self.argList.calcLayouts()
         if self.closed and self.sites.attrIcon.att is not None:
-            attrLayouts = self.sites.attrIcon.att.calcLayouts()
+            attrLayouts = self.sites.attrIcon.att.calcLayoutsCached()
         else:
             attrLayouts = [None]
         layouts = []
@@ -1964,7 +1964,7 @@ class CprhIfIcon(icon.Icon):
         if self.sites.testIcon.att is None:
             testIconLayouts = (None,)
         else:
-            testIconLayouts = self.sites.testIcon.att.calcLayouts()
+            testIconLayouts = self.sites.testIcon.att.calcLayoutsCached()
         layouts = []
         for testIconLayout in testIconLayouts:
             layout = iconlayout.Layout(self, width, height, height // 2)
@@ -2159,7 +2159,7 @@ class CprhForIcon(icon.Icon):
         if self.sites.iterIcon.att is None:
             iterLayouts = (None,)
         else:
-            iterLayouts = self.sites.iterIcon.att.calcLayouts()
+            iterLayouts = self.sites.iterIcon.att.calcLayoutsCached()
         bodyWidth, bodyHeight, inWidth = self.bodySize
         tgtXOff = bodyWidth - 1
         layouts = []
@@ -180,7 +180,7 @@ class TextIcon(icon.Icon):
         if self.sites.attrIcon.att is None:
             attrLayouts = [None]
         else:
-            attrLayouts = self.sites.attrIcon.att.calcLayouts()
+            attrLayouts = self.sites.attrIcon.att.calcLayoutsCached()
         width, height = self.bodySize
         layouts = []
         for attrLayout in attrLayouts:
@@ -436,7 +436,7 @@ class AttrIcon(icon.Icon):
         width, height = self.bodySize
         layouts = []
         attrIcon = self.sites.attrIcon.att
-        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayouts()
+        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayoutsCached()
         for attrLayout in attrLayouts:
             layout = iconlayout.Layout(self, width, height,
                     height // 2 + icon.ATTR_SITE_OFFSET)
@@ -1330,7 +1330,7 @@ class ImportFromIcon(icon.Icon):
         bodyWidth, bodyHeight, importWidth = self.bodySize
         cntrYOff = bodyHeight // 2
         moduleIcon = self.sites.moduleIcon.att
-        moduleLayouts = [None] if moduleIcon is None else moduleIcon.calcLayouts()
+        moduleLayouts = [None] if moduleIcon is None else moduleIcon.calcLayoutsCached()
         moduleXOff = bodyWidth - 1
         importsListLayouts = self.importsList.calcLayouts()
         layouts = []
@@ -2087,14 +2087,14 @@ class RaiseIcon(icon.Icon):
         bodyWidth, bodyHeight, fromWidth = self.bodySize
         cntrYOff = bodyHeight // 2
         exceptIcon = self.sites.exceptIcon.att
-        exceptLayouts = [None] if exceptIcon is None else exceptIcon.calcLayouts()
+        exceptLayouts = [None] if exceptIcon is None else exceptIcon.calcLayoutsCached()
         exceptXOff = bodyWidth - 1
         layouts = []
         causeLayouts = [None]
         if self.hasFrom:
             causeIcon = self.sites.causeIcon.att
             if causeIcon is not None:
-                causeLayouts = causeIcon.calcLayouts()
+                causeLayouts = causeIcon.calcLayoutsCached()
         for exceptLayout, causeLayout in iconlayout.allCombinations((exceptLayouts,
                 causeLayouts)):
             layout = iconlayout.Layout(self, bodyWidth, bodyHeight, cntrYOff)
@@ -2359,7 +2359,7 @@ class DecoratorIcon(icon.Icon):
         if self.sites.argIcon.att is None:
             argLayouts = [None]
         else:
-            argLayouts = self.sites.argIcon.att.calcLayouts()
+            argLayouts = self.sites.argIcon.att.calcLayoutsCached()
         width, height = self.bodySize
         layouts = []
         for attrLayout in argLayouts:
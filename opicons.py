@@ -232,7 +232,7 @@ class UnaryOpIcon(icon.Icon):
         if self.sites.argIcon.att is None:
             argLayouts = (None,)
         else:
-            argLayouts = self.sites.argIcon.att.calcLayouts()
+            argLayouts = self.sites.argIcon.att.calcLayoutsCached()
         width, height = self.bodySize
         layouts = []
         for argLayout in argLayouts:
@@ -483,11 +483,11 @@ class BinOpIcon(icon.Icon):
             lParenWidth = rParenWidth = 0
         opWidth, opHeight = self.opSize
         lArg = self.leftArg()
-        lArgLayouts = [None] if lArg is None else lArg.calcLayouts()
+        lArgLayouts = [None] if lArg is None else lArg.calcLayoutsCached()
         rArg = self.rightArg()
-        rArgLayouts = [None] if rArg is None else rArg.calcLayouts()
+        rArgLayouts = [None] if rArg is None else rArg.calcLayoutsCached()
         attrIcon = self.sites.attrIcon.att
-        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayouts()
+        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayoutsCached()
         layouts = []
         for lArgLayout, rArgLayout, attrLayout in iconlayout.allCombinations((lArgLayouts,
                 rArgLayouts, attrLayouts)):
@@ -805,11 +805,11 @@ class DivideIcon(icon.Icon):
 
     def calcLayouts(self):
         topArg = self.sites.topArg.att
-        tArgLayouts = [None] if topArg is None else topArg.calcLayouts()
+        tArgLayouts = [None] if topArg is None else topArg.calcLayoutsCached()
         bottomArg = self.sites.bottomArg.att
-        bArgLayouts = [None] if bottomArg is None else bottomArg.calcLayouts()
+        bArgLayouts = [None] if bottomArg is None else bottomArg.calcLayoutsCached()
         attrIcon = self.sites.attrIcon.att
-        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayouts()
+        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayoutsCached()
         layouts = []
         for tArgLayout, bArgLayout, attrLayout in iconlayout.allCombinations((tArgLayouts,
                 bArgLayouts, attrLayouts)):
@@ -1136,13 +1136,13 @@ class IfExpIcon(icon.Icon):
             lParenWidth = rParenWidth = 0
         ifWidth, elseWidth, height = self.bodySize
         lArg = self.sites.trueExpr.att
-        lArgLayouts = [None] if lArg is None else lArg.calcLayouts()
+        lArgLayouts = [None] if lArg is None else lArg.calcLayoutsCached()
         testExpr = self.sites.testExpr.att
-        testArgLayouts = [None] if testExpr is None else testExpr.calcLayouts()
+        testArgLayouts = [None] if testExpr is None else testExpr.calcLayoutsCached()
         rArg = self.sites.falseExpr.att
-        rArgLayouts = [None] if rArg is None else rArg.calcLayouts()
+        rArgLayouts = [None] if rArg is None else rArg.calcLayoutsCached()
         attrIcon = self.sites.attrIcon.att
-        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayouts()
+        attrLayouts = [None] if attrIcon is None else attrIcon.calcLayoutsCached()
         layouts = []
         for lArgLayout, testArgLayout, rArgLayout, attrLayout in iconlayout. \
                 allCombinations((lArgLayouts, testArgLayouts, rArgLayouts, attrLayouts)):
@@ -100,9 +100,9 @@ class CursorParenIcon(icon.Icon):
     def calcLayouts(self):
         singleParenWidth, height = self.bodySize
         argIcon = self.sites.argIcon.att
-        argLayouts = [None] if argIcon is None else argIcon.calcLayouts()
+        argLayouts = [None] if argIcon is None else argIcon.calcLayoutsCached()
         if self.closed and self.sites.attrIcon.att is not None:
-            attrLayouts = self.sites.attrIcon.att.calcLayouts()
+            attrLayouts = self.sites.attrIcon.att.calcLayoutsCached()
         else:
             attrLayouts = [None]
         layouts = []
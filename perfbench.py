@@ -0,0 +1,239 @@
+# Copyright Mark Edel  All rights reserved
+# Performance benchmarks for exercising python-g internals on synthetic code.  These are
+# not used by the editor itself.  Run with a list of benchmark names (or none, to run
+# them all):  python perfbench.py traverse
+import os
+import sys
+import time
+import tempfile
+from PIL import ImageChops
+import display
+import python_g
+import icon
+import iconlayout
+import filefmt
+
+def makeWindow():
+    """Create the application (without entering its main loop) and return its (empty)
+    initial window.  The application object is installed as python_g.appData, as the
+    editor code expects to find it there.  The window uses the null display backend, and
+    is withdrawn from the screen, so drawing is measured without display transfer (Tk
+    still needs a display connection, but on a headless machine, a virtual one, such as
+    Xvfb, will do)."""
+    display.DEFAULT_BACKEND = 'null'
+    python_g.appData = python_g.App()
+    window = python_g.appData.windows[0]
+    window.top.withdraw()
+    return window
+
+def loadText(window, text):
+    """Parse Python source text in to icons, add them to window, and lay them out.
+    Returns the list of top-level icons of the (first) sequence that was created."""
+    seqs = filefmt.parseTextToIcons(text, window, source="Benchmark text",
+        forImport=True)
+    for seq in seqs:
+        window.addTop(seq)
+    window.layoutDirtyIcons(filterRedundantParens=False)
+    return seqs[0]
+
+def timeCall(fn, reps):
+    """Call fn reps times, and return the average time per call in milliseconds"""
+    startTime = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - startTime) * 1000.0 / reps
+
+def recursiveTraverse(ic, order="draw", includeSelf=True, inclStmtComment=False):
+    """The original (recursive generator) implementation of Icon.traverse, for
+    comparison"""
+    if order == 'pick':
+        if inclStmtComment and hasattr(ic, 'stmtComment'):
+            yield ic.stmtComment
+    else:
+        if includeSelf:
+            yield ic
+    for child in ic.children():
+        yield from recursiveTraverse(child, order)
+    if order == "pick":
+        if includeSelf:
+            yield ic
+    else:
+        if inclStmtComment and hasattr(ic, 'stmtComment'):
+            yield ic.stmtComment
+
+def benchmarkTraverse(window, reps=50):
+    """Compare Icon.traverse against the original recursive generator on nested list
+    expressions of increasing depth."""
+    for depth in (10, 50, 150):
+        # Nested lists, each with a couple of (leaf) elements of its own: [a, b, [...]]
+        text = "x = " + "[a, b, " * depth + "c" + "]" * depth
+        topIcon = loadText(window, text)[0]
+        iconCount = sum(1 for _ in topIcon.traverse())
+        for order in ("draw", "pick"):
+            stackTime = timeCall(lambda: sum(1 for _ in topIcon.traverse(order)), reps)
+            recursiveTime = timeCall(lambda: sum(1 for _ in recursiveTraverse(topIcon,
+                order)), reps)
+            print(f"traverse depth {depth} ({iconCount} icons) {order}: "
+                f"recursive {recursiveTime:.3f}ms, stack {stackTime:.3f}ms")
+        window.removeIcons(list(topIcon.traverse()))
+
+def benchmarkScroll(window, stmtCount=10000, step=python_g.SCROLL_INCR * 3):
+    """Scroll top to bottom through a file of stmtCount statements, step pixels at a
+    time, with and without blit scrolling (shifting the existing window image and
+    redrawing just the exposed strip), and report the average time per step and the
+    number of redraw tiles per step."""
+    text = "\n".join(f"a{i} = b[{i}] + f(c, d={i}) * 'x'" for i in range(stmtCount))
+    topIcons = loadText(window, text)
+    window._updateScrollRanges()
+    xMin, yMin, xMax, yMax = window.scrollExtent
+    height = window.image.height
+    origBlitScrolling = python_g.BLIT_SCROLLING
+    for blitScrolling in (False, True):
+        python_g.BLIT_SCROLLING = blitScrolling
+        window.scrollOrigin = 0, yMin
+        window.refresh(redraw=True)
+        if hasattr(window.display, 'clear'):
+            window.display.clear()
+        stats = window.refreshRequests
+        startTiles = stats.tilesDrawn
+        steps = 0
+        startTime = time.perf_counter()
+        for y in range(yMin + step, yMax - height, step):
+            oldScrollOrigin = window.scrollOrigin
+            window.scrollOrigin = 0, y
+            window.refreshScrolled(oldScrollOrigin)
+            steps += 1
+        elapsed = (time.perf_counter() - startTime) * 1000.0
+        pixelsDrawn = getattr(window.display, 'pixelsDrawn', 0)
+        # (A file that fits in the window doesn't scroll at all)
+        steps = max(1, steps)
+        print(f"scroll {stmtCount} statements, {steps} steps of {step} pixels, "
+            f"{'blit' if blitScrolling else 'full redraw'}: {elapsed / steps:.3f}ms, "
+            f"{(stats.tilesDrawn - startTiles) / steps:.1f} tiles per step, "
+            f"{pixelsDrawn // steps} pixels transferred per step")
+    python_g.BLIT_SCROLLING = origBlitScrolling
+    window.scrollOrigin = 0, 0
+    window.removeIcons([ic for topIc in topIcons for ic in topIc.traverse()])
+
+def benchmarkGlyphs(window, tokenCount=5000):
+    """Render tokenCount distinct identifiers with iconBoxedText, both via the glyph
+    atlas and via ImageDraw.text, and report the time per token for each, along with
+    how far the atlas renderings differ from the ImageDraw renderings (maximum pixel
+    difference and the number of tokens that differ at all)."""
+    tokens = [f"name{i}_{'xyzWAVEfij'[i % 10:]}" for i in range(tokenCount)]
+    fonts = ((icon.globalFont, icon.BLACK), (icon.boldFont, icon.KEYWORD_COLOR),
+        (icon.textFont, icon.BLACK))
+    origAtlasText = icon.GLYPH_ATLAS_TEXT
+    renderings = {}
+    for atlasText in (False, True):
+        icon.GLYPH_ATLAS_TEXT = atlasText
+        icon.renderCache.clear()
+        icon.glyphAtlases.clear()
+        startTime = time.perf_counter()
+        renderings[atlasText] = [icon.iconBoxedText(token, font, color)
+            for font, color in fonts for token in tokens]
+        elapsed = (time.perf_counter() - startTime) * 1000.0
+        print(f"glyphs {'atlas' if atlasText else 'ImageDraw.text'}: "
+            f"{elapsed / len(renderings[atlasText]):.3f}ms per token")
+    icon.GLYPH_ATLAS_TEXT = origAtlasText
+    icon.renderCache.clear()
+    maxDiff = differing = 0
+    for drawnImg, atlasImg in zip(renderings[False], renderings[True]):
+        diffLow, diffHigh = ImageChops.difference(drawnImg.convert('RGB'),
+            atlasImg.convert('RGB')).convert('L').getextrema()
+        if diffHigh > 0:
+            differing += 1
+            maxDiff = max(maxDiff, diffHigh)
+    print(f"glyphs parity: {differing} of {len(renderings[True])} tokens differ, "
+        f"maximum pixel difference {maxDiff}")
+
+def benchmarkBands(window, stmtCount=2000, reps=10):
+    """Redraw the full window on a file of stmtCount statements, drawing serially and
+    in parallel bands with 2 and 4 threads (see python_g.REDRAW_THREADS), and report the
+    average time per redraw, and whether the stitched-together image matches the image
+    drawn serially."""
+    text = "\n".join(f"a{i} = b[{i}] + f(c, d={i}) * 'x'" for i in range(stmtCount))
+    topIcons = loadText(window, text)
+    window.scrollOrigin = 0, 0
+    origRedrawThreads = python_g.REDRAW_THREADS
+    serialImage = None
+    for threadCount in (1, 2, 4):
+        python_g.REDRAW_THREADS = threadCount
+        window.redraw()
+        elapsed = timeCall(window.redraw, reps)
+        if serialImage is None:
+            serialImage = window.image.copy()
+            parity = ""
+        else:
+            diffBox = ImageChops.difference(serialImage, window.image).getbbox()
+            parity = ", matches serial" if diffBox is None else \
+                f", DIFFERS from serial in {diffBox}"
+        print(f"bands {threadCount} thread{'s' if threadCount > 1 else ''}: "
+            f"{elapsed:.3f}ms per redraw{parity}")
+    python_g.REDRAW_THREADS = origRedrawThreads
+    window.removeIcons([ic for topIc in topIcons for ic in topIc.traverse()])
+
+def benchmarkOpen(window, stmtCount=20000):
+    """Open a (temporary) file of stmtCount statements with and without deferred layout
+    (see python_g.DEFERRED_LAYOUT_THRESHOLD), and report the time from the start of the
+    open to the first paint of the window, and the number of pages left deferred."""
+    text = "\n".join(f"a{i} = b[{i}] + f(c, d={i}) * 'x'" for i in range(stmtCount))
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write(text)
+    origThreshold = python_g.DEFERRED_LAYOUT_THRESHOLD
+    for threshold in (None, origThreshold):
+        python_g.DEFERRED_LAYOUT_THRESHOLD = threshold
+        window.scrollOrigin = 0, 0
+        startTime = time.perf_counter()
+        window.openFile(f.name)
+        elapsed = (time.perf_counter() - startTime) * 1000.0
+        print(f"open {stmtCount} statements, "
+            f"{'full' if threshold is None else 'deferred'} layout: {elapsed:.1f}ms to "
+            f"first paint, {len(window.deferredPages)} pages deferred")
+        topIcons = list(icon.traverseSeq(window.modSeqIcon.sites.seqOut.att))
+        window.removeIcons([ic for topIc in topIcons for ic in topIc.traverse()])
+    python_g.DEFERRED_LAYOUT_THRESHOLD = origThreshold
+    os.remove(f.name)
+
+def benchmarkListLayout(window, elemCount=300, reps=5):
+    """Re-lay out a statement holding a list of elemCount elements (as happens on each
+    keystroke typed in to it), with the normal and refinement list layout budgets (see
+    iconlayout.LIST_LAYOUT_BUDGET), and report the time per layout, the dimensions of
+    the resulting layout, and the list layout statistics."""
+    elems = ", ".join(f"f(a{i}, b[{i}])" if i % 10 == 0 else f"a{i}"
+        for i in range(elemCount))
+    topIcons = loadText(window, f"x = [{elems}]")
+    lastIcon = list(topIcons[0].traverse())[-1]
+    origBudget = iconlayout.LIST_LAYOUT_BUDGET
+    for budget in (origBudget, iconlayout.LIST_LAYOUT_REFINE_BUDGET):
+        iconlayout.LIST_LAYOUT_BUDGET = budget
+        iconlayout.listLayoutStats.clear()
+        def relayout():
+            # Dirty the last icon of the statement, as typing in to it would
+            lastIcon.markLayoutDirty()
+            window.layoutDirtyIcons(filterRedundantParens=False)
+        elapsed = timeCall(relayout, reps)
+        l, t, r, b = topIcons[0].hierRect()
+        print(f"list layout {elemCount} elements, budget {budget}: {elapsed:.1f}ms, "
+            f"{r - l}x{b - t} pixels, {iconlayout.listLayoutStats.stats()}")
+    iconlayout.LIST_LAYOUT_BUDGET = origBudget
+    window.listLayoutsToRefine.clear()
+    window.removeIcons([ic for topIc in topIcons for ic in topIc.traverse()])
+
+benchmarks = {
+    'traverse': benchmarkTraverse,
+    'scroll': benchmarkScroll,
+    'glyphs': benchmarkGlyphs,
+    'bands': benchmarkBands,
+    'open': benchmarkOpen,
+    'listlayout': benchmarkListLayout,
+}
+
+if __name__ == '__main__':
+    benchmarkWindow = makeWindow()
+    for benchmarkName in sys.argv[1:] if len(sys.argv) > 1 else benchmarks:
+        if benchmarkName not in benchmarks:
+            print(f"Unknown benchmark: {benchmarkName}, choose from:",
+                ", ".join(benchmarks))
+            continue
+        benchmarks[benchmarkName](benchmarkWindow)
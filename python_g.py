@@ -25,13 +25,16 @@ import subscripticon
 import undo
 import filefmt
 import expredit
-from PIL import Image, ImageDraw, ImageWin, ImageGrab, ImageEnhance
+from PIL import Image, ImageDraw, ImageGrab, ImageEnhance
 import time
 import tkinter.messagebox
-import ctypes
 import reorderexpr
 import contextlib
 import sys
+import bisect
+import threading
+import concurrent.futures
+import display
 # import cProfile
 
 WINDOW_BG_COLOR = (255, 255, 255)
@@ -59,6 +62,13 @@ DOUBLE_CLICK_TIME = 300
 
 CURSOR_BLINK_RATE = 500
 
+# Maximum rate (per second) at which mouse motion updates drags and selections.  Mice
+# with high polling rates can deliver motion events faster than a drag can be redrawn,
+# so rather than process each one, motion events arriving sooner than 1/MAX_MOTION_RATE
+# seconds after the last update are coalesced in to a single (timer-driven) update at
+# the latest pointer position.  Set to 0 to process every motion event as it arrives.
+MAX_MOTION_RATE = 60
+
 # Nominal range in pixels for snapping to a site
 SNAP_DIST = 8
 
@@ -109,6 +119,73 @@ HIER_SELECT_STEP_DIST = 15
 # but not objectionable.
 PAGE_SPLIT_THRESHOLD = 100
 
+# Layout visits only the pages registered in the window's dirtyPages set, so a page that
+# is marked dirty without being registered would silently never be laid out.  Setting
+# CHECK_DIRTY_PAGES to True makes layoutDirtyIcons scan every page after each layout
+# pass for pages marked dirty but not registered, and raise an AssertionError if it finds
+# any.  This costs a walk over every page, so is for debugging (and testing).
+CHECK_DIRTY_PAGES = False
+
+# Files whose module sequence has more than this many statements are opened with
+# deferred layout: rather than laying out the entire file before the window is first
+# drawn, only the pages in and around the visible area are laid out.  The remaining
+# pages are given positions and heights estimated from their statement counts (at
+# DEFERRED_LAYOUT_STMT_HEIGHT pixels per statement), and are laid out as they are
+# scrolled in to view, or as something needs their actual positions.  Set to None to
+# always lay out the whole file on open.
+DEFERRED_LAYOUT_THRESHOLD = 1000
+DEFERRED_LAYOUT_STMT_HEIGHT = 20
+
+# Once a file has been opened with deferred layout, the remaining deferred pages are laid
+# out in the background (nearest to the view, first), from Tk timer callbacks, so that
+# scroll extents and icon positions become exact soon after the file is opened.  Each
+# callback lays out pages for at most BACKGROUND_LAYOUT_SLICE milliseconds, and waits
+# BACKGROUND_LAYOUT_INTERVAL milliseconds before the next, leaving the event loop free
+# to process input in between.  Keystrokes put off the next slice by
+# BACKGROUND_LAYOUT_INPUT_DELAY milliseconds, so layout never competes with typing.  The
+# same callbacks also re-lay out lists whose layout ran out of budget (see
+# iconlayout.LIST_LAYOUT_BUDGET), one list per callback, once typing pauses.  Set
+# BACKGROUND_LAYOUT to False to leave deferred pages until they are needed, and lists
+# with their budget-limited layouts.
+BACKGROUND_LAYOUT = True
+BACKGROUND_LAYOUT_SLICE = 15
+BACKGROUND_LAYOUT_INTERVAL = 10
+BACKGROUND_LAYOUT_INPUT_DELAY = 500
+
+# Height (in pixels) of the horizontal bands into which each page's icon index divides
+# the page for locating icons by position.  Icons are registered in every band that
+# their rectangle touches, so a search only needs to examine icons in the bands that
+# the search rectangle touches, rather than every icon on the page.  Something around
+# the height of a line of code keeps the candidate lists short without registering
+# multi-line icons in too many bands.
+ICON_INDEX_BAND_HEIGHT = 32
+
+# Size (width and height, in pixels) of the tiles by which areas of the window needing
+# redraw are tracked.  Rather than merging all redraw requests in to one bounding
+# rectangle, the window marks the tiles each request touches, and redraws only those.
+# Smaller tiles waste less effort redrawing around small changes, but generate more
+# (smaller) redraw and blit operations.
+REDRAW_TILE_SIZE = 128
+
+# Scroll by shifting the existing content of the window image by the scroll distance and
+# redrawing only the newly exposed strips along the edges, rather than redrawing the
+# entire window.  Turning this off restores full redraws on every scroll step, which is
+# useful for comparing performance and for ruling out the shift as the source of a
+# drawing glitch.
+BLIT_SCROLLING = True
+
+# Number of threads to use for redrawing large areas of the window.  Above 1, a redraw of
+# a region at least PARALLEL_REDRAW_MIN_HEIGHT pixels tall is split in to horizontal
+# bands (cut at page boundaries where one is close to an even split), and each band is
+# drawn in to its own image by a pool of worker threads, before being pasted in to the
+# window image.  How much this helps depends on how much of the drawing time is spent in
+# Pillow (pasting and compositing, which release the GIL, so can overlap) as opposed to
+# Python code (finding, clipping, and traversing icons, which can't).  Since the Python
+# part is usually the larger, 1 (drawing everything on the calling thread) is the
+# default.  Benchmark with "python perfbench.py bands" before raising it.
+REDRAW_THREADS = 1
+PARALLEL_REDRAW_MIN_HEIGHT = 300
+
 # Maximum line width in characters for save-file and copy/paste text
 DEFAULT_SAVE_FILE_MARGIN = 100
 # Number of columns to indent in save-file and copy/paste text
@@ -123,6 +200,19 @@ TYPING_ERR_HOLD_TIME = 5000
 # enough to read but light enough to be able to make out text underneath, which allows
 # users to see icons highlighted for replacement.
 DRAG_OVLY_OPACITY = 0.25
+# Above these sizes (number of dragged icons, or pixel area of the dragged icons), the
+# drag image is rendered as a preview covering only the part of the dragged icons that
+# can appear in the window while the pointer is in it (the area within a window width
+# and height of the point where the user grabbed them), rather than all of them.  With
+# large selections, rendering, making the transparent copy, and cropping and pasting
+# the full drag image on every pointer movement would make dragging sluggish.
+# Snapping still uses the positions of all of the dragged icons.
+DRAG_PREVIEW_ICON_THRESHOLD = 2000
+DRAG_PREVIEW_PIXEL_THRESHOLD = 3000 * 1000
+# In preview mode (see above), draw just a box around the full extent of the dragged
+# icons rather than the icons themselves.
+DRAG_PREVIEW_OUTLINE_ONLY = False
+DRAG_PREVIEW_BOX_COLOR = (0, 0, 160, 255)
 # Number of pixels around the drag insertion point to bring into view via autoscroll as
 # the user drags icons around the window.
 DRAG_AUTOSCROLL_MARGIN = 9
@@ -254,17 +344,9 @@ noAppendIcons = {blockicons.ElseIcon, blockicons.TryIcon, blockicons.FinallyIcon
 
 # Notes on window drawing:
 #
-# Tkinter canvas can't handle individual images for each icon.  After about 4000
-# pixmaps, it breaks and dies.  Drawing directly to the screen is also problematic.
-# Here, we have a Windows-only solution, provided by ImageWin module of pillow.  This
-# is a kind-of messed up module which gets very little use due to bugs and poor
-# documentation.  While it doesn't give us direct access to the windows framebuffer,
-# it does allow us to copy data there from a PIL image in a two-step process that is
-# sufficiently fast for the purposes of this program.
-#
-# Presumably for a cross platform version, it should be possible to get the equivalent
-# of a window handle from tkinter to allow us to write pixmaps to the display within a
-# tkinter window.
+# Icons are drawn to a PIL image covering the window (Window.image), which is then
+# transferred to the display via one of the backends in display.py.  See the notes
+# there for the reasons behind this approach.
 
 # UI Notes:
 #
@@ -320,7 +402,6 @@ class Window:
             else:
                 self.winName = filename
                 self.filename = filename
-        self.top.title(WIN_TITLE_PREFIX + self.winName)
         outerFrame = tk.Frame(self.top)
         self.menubar = tk.Menu(outerFrame)
         menu = tk.Menu(self.menubar, tearoff=0)
@@ -373,6 +454,13 @@ class Window:
         self.imgFrame.bind('<ButtonRelease-3>', self._btn3ReleaseCb)
         self.imgFrame.bind("<Motion>", self._motionCb)
         self.imgFrame.bind("<MouseWheel>", self._mouseWheelCb)
+        # Keystrokes are bound on the top-level window, where key-specific bindings
+        # prevent a general binding from seeing them all.  To see every keystroke for
+        # preempting background layout, give the image frame (which holds the focus
+        # while editing) an extra binding tag of its own, ahead of its others.
+        inputTag = str(self.imgFrame) + '-input'
+        self.imgFrame.bindtags((inputTag,) + self.imgFrame.bindtags())
+        self.imgFrame.bind_class(inputTag, "<KeyPress>", self._preemptBackgroundLayoutCb)
         self.top.bind("<FocusIn>", self._focusInCb)
         self.top.bind("<FocusOut>", self._focusOutCb)
         self.top.bind("<Control-n>", self._newCb)
@@ -399,6 +487,7 @@ class Window:
         self.top.bind("<Right>", self._arrowCb)
         self.top.bind("<Key>", self._keyCb)
         self.top.bind("<Control-d>", self._dumpCb)
+        self.top.bind("<Control-Shift-D>", self._dumpPerfStatsCb)
         self.top.bind("<Control-l>", self._debugLayoutCb)
         self.top.bind("<Alt-l>", self._undebugLayoutCb)
         self.top.bind("<KeyRelease-Alt_L>", self._altReleaseCb)
@@ -492,6 +581,19 @@ class Window:
         # .sequences holds the first Page structure for each sequence in the window.  The
         # ordering the list controls which icons are drawn on top when sequences overlap.
         self.sequences = []
+        # .pageTables maps the first page of each sequence in .sequences to a PageTable
+        # holding the sequence's pages and their y extents in sorted arrays, so that the
+        # pages overlapping a given y range can be found by binary search.  Tables are
+        # built on demand, and discarded when pages are added, removed, or split.
+        self.pageTables = {}
+        # .dirtyPages holds the pages that have been marked as needing layout (by
+        # Page.markLayoutDirty) since the last layoutDirtyIcons call, so that it can go
+        # straight to them, rather than searching every page of every sequence.
+        self.dirtyPages = set()
+        # .deferredPages holds the pages whose layout has been put off until they are
+        # needed (see deferPageLayouts and DEFERRED_LAYOUT_THRESHOLD).  Their y extents
+        # are estimates, and the icons on them have not yet been laid out.
+        self.deferredPages = set()
         # .topIcons maps icons at the top of the parent hierarchy to the page structures
         # (see above) that index those sequences.  When edits are made and layouts need
         # to be updated, they are batched and done per-page.
@@ -500,7 +602,8 @@ class Window:
         self.selectedSet = set()
         self.image = Image.new('RGB', (width, height), color=WINDOW_BG_COLOR)
         self.draw = ImageDraw.Draw(self.image)
-        self.dc = None
+        # Backend for transferring self.image to the screen (see display.py)
+        self.display = display.createDisplay(self.imgFrame)
         self.execResultPositions = {}
         self.undo = undo.UndoRedoList(self)
         self.macroParser = filefmt.MacroParser()
@@ -521,7 +624,13 @@ class Window:
         # already filled in to the right of the cursor.
         self.activeTypeovers = set()
         # Accumulates screen area needing refresh, to be processed by refreshDirty()
-        self.refreshRequests = comn.AccumRects()
+        self.refreshRequests = DirtyTiles(self)
+        # While the window is being redrawn, a list of empty-site highlights waiting to
+        # be blended in to the window image (see redraw), otherwise None
+        self.emptySiteTints = None
+        # During a parallel redraw, .renderTargets.target holds the RenderTarget for the
+        # band being drawn by the current (worker) thread (see renderTarget)
+        self.renderTargets = threading.local()
         # Pending request for autoscroll, set via self.requestScroll(), and processed via
         # self.refreshDirty().  Value depends upon type of scroll requested.
         self.scrollRequest = None
@@ -530,6 +639,24 @@ class Window:
         # ID of tkinter callback request for calling _updateDrag while the mouse is
         # outside of the window (and not moving) to continue autoscroll
         self.pendingAutoscroll = None
+        # ID of tkinter callback request for processing coalesced mouse motion (see
+        # _motionCb), time of the last motion update, and counters for motion events
+        # received and updates actually processed (see _dumpPerfStatsCb)
+        self.pendingMotion = None
+        self.lastMotionTime = 0
+        self.motionEventsReceived = 0
+        self.motionEventsProcessed = 0
+        # ID of tkinter callback request for the next slice of background layout (see
+        # _backgroundLayoutCb), and the number of pages that were deferred when the file
+        # was opened, and the last percentage shown in the window title, for reporting
+        # progress (see backgroundLayoutProgress)
+        self.pendingBackgroundLayout = None
+        self.backgroundLayoutTotal = 0
+        self.backgroundLayoutPctShown = None
+        self._updateTitle()
+        # List layout managers (iconlayout.ListLayoutMgr) whose last layout ran out of
+        # budget, to be laid out again in the background (see requestListLayoutRefinement)
+        self.listLayoutsToRefine = set()
         # Set if icons marked with dirty layouts should also be run through redundant
         # parenthesis removal.
         self.redundantParenFilterRequested = False
@@ -543,7 +670,7 @@ class Window:
         # needs to be clearly visible.
         with self.pauseUndoRecording():
             self.modSeqIcon = ModuleAnchorIcon(self)
-        page = Page(forModSeq=self.modSeqIcon)
+        page = Page(self, forModSeq=self.modSeqIcon)
         self.sequences.append(page)
         self.topIcons[self.modSeqIcon] = page
         self.cursor = cursors.Cursor(self, 'icon', ic=self.modSeqIcon, site='seqOut')
@@ -566,16 +693,32 @@ class Window:
         for seq in seqs:
             self.addTop(seq)
         print('start layout', time.monotonic())
-        redrawRect = self.layoutDirtyIcons(filterRedundantParens=False)
+        modSeqStmtCount = sum(page.iconCount for page in
+            self.topIcons[self.modSeqIcon].traversePages())
+        if DEFERRED_LAYOUT_THRESHOLD is not None and \
+                modSeqStmtCount > DEFERRED_LAYOUT_THRESHOLD:
+            # Lay out just what's needed for the first view (and any code outside of
+            # the module sequence, which is positioned absolutely and rarely large)
+            self.deferPageLayouts()
+            redrawRegion = comn.DamageRects()
+            redrawRegion.add(self.layoutDirtyIcons(filterRedundantParens=False))
+            redrawRegion.add(self.layoutDeferredPages(self.deferredLayoutRect()))
+            redrawRegion = None if redrawRegion.isEmpty() else redrawRegion
+        else:
+            redrawRegion = self.layoutDirtyIcons(filterRedundantParens=False)
         print('finish layout', time.monotonic())
         print('start draw', time.monotonic())
-        self.redraw(redrawRect, clear=False)
+        self.redraw(redrawRegion, clear=False)
         print('finish draw', time.monotonic())
-        self.refresh(redrawRect, clear=False, redraw=False)
+        self.refresh(redrawRegion, clear=False, redraw=False)
         self.undo.addBoundary()
+        self.scheduleBackgroundLayout()
         return True
 
     def close(self):
+        if self.pendingBackgroundLayout is not None:
+            self.top.after_cancel(self.pendingBackgroundLayout)
+            self.pendingBackgroundLayout = None
         self.top.destroy()
 
     def selectedIcons(self, excludeEmptySites=False):
@@ -726,6 +869,7 @@ class Window:
         self.doubleClickFlag = False
 
     def _btn3ReleaseCb(self, evt):
+        self._flushMotion()
         if self.buttonDownTime is None:
             return
         if self.dragging:
@@ -846,7 +990,7 @@ class Window:
         if ext == ".pyg":
             self.filename = filename
             self.winName = filename
-            self.top.title(WIN_TITLE_PREFIX + self.winName)
+            self._updateTitle()
 
     def _configureCb(self, evt):
         """Called when window is initially displayed or resized, and also when scroll
@@ -870,10 +1014,11 @@ class Window:
                     else:
                         ptrY = self.top.winfo_pointery() - self.top.winfo_rooty()
                     if ptrY >= self.image.height:
-                        nudgeMouseCursor(0, heightChange)
+                        display.nudgeMouseCursor(self.imgFrame, 0, heightChange)
             # Re-allocate the backing store to fit the new window size.
             self.image = Image.new('RGB', (evt.width, evt.height), color=WINDOW_BG_COLOR)
             self.draw = ImageDraw.Draw(self.image)
+        self.display.resize(evt.width, evt.height)
         self._updateScrollRanges()
         self.redraw()
 
@@ -914,16 +1059,21 @@ class Window:
         # (must include area under x scroll bar, since automatic removal will expose).
         windowBottom = scrollOriginY + windowHeight + int(self.xScrollbar.cget('width'))
         for seqStartPage in self.sequences:
-            for page in seqStartPage.traversePages():
-                yMin = 0 if page.startIcon is self.modSeqIcon else min(page.topY, yMin)
-                yMax = max(page.bottomY, yMax)
-                if page.bottomY >= scrollOriginY and page.topY <= windowBottom:
-                    page.applyOffset()
-                    for ic in page.traverseSeq(hier=True, inclStmtComments=True):
-                        l, t, r, b = ic.rect
-                        if b >= scrollOriginY and t <= windowBottom:
-                            xMin = min(ic.rect[0], xMin)
-                            xMax = max(ic.rect[2], xMax)
+            pageTable = self.pageTable(seqStartPage)
+            # Pages are stacked top to bottom, so the first and last pages of the
+            # sequence bound its y extent (the module anchor page is a special case).
+            if seqStartPage.startIcon is not self.modSeqIcon:
+                yMin = min(pageTable.topYs[0], yMin)
+            elif len(pageTable.pages) > 1:
+                yMin = min(pageTable.topYs[1], yMin)
+            yMax = max(pageTable.bottomYs[-1], yMax)
+            for page in pageTable.pagesInRange(scrollOriginY, windowBottom):
+                page.applyOffset()
+                for ic in page.traverseSeq(hier=True, inclStmtComments=True):
+                    l, t, r, b = ic.rect
+                    if b >= scrollOriginY and t <= windowBottom:
+                        xMin = min(ic.rect[0], xMin)
+                        xMax = max(ic.rect[2], xMax)
         xMax += SCROLL_RIGHT_PAD
         yMax += SCROLL_BOTTOM_PAD
         if scrollOriginX < xMin:
@@ -942,7 +1092,8 @@ class Window:
         return xMin, yMin, xMax, yMax
 
     def _xScrollCb(self, scrollOp, fract, unit=None):
-        scrollOriginX, scrollOriginY = self.scrollOrigin
+        origScrollOrigin = self.scrollOrigin
+        scrollOriginX, scrollOriginY = origScrollOrigin
         if scrollOp == tk.SCROLL:
             if unit == tk.UNITS:
                 delta = SCROLL_INCR * int(fract)
@@ -960,10 +1111,11 @@ class Window:
             xMin, yMin, xMax, yMax = self.scrollExtent
             self.scrollOrigin = xMin + int((xMax - xMin) * float(fract)), scrollOriginY
         self._updateScrollRanges()
-        self.refresh(redraw=True)
+        self.refreshScrolled(origScrollOrigin)
 
     def _yScrollCb(self, scrollOp, fract, unit=None):
-        scrollOriginX, scrollOriginY = self.scrollOrigin
+        origScrollOrigin = self.scrollOrigin
+        scrollOriginX, scrollOriginY = origScrollOrigin
         if scrollOp == tk.SCROLL:
             if unit == tk.UNITS:
                 delta = SCROLL_INCR * int(fract)
@@ -982,7 +1134,7 @@ class Window:
             xMin, yMin, xMax, yMax = self.scrollExtent
             self.scrollOrigin = scrollOriginX, yMin + int((yMax - yMin) * float(fract))
         self._updateScrollRanges()
-        self.refresh(redraw=True)
+        self.refreshScrolled(origScrollOrigin)
 
     def scrollTo(self, scrollToRect, redraw=True):
         """Scroll the window such that scrollToRect is brought into view."""
@@ -1010,10 +1162,16 @@ class Window:
             self.scrollOrigin = newXOrigin, newYOrigin
         self._updateScrollRanges()
         if redraw:
-            self.refresh(redraw=True)
+            self.refreshScrolled((left, top))
         return True
 
     def scrollToCursor(self, redraw=True):
+        if len(self.deferredPages) > 0 and self.cursor.icon is not None:
+            # The cursor outline needs the actual position of the icon it's on
+            page = self.topIcons.get(self.cursor.icon.topLevelParent())
+            if page is not None and page.layoutDeferred:
+                self.refreshRequests.add(self.layoutDeferredPages((0, page.topY, 0,
+                    page.bottomY)))
         cursorOutline = self.cursor.getOutline(addAutoscrollMargin=True)
         if cursorOutline is None:
             return False
@@ -1079,7 +1237,7 @@ class Window:
         self.scrollOrigin = newScrollOrigin
         self._updateScrollRanges()
         if redraw:
-            self.refresh(redraw=True)
+            self.refreshScrolled((left, top))
         self.autoscrollTimestamp = newTimestamp
         return True
 
@@ -1351,20 +1509,20 @@ class Window:
             return
         shiftPressed = evt.state & SHIFT_MASK
         ctrlPressed = evt.state & CTRL_MASK
-        if self.dragging is not None:
-            self._updateDrag()
-            return
-        if self.inRectSelect:
-            self._updateRectSelect()
-            return
-        if self.inStmtSelect:
-            self._updateStmtSelect()
-            return
-        if self.inLexSelDrag:
-            self._updateLexSelDrag()
-            return
-        if self.inImmediateDrag:
-            self._updateImmediateSelDrag()
+        if self.dragging is not None or self.inRectSelect or self.inStmtSelect or \
+                self.inLexSelDrag or self.inImmediateDrag:
+            # The update functions read the pointer position themselves, so events
+            # arriving while an update is already scheduled can simply be dropped, and
+            # the scheduled update will pick up the latest position (see MAX_MOTION_RATE)
+            self.motionEventsReceived += 1
+            if self.pendingMotion is not None:
+                return
+            delay = 0 if MAX_MOTION_RATE <= 0 else \
+                self.lastMotionTime + 1000 // MAX_MOTION_RATE - msTime()
+            if delay <= 0:
+                self._processMotion()
+            else:
+                self.pendingMotion = self.top.after(delay, self._processMotion)
             return
         # Not currently dragging, but button is down
         btnX, btnY = self.buttonDownLoc
@@ -1454,7 +1612,8 @@ class Window:
 
     def _mouseWheelCb(self, evt):
         delta = -int(evt.delta * MOUSE_WHEEL_SCALE)
-        scrollOriginX, scrollOriginY = self.scrollOrigin
+        origScrollOrigin = self.scrollOrigin
+        scrollOriginX, scrollOriginY = origScrollOrigin
         left, top, right, bottom = self.scrollExtent
         newYOrigin = scrollOriginY + delta
         if delta < 0 and newYOrigin < top:
@@ -1465,7 +1624,7 @@ class Window:
             return
         self.scrollOrigin = scrollOriginX,  newYOrigin
         self._updateScrollRanges()
-        self.refresh(redraw=True)
+        self.refreshScrolled(origScrollOrigin)
 
     def _focusInCb(self, evt):
         # This is a workaround for a weird issue with the text widget in the output pane.
@@ -1557,7 +1716,8 @@ class Window:
                 # cursor in the window, thus accounting for font, spacing, and layout.
                 oldCursorX, oldCursorY = oldCursorLoc
                 newCursorX, newCursorY = entryIc.cursorWindowPos()
-                nudgeMouseCursor(newCursorX - oldCursorX, newCursorY - oldCursorY)
+                display.nudgeMouseCursor(self.imgFrame, newCursorX - oldCursorX,
+                    newCursorY - oldCursorY)
             else:
                 self._select(ic)
             return
@@ -1579,7 +1739,34 @@ class Window:
                 evt.state & CTRL_MASK):
             self.unselectAll()
 
+    def _processMotion(self):
+        """Update the drag or selection in progress for the current pointer position.
+        Called from _motionCb, either directly or (when motion events are arriving
+        faster than MAX_MOTION_RATE) from a timer, to process all of the motion since
+        the last update at once."""
+        self.pendingMotion = None
+        self.lastMotionTime = msTime()
+        self.motionEventsProcessed += 1
+        if self.dragging is not None:
+            self._updateDrag()
+        elif self.inRectSelect:
+            self._updateRectSelect()
+        elif self.inStmtSelect:
+            self._updateStmtSelect()
+        elif self.inLexSelDrag:
+            self._updateLexSelDrag()
+        elif self.inImmediateDrag:
+            self._updateImmediateSelDrag()
+
+    def _flushMotion(self):
+        """If a coalesced motion update is waiting on its timer, process it now, so that
+        a drag or selection ends where the pointer was last seen moving."""
+        if self.pendingMotion is not None:
+            self.top.after_cancel(self.pendingMotion)
+            self._processMotion()
+
     def _buttonReleaseCb(self, evt):
+        self._flushMotion()
         if evt.state & ALT_MASK:
             self.suppressAltReleaseAction = True
         if self.buttonDownTime is None:
@@ -1977,7 +2164,7 @@ class Window:
         print('finish layout', time.monotonic())
         if self.refreshRequests.get() is not None:
             print('start redraw/refresh', time.monotonic())
-            self.refresh(self.refreshRequests.get(), redraw=True)
+            self.refresh(self.refreshRequests, redraw=True)
             print('end redraw/refresh', time.monotonic())
             self.refreshRequests.clear()
         self.undo.addBoundary()
@@ -2615,17 +2802,40 @@ class Window:
         moveRegion = comn.AccumRects()
         for ic in topDraggingIcons:
             moveRegion.add(ic.hierRect())
-        el, et, er, eb = moveRegion.get()
+        draggingIcons = [ic for topIc in topDraggingIcons for ic in
+            topIc.traverse(inclStmtComment=True)]
+        fullLeft, fullTop, fullRight, fullBottom = moveRegion.get()
+        inPreviewMode = len(draggingIcons) > DRAG_PREVIEW_ICON_THRESHOLD or \
+            comn.rectArea(moveRegion.get()) > DRAG_PREVIEW_PIXEL_THRESHOLD
+        if inPreviewMode:
+            # Render only the part of the dragged icons within a window width and height
+            # of the grab point (see DRAG_PREVIEW_ICON_THRESHOLD).  The drag image origin
+            # (to which the dragged icon rectangles are made relative, below) becomes the
+            # corner of that area.
+            btnX, btnY = self.buttonDownLoc
+            winWidth, winHeight = self.image.size
+            el, et = max(fullLeft, btnX - winWidth), max(fullTop, btnY - winHeight)
+            er, eb = min(fullRight, btnX + winWidth), min(fullBottom, btnY + winHeight)
+        else:
+            el, et, er, eb = fullLeft, fullTop, fullRight, fullBottom
         self.dragImageOffset = el - self.buttonDownLoc[0], et - self.buttonDownLoc[1]
         self.dragImage = Image.new('RGBA', (er - el, eb - et), color=(0, 0, 0, 0))
         self.lastDragImageRegion = None
-        for topIc in topDraggingIcons:
-            for ic in topIc.traverse(inclStmtComment=True):
-                ic.rect = comn.offsetRect(ic.rect, -el, -et)
-                ic.draw(self.dragImage, style=icon.STYLE_OUTLINE)
-        for ic in topDraggingIcons:
-            icon.drawSeqRule(ic, image=self.dragImage)
-            icon.drawSeqSiteConnection(ic, image=self.dragImage)
+        dragImageRect = 0, 0, er - el, eb - et
+        for ic in draggingIcons:
+            ic.rect = comn.offsetRect(ic.rect, -el, -et)
+        if inPreviewMode and DRAG_PREVIEW_OUTLINE_ONLY:
+            ImageDraw.Draw(self.dragImage).rectangle((fullLeft - el, fullTop - et,
+                fullRight - el - 1, fullBottom - et - 1), outline=DRAG_PREVIEW_BOX_COLOR)
+        else:
+            for ic in draggingIcons:
+                if not inPreviewMode:
+                    ic.draw(self.dragImage, style=icon.STYLE_OUTLINE)
+                elif comn.rectsTouch(ic.rect, dragImageRect):
+                    ic.draw(self.dragImage, clip=dragImageRect, style=icon.STYLE_OUTLINE)
+            for ic in topDraggingIcons:
+                icon.drawSeqRule(ic, image=self.dragImage)
+                icon.drawSeqSiteConnection(ic, image=self.dragImage)
         # Make an additional transparent copy of the drag image to use when snapped to a
         # replacement site
         alphaImage = self.dragImage.getchannel('A')
@@ -3011,13 +3221,26 @@ class Window:
             self._computeDragSnapList()
             if self.dragTagetModePtrOffset is None:
                 self.snapped = None
-            self.refresh(redraw=True, showOutlines=True)
+            self.refreshScrolled(origScrollOrig, showOutlines=True)
         # Erase the old drag image (unless we've autoscrolled, in which case it's already
-        # erased) and draw the new one directly to the window, ignoring the backing store
-        if self.scrollOrigin == origScrollOrig:
-            if self.lastDragImageRegion is not None:
-                for r in exposedRegions(self.lastDragImageRegion, dragImageRegion):
-                    self.refresh(r, redraw=False)
+        # erased) and draw the new one directly to the window, ignoring the backing store.
+        # self.image holds the outlined window background for the whole drag (it is only
+        # redrawn to change replace-highlighting or scroll), so erasing needs no icon
+        # drawing, just a copy from self.image.  When the old and new positions overlap
+        # enough, compose the restored background and the new drag image off-screen,
+        # and transfer both to the display in a single operation.
+        if self.scrollOrigin == origScrollOrig and self.lastDragImageRegion is not None:
+            combined = comn.combineRects(self.lastDragImageRegion, dragImageRegion)
+            if comn.rectArea(combined) <= comn.rectArea(self.lastDragImageRegion) + \
+                    comn.rectArea(dragImageRegion) + comn.DAMAGE_RECT_OVERHEAD:
+                frameImage = self.image.crop(self.contentToImageRect(combined))
+                frameImage.paste(dragImage, (snappedX - combined[0],
+                    snappedY - combined[1]))
+                self.drawImage(frameImage, self.contentToImageCoord(*combined[:2]))
+                self.lastDragImageRegion = dragImageRegion
+                return
+            for r in exposedRegions(self.lastDragImageRegion, dragImageRegion):
+                self.refresh(r, redraw=False)
         self.drawImage(dragImage, self.contentToImageCoord(snappedX, snappedY))
         self.lastDragImageRegion = dragImageRegion
 
@@ -3378,7 +3601,9 @@ class Window:
         if self.scrollOrigin == origScrollOrig:
             self.refresh(redrawRegion.get(), redraw=True)
         else:
-            self.refresh(redraw=True)
+            self.refreshScrolled(origScrollOrig)
+            if redrawRegion.get() is not None:
+                self.refresh(redrawRegion.get(), redraw=True)
         # Draw the selection shading
         for drawRect in drawRects:
             drawImgRect = self.contentToImageRect(drawRect)
@@ -3933,7 +4158,13 @@ class Window:
         is reserved for the small number of cases where the background is already known
         to be cleared (in earlier versions, this flag could be used more liberally, but
         the drawing model now allows for transparency via alpha blending, so clearing is
-        required to stop transparent regions from building-up with repeated drawing)."""
+        required to stop transparent regions from building-up with repeated drawing).
+        region can be either a rectangle or a comn.DamageRects region."""
+        if isinstance(region, comn.DamageRects):
+            for rect in region.rects:
+                self.redraw(rect, clear, showOutlines)
+            return
+        self.cursor.invalidatePatches(region)
         left, top = self.scrollOrigin
         width, height = self.image.size
         right, bottom = left + width, top + height
@@ -3950,8 +4181,29 @@ class Window:
         # order returned from findIconsInRegion.  Sequence lines must be drawn on top of
         # the icons they connect but below any icons that might be placed on top of them.
         drawStyle = icon.STYLE_OUTLINE if showOutlines else 0
-        for ic in self.findIconsInRegion(region, inclSeqRules=True, inclModSeqIcon=True):
+        bands = self._parallelRedrawBands(region)
+        if bands is not None:
+            self._redrawParallel(region, bands, drawStyle, showOutlines)
+            return
+        # Empty site highlights are collected while each icon is drawn, and blended in
+        # to the window image in one batch per icon (see icon.compositeEmptySiteTints)
+        self.emptySiteTints = []
+        self._drawIcons(self, self.findIconsInRegion(region, inclSeqRules=True,
+            inclModSeqIcon=True), region, drawStyle, showOutlines)
+        self.emptySiteTints = None
+
+    @staticmethod
+    def _drawIcons(target, icons, region, drawStyle, showOutlines):
+        """Draw icons (as returned by findIconsInRegion) clipped to region, along with
+        their sequence rules and (in outline mode) sequence site connectors, to target
+        (the window, or a RenderTarget, see renderTarget).  The empty site highlights
+        that each icon collects in target.emptySiteTints are blended in to the image
+        right after the icon is drawn, before anything that may be drawn over them."""
+        for ic in icons:
             ic.draw(clip=region, style=drawStyle)
+            if target.emptySiteTints:
+                icon.compositeEmptySiteTints(target.image, target.emptySiteTints)
+                target.emptySiteTints.clear()
             # Since sequenced icons are usually close together, drawing lines along the
             # innermost scope probably adds more "chart junk" than it contributes to
             # clarity, so we limit it to outline-mode, where it guides the user to where
@@ -3961,6 +4213,85 @@ class Window:
             if icon.seqRuleTouches(ic, region):
                 icon.drawSeqRule(ic, clip=region)
 
+    def _parallelRedrawBands(self, region):
+        """Return a list of horizontal bands (content coordinate rectangles) covering
+        region, for redrawing it in parallel, or None if it should be drawn on the
+        calling thread (see REDRAW_THREADS).  Cuts between bands are placed at the top of
+        a page, where there is one within a quarter of a band of the even-split position,
+        so that most pages are searched and drawn by just one of the workers."""
+        if REDRAW_THREADS <= 1:
+            return None
+        left, top, right, bottom = region
+        if bottom - top < PARALLEL_REDRAW_MIN_HEIGHT or right <= left:
+            return None
+        pageTops = sorted({page.topY for seqStartPage in self.sequences
+            for page in self.pageTable(seqStartPage).pagesInRange(top, bottom)
+            if top < page.topY < bottom})
+        bandHeight = (bottom - top) / REDRAW_THREADS
+        cuts = [top, bottom]
+        for i in range(1, REDRAW_THREADS):
+            evenCut = top + round(i * bandHeight)
+            idx = bisect.bisect_left(pageTops, evenCut)
+            nearbyTops = pageTops[max(0, idx - 1):idx + 1]
+            cut = min(nearbyTops, key=lambda y: abs(y - evenCut), default=evenCut)
+            cuts.append(cut if abs(cut - evenCut) <= bandHeight / 4 else evenCut)
+        cuts = sorted(set(cuts))
+        return [(left, t, right, b) for t, b in zip(cuts, cuts[1:])]
+
+    def _redrawParallel(self, region, bands, drawStyle, showOutlines):
+        """Redraw the (already cleared) bands of region, each in to its own image on
+        a worker thread from the redraw pool, and paste the results in to the window
+        image.  Each band draws every icon, sequence rule, and empty site highlight that
+        touches it, in the same order as a serial redraw, clipped to the band, so the
+        stitched result is the same as drawing the whole region at once."""
+        # Anything that modifies shared state is done here on the calling thread before
+        # handing off to the workers: finding icons builds page tables and icon indexes
+        # on demand and applies pending page offsets, and drawing an icon for the first
+        # time creates its drawList (filling the text caches) and its sprite.  Icons
+        # without a drawList are drawn once in to a discarded scratch target for this.
+        bandIcons = [self.findIconsInRegion(band, inclSeqRules=True,
+            inclModSeqIcon=True) for band in bands]
+        # findIconsInRegion appends the owners of sequence rules that start above the
+        # searched rectangle after the icons in it, so their rules would be drawn over
+        # the sequence site connectors that a serial redraw of the whole region draws on
+        # top of them.  Put the icons of each band in the order of the serial redraw.
+        drawOrder = {ic: i for i, ic in enumerate(self.findIconsInRegion(region,
+            inclSeqRules=True, inclModSeqIcon=True))}
+        for icons in bandIcons:
+            icons.sort(key=drawOrder.__getitem__)
+        self.renderTargets.target = RenderTarget(Image.new('RGB', (1, 1)), (0, 0))
+        try:
+            for band, icons in zip(bands, bandIcons):
+                for ic in icons:
+                    if ic.drawList is None:
+                        ic.draw(clip=band, style=drawStyle)
+                    ic.prepareSprite()
+        finally:
+            self.renderTargets.target = None
+        def drawBand(band, icons):
+            l, t, r, b = band
+            target = RenderTarget(Image.new('RGB', (r - l, b - t), WINDOW_BG_COLOR),
+                (l, t))
+            self.renderTargets.target = target
+            try:
+                self._drawIcons(target, icons, band, drawStyle, showOutlines)
+            finally:
+                self.renderTargets.target = None
+            return target.image
+        pool = redrawThreadPool()
+        futures = [pool.submit(drawBand, band, icons)
+            for band, icons in zip(bands, bandIcons)]
+        for band, future in zip(bands, futures):
+            self.image.paste(future.result(), self.contentToImageCoord(*band[:2]))
+
+    def renderTarget(self):
+        """Return the object to which icons should direct drawing to the window: the
+        provider of .image, .draw, .scrollOrigin, .emptySiteTints, and
+        contentToImageCoord.  This is the window itself, except on the worker threads of
+        a parallel redraw, where it's the RenderTarget for the band being drawn."""
+        target = getattr(self.renderTargets, 'target', None)
+        return self if target is None else target
+
     def _dumpCb(self, evt=None):
         for seqStartPage in self.sequences:
             if seqStartPage.startIcon is self.modSeqIcon:
@@ -3984,6 +4315,24 @@ class Window:
                 ic = self.cursor.icon
                 print(f"String {ic.dumpName()}, {ic.cursorPos}")
 
+    def _dumpPerfStatsCb(self, evt=None):
+        """Print performance counters (debug)"""
+        tiles = self.refreshRequests
+        print(f"Redraw tiles: {tiles.tilesDrawnLastFrame} drawn last frame, "
+              f"{tiles.tilesDrawn} in {tiles.framesDrawn} frames")
+        print(f"Motion events: {self.motionEventsReceived} received, "
+              f"{self.motionEventsProcessed} processed, "
+              f"{self.motionEventsReceived - self.motionEventsProcessed} dropped")
+        print(f"Deferred layout: {len(self.deferredPages)} of "
+              f"{self.backgroundLayoutTotal} pages remaining")
+        print(f"List layout: {iconlayout.listLayoutStats.stats()}, "
+              f"{len(self.listLayoutsToRefine)} waiting to be refined")
+        print(f"Tint cache: {icon.tintCache.stats()}")
+        print(f"Text image cache: {icon.renderCache.stats()}")
+        print(f"Text size cache: {icon.textSizeCache.stats()}")
+        spriteCount, spriteBytes = icon.spriteMemoryUsage()
+        print(f"Icon sprites: {spriteCount} holding {spriteBytes / 1024:.0f}KB")
+
     def _debugLayoutCb(self, evt):
         topIcons = findTopIcons(self.selectedIcons(excludeEmptySites=True))
         for ic in topIcons:
@@ -4010,8 +4359,35 @@ class Window:
          this does *not* process pending refresh requests in self.refreshRequests, which
          will still be pending after the call.  Also be careful about passing regions
          from comn.AccumRects, which use None to indicate an empty region, whereas this
-         call, conversely, uses None to indicate that the *entire window* be redrawn."""
+         call, conversely, uses None to indicate that the *entire window* be redrawn.
+         region can also be a DirtyTiles object (such as self.refreshRequests), in which
+         case only the marked tiles are redrawn and transferred to the display, or a
+         comn.DamageRects region, in which case each of its rectangles is.  When
+         redrawing, deferred pages (see deferPageLayouts) in or near the view are laid
+         out first, and if that changes what's in view, the whole window is redrawn."""
+        if redraw and self._layoutDeferredPagesInView():
+            region = None
+        if isinstance(region, DirtyTiles):
+            tileRects = region.rects()
+            if redraw:
+                region.countFrame(sum(map(region.tileCount, tileRects)))
+            for rect in tileRects:
+                self.cursor.invalidatePatches(rect)
+                if redraw:
+                    self.redraw(rect, clear, showOutlines)
+                imageRect = self.contentToImageRect(rect)
+                self.drawImage(self.image, (imageRect[0], imageRect[1]), imageRect)
+            return
+        if isinstance(region, comn.DamageRects):
+            for rect in region.rects:
+                self.refresh(rect, redraw, clear, showOutlines)
+            return
+        # Anything transferred to the display may have been drawn to the window image
+        # outside of redraw, so saved cursor images of the area can't be trusted
+        self.cursor.invalidatePatches(region)
         if redraw:
+            self.refreshRequests.countFrame(self.refreshRequests.tileCount(
+                self.visibleRect() if region is None else region))
             self.redraw(region, clear, showOutlines)
         if region is None:
             self.drawImage(self.image, (0, 0))
@@ -4019,6 +4395,50 @@ class Window:
             region = self.contentToImageRect(region)
             self.drawImage(self.image, (region[0], region[1]), region)
 
+    def refreshScrolled(self, oldScrollOrigin, showOutlines=False):
+        """Bring the window up to date after its scroll origin has changed from
+        oldScrollOrigin to self.scrollOrigin.  Rather than redrawing the whole window,
+        shifts the existing content of the pseudo-framebuffer (self.image) by the scroll
+        distance, and redraws only the strips along the edges that the shift exposed,
+        before transferring the image to the display.  This relies on self.image holding
+        an up-to-date rendering of the view at the old scroll origin (cursors, selection
+        rectangles and shading, and drag images are drawn directly to the display and
+        never enter self.image, so they don't get dragged along).  showOutlines must
+        match the style in which the window was last drawn (set during drag), as the
+        exposed strips need to agree with the content that was shifted.  Falls back to a
+        full redraw if the window moved by its full width or height, or if blit
+        scrolling is turned off (BLIT_SCROLLING), or if laying out deferred pages
+        scrolled in to view (see deferPageLayouts) changed what's in view."""
+        if self._layoutDeferredPagesInView():
+            self.refresh(redraw=True, showOutlines=showOutlines)
+            return
+        oldX, oldY = oldScrollOrigin
+        newX, newY = self.scrollOrigin
+        dx = newX - oldX
+        dy = newY - oldY
+        width, height = self.image.size
+        if not BLIT_SCROLLING or abs(dx) >= width or abs(dy) >= height:
+            self.refresh(redraw=True, showOutlines=showOutlines)
+            return
+        if dx == 0 and dy == 0:
+            return
+        self.cursor.invalidatePatches()
+        # Shift the retained content.  PIL's paste copies from a separate (cropped)
+        # image, so the overlap between source and destination is not a problem.
+        retained = self.image.crop((max(0, dx), max(0, dy), width + min(0, dx),
+            height + min(0, dy)))
+        self.image.paste(retained, (max(0, -dx), max(0, -dy)))
+        # Redraw the exposed strips.  When scrolling diagonally, the horizontal and
+        # vertical strips overlap at a corner, which just gets drawn twice.
+        newView = self.visibleRect()
+        oldView = comn.offsetRect(newView, -dx, -dy)
+        exposed = exposedRegions(newView, oldView)
+        self.refreshRequests.countFrame(sum(map(self.refreshRequests.tileCount,
+            exposed)))
+        for rect in exposed:
+            self.redraw(rect, showOutlines=showOutlines)
+        self.drawImage(self.image, (0, 0))
+
     def requestRedraw(self, redrawArea, filterRedundantParens=False):
         """Add a rectangle (redrawArea) to the requested area to be redrawn on the next
         call to refreshDirty.  Setting filterRedundantParens to True will additionally
@@ -4065,7 +4485,7 @@ class Window:
         if redrawAll:
             self.refresh(redraw=True)
         elif self.refreshRequests.get() is not None:
-            self.refresh(self.refreshRequests.get(), redraw=True)
+            self.refresh(self.refreshRequests, redraw=True)
         if addUndoBoundary:
             self.undo.addBoundary()
         self.refreshRequests.clear()
@@ -4083,22 +4503,24 @@ class Window:
             winWidth, winHeight = self.image.size
             x1, y1, x2, y2 = subImage
             subImage = max(0, x1), max(0, y1), min(winWidth, x2), min(winHeight, y2)
+            if subImage[2] <= subImage[0] or subImage[3] <= subImage[1]:
+                # (Damage regions from layout can include rectangles entirely outside
+                # of the window)
+                return
             location = max(0, location[0]), max(0, location[1])
             image = image.crop(subImage)
         if image.width == 0 or image.height == 0:
             return
-        dib = ImageWin.Dib('RGB', (image.width, image.height))
-        dib.paste(image)
-        x, y = location
-        # While the documentation says that Dib.draw can take a window handle,
-        # it really can't.  If you pass the integer ID, it doesn't know that
-        # it has a window handle.  And if you pass it the output from
-        # ImageWin.HWND, it tries to use it as an integer and fails.  Here,
-        # we're using an undocumented internal function to get the device
-        # context from the window ID
-        if self.dc is None:
-            self.dc = dib.image.getdc(self.imgFrame.winfo_id())
-        dib.draw(self.dc, (x, y, x + image.width, y + image.height))
+        self.display.draw(image, location)
+
+    def pageTable(self, seqStartPage):
+        """Return the PageTable for the sequence starting with seqStartPage (building it
+        if necessary)."""
+        pageTable = self.pageTables.get(seqStartPage)
+        if pageTable is None:
+            pageTable = PageTable(seqStartPage)
+            self.pageTables[seqStartPage] = pageTable
+        return pageTable
 
     def findIconsInRegion(self, rect=None, inclSeqRules=False, order='draw',
             inclModSeqIcon=False):
@@ -4120,15 +4542,16 @@ class Window:
         seqRuleSeed = None
         sequences = reversed(self.sequences) if order == "pick" else self.sequences
         for seqStartPage in sequences:
-            for page in seqStartPage.traversePages():
-                if page.bottomY >= rect[1] and page.topY <= bottom:
-                    page.applyOffset()
+            for page in self.pageTable(seqStartPage).pagesInRange(top, bottom):
+                page.applyOffset()
+                for ic in page.iconIndex(order).iconsInRect(rect):
+                    if inclModSeqIcon or ic is not self.modSeqIcon:
+                        iconsInRegion.append(ic)
+                if inclSeqRules and seqRuleSeed is None:
                     for topIc in page.traverseSeq(inclModSeqIcon=inclModSeqIcon):
-                        for ic in topIc.traverse(order=order, inclStmtComment=True):
-                            if comn.rectsTouch(rect, ic.rect):
-                                iconsInRegion.append(ic)
-                        if inclSeqRules and seqRuleSeed is None and topIc.rect[1] >= top:
+                        if topIc.rect[1] >= top:
                             seqRuleSeed = topIc
+                            break
         if inclSeqRules and seqRuleSeed is not None:
             alreadyCollected = set(iconsInRegion)
             # Follow code blocks up to the top of the sequence to find the start for each
@@ -4168,42 +4591,41 @@ class Window:
 
     def findIconAt(self, x, y, includeEmptySites=False):
         for seqStartPage in reversed(self.sequences):
-            for page in seqStartPage.traversePages():
-                if page.bottomY >= y >= page.topY:
-                    page.applyOffset()
-                    for ic in page.traverseSeq(order="pick", hier=True,
-                            inclStmtComments=True):
-                        if ic.touchesPosition(x, y):
-                            return ic
-                        if includeEmptySites:
-                            touchesSite = ic.touchesEmptySeriesSite(x, y)
-                            if touchesSite:
-                                return (ic, touchesSite)
+            for page in self.pageTable(seqStartPage).pagesInRange(y, y):
+                page.applyOffset()
+                for ic in page.iconIndex("pick").iconsNearY(y):
+                    if ic is self.modSeqIcon:
+                        continue
+                    if ic.touchesPosition(x, y):
+                        return ic
+                    if includeEmptySites:
+                        touchesSite = ic.touchesEmptySeriesSite(x, y)
+                        if touchesSite:
+                            return (ic, touchesSite)
         return None
 
     def _leftOfSeq(self, x, y):
         """Return top level icon near x,y if x,y is in the appropriate zone to start a
         statement-selection"""
         for seqStartPage in self.sequences:
-            for page in seqStartPage.traversePages():
-                if page.bottomY >= y >= page.topY:
-                    page.applyOffset()
-                    for ic in page.traverseSeq():
-                        if ic.hasSite('seqIn'):
-                            seqInX, seqInY = ic.posOfSite('seqIn')
-                            seqOutX, seqOutY = ic.posOfSite('seqOut')
-                            if y < seqInY:
-                                continue
-                            if seqInY <= y <= seqOutY and \
-                             seqInX - SEQ_SELECT_WIDTH <= x <= seqInX:
-                                return ic  # Point is adjacent to icon body
-                            nextIc = ic.nextInSeq()
-                            if nextIc is None:
-                                continue
-                            nextSeqInX, nextSeqInY = nextIc.posOfSite('seqIn')
-                            if seqOutY <= y < nextSeqInY and \
-                             seqOutX-SEQ_SELECT_WIDTH <= x <= seqOutX:
-                                return ic  # Point is adjacent to connector to next icon
+            for page in self.pageTable(seqStartPage).pagesInRange(y, y):
+                page.applyOffset()
+                for ic in page.traverseSeq():
+                    if ic.hasSite('seqIn'):
+                        seqInX, seqInY = ic.posOfSite('seqIn')
+                        seqOutX, seqOutY = ic.posOfSite('seqOut')
+                        if y < seqInY:
+                            continue
+                        if seqInY <= y <= seqOutY and \
+                         seqInX - SEQ_SELECT_WIDTH <= x <= seqInX:
+                            return ic  # Point is adjacent to icon body
+                        nextIc = ic.nextInSeq()
+                        if nextIc is None:
+                            continue
+                        nextSeqInX, nextSeqInY = nextIc.posOfSite('seqIn')
+                        if seqOutY <= y < nextSeqInY and \
+                         seqOutX-SEQ_SELECT_WIDTH <= x <= seqOutX:
+                            return ic  # Point is adjacent to connector to next icon
         return None
 
     def removeIcons(self, icons, assembleDeleted=False, watchSubs=None,
@@ -5580,7 +6002,7 @@ class Window:
         print('finish layout', time.monotonic())
         if self.refreshRequests.get() is not None:
             print('start redraw/refresh', time.monotonic())
-            self.refresh(self.refreshRequests.get(), redraw=True)
+            self.refresh(self.refreshRequests, redraw=True)
             print('end redraw/refresh', time.monotonic())
             self.refreshRequests.clear()
         self.undo.addBoundary()
@@ -5726,7 +6148,8 @@ class Window:
         is undone."""
         self.undo.registerRemoveFromTopLevel(ic, lastOfSeq)
         page = self.topIcons.get(ic)
-        page.layoutDirty = True
+        page.applyStmtOffset(ic)
+        page.markLayoutDirty()
         page.iconCount -= 1
         if page.iconCount == 0:
             self.removePage(page)
@@ -5754,6 +6177,9 @@ class Window:
         if pageToRemove.startIcon is self.modSeqIcon:
             print("something tried to remove the module sequence page")
             return
+        self.pageTables = {}
+        self.dirtyPages.discard(pageToRemove)
+        self.deferredPages.discard(pageToRemove)
         for seqStartPage in self.sequences:
             if seqStartPage is pageToRemove:
                 idx = self.sequences.index(pageToRemove)
@@ -5952,13 +6378,14 @@ class Window:
         if prevIcon is None:
             nextIcon = ic.nextInSeq()
             if nextIcon is None or newSeq:
-                page = Page()
+                page = Page(self)
                 page.startIcon = ic
                 pageRect = ic.rect
                 page.topY = pageRect[1]
                 page.bottomY = pageRect[3]
                 page.iconCount = 0
                 self.sequences.append(page)
+                self.pageTables = {}
             else:
                 page = self.topIcons.get(nextIcon)
                 if page is None:
@@ -5975,7 +6402,7 @@ class Window:
                 if page.startIcon is nextIcon:
                     page.startIcon = ic
         self.topIcons[ic] = page
-        page.layoutDirty = True
+        page.markLayoutDirty()
         page.iconCount += 1  # Splitting too-large pages is deferred to layout time
         # Detaching icons should remove all connections, but the consequence to
         # leaving a parent link at the top level is dire, so make sure all parent
@@ -6009,8 +6436,8 @@ class Window:
         look at all of the icons in the window.  Also combines unrelated functions of
         removing redundant parens, updating scroll bar ranges, and a portion of icon
         substitution.  These are gathered here to form the "cleanup phase" of editing
-        operations.  Returns a rectangle representing the changed areas that need to be
-        redrawn, or None if nothing changed."""
+        operations.  Returns a comn.DamageRects region representing the changed areas
+        that need to be redrawn, or None if nothing changed."""
         # Icon substitution on SliceIcons, handled here because the original substitution
         # method (still used for comprehensions) required integration into all code that
         # could copy, remove, or insert a comprehension, and therefore not feasible to
@@ -6019,38 +6446,98 @@ class Window:
         if fixSubscriptsAndSlices:
             subscripticon.convertDirtySlices(self)
         # Layout icons on the pages marked as dirty
-        redrawRegion = comn.AccumRects()
+        redrawRegion = comn.DamageRects()
         if draggingIcons is not None:
             for seq in self.findSequences(draggingIcons):
                 redraw, _, _ = self.layoutIconsInSeq(seq, filterRedundantParens)
                 redrawRegion.add(redraw)
-        else:
+        elif len(self.dirtyPages) > 0:
+            # Visit only the sequences holding pages marked dirty.  Pages marked during
+            # layout (by offset propagation or as a side effect of layout) go in to a
+            # fresh set, and are discarded from it if they get laid out in this pass.
+            # Pages not (currently) part of any window sequence are kept for next time.
+            dirtyPages = self.dirtyPages
+            self.dirtyPages = set()
+            laidOutPages = []
             for seqStartPage in self.sequences:
-                redrawRegion.add(self.layoutIconsInPage(seqStartPage, filterRedundantParens))
+                pageIdxs = self.pageTable(seqStartPage).pageIdxs
+                seqDirtyPages = [page for page in dirtyPages if page in pageIdxs]
+                if len(seqDirtyPages) > 0:
+                    dirtyPages.difference_update(seqDirtyPages)
+                    redrawRegion.add(self.layoutIconsInPage(seqStartPage,
+                        filterRedundantParens, dirtyPages=seqDirtyPages))
+                    laidOutPages += seqDirtyPages
+            self.dirtyPages.update(page for page in dirtyPages if page.layoutDirty)
+            self._applyStmtOffsets(laidOutPages)
+        if CHECK_DIRTY_PAGES:
+            self._checkDirtyPages()
+        if self.backgroundLayoutPctShown is not None:
+            # Deferred pages can also be laid out (or removed) by scrolling and editing,
+            # and background layout may not get another turn to update (or remove) the
+            # progress it put in the window title.
+            self._showBackgroundLayoutProgress()
         # Update scroll bars
         if updateScrollRanges:
             self._updateScrollRanges()
-        return redrawRegion.get()
-
-    def layoutIconsInPage(self, startPage, filterRedundantParens, checkAllForDirty=True):
+        return None if redrawRegion.isEmpty() else redrawRegion
+
+    def _checkDirtyPages(self):
+        """Debugging check (see CHECK_DIRTY_PAGES) that every page marked as needing
+        layout is registered in self.dirtyPages.  Raises AssertionError if any aren't."""
+        missing = [page for seqStartPage in self.sequences
+            for page in seqStartPage.traversePages()
+            if page.layoutDirty and page not in self.dirtyPages]
+        assert len(missing) == 0, \
+            f"{len(missing)} page(s) marked dirty but not in dirtyPages"
+
+    def _applyStmtOffsets(self, laidOutPages):
+        """Layout leaves the statements below an edit on the same page with unapplied
+        statement offsets (see Page), so that a layout that moves the same statements
+        more than once only moves their icons once.  However, a lot of code reads icon
+        rectangles directly, without going through the page structure (cursor drawing
+        and typeover, scroll-to-cursor, the file writer, text editing via hierRect, undo
+        position recording, and snapping and dragging), so once layout is finished, the
+        statement offsets of every page in laidOutPages are applied.  Pages further down
+        the sequence (moved only by propagated page offsets) are still left with their
+        offsets unapplied until they are drawn or searched, as before."""
+        for page in laidOutPages:
+            if len(page.stmtOffsets) > 0:
+                page.applyOffset()
+
+    def layoutIconsInPage(self, startPage, filterRedundantParens, checkAllForDirty=True,
+            dirtyPages=None):
         """Lay out all icons on a given page. if checkAllForDirty is True, will check the
         entire sequence following page for dirty icons and redo those layouts as well.
         If False, only startPage is assumed to require layout, and the remaining pages
-        will only be traversed if an offset needs to be propagated to them.  Side effects
-        are: splitting large pages and updating the window's scroll bars if the content
-        extent has changed."""
+        will only be traversed if an offset needs to be propagated to them.  If
+        dirtyPages is specified (a list of the pages of the sequence known to need
+        layout), traversal starts at the first of them (rather than startPage, which
+        must be the first page of the sequence), and ends once they have all been laid
+        out and no offset remains to propagate.  Side effects are: splitting large pages
+        and updating the window's scroll bars if the content extent has changed."""
         # Traverse the pages in the sequence: 1) looking for pages that need to be laid
         # out, and 2) applying accumulated changes to y position from earlier changes.
-        redrawRegion = comn.AccumRects()
+        redrawRegion = comn.DamageRects()
         offsetDelta = 0
         pagesNeedingSplit = []
-        for page in startPage.traversePages():
+        if dirtyPages is None:
+            pageTable = self.pageTables.get(startPage)
+            pages = enumerate(startPage.traversePages())
+        else:
+            pageTable = self.pageTable(startPage)
+            firstIdx = min(pageTable.pageIdxs[page] for page in dirtyPages)
+            pages = enumerate(pageTable.pages[firstIdx:], start=firstIdx)
+            dirtyPagesLeft = set(dirtyPages)
+        for pageIdx, page in pages:
+            if dirtyPages is not None:
+                dirtyPagesLeft.discard(page)
             if page.iconCount > PAGE_SPLIT_THRESHOLD:
                 pagesNeedingSplit.append(page)
             if not page.layoutDirty:
                 # The page does not need layout
                 if offsetDelta == 0:
-                    if not checkAllForDirty:
+                    if not checkAllForDirty or dirtyPages is not None and \
+                            len(dirtyPagesLeft) == 0:
                         break
                 else:
                     # The page needs offset but not layout, so just update the unapplied
@@ -6058,13 +6545,24 @@ class Window:
                     page.unappliedOffset += offsetDelta
                     page.topY += offsetDelta
                     page.bottomY += offsetDelta
+                    if pageTable is not None:
+                        pageTable.update(pageIdx)
                     windowLeft = self.scrollOrigin[0]
                     windowRight = windowLeft + self.image.width
                     redrawRegion.add((windowLeft, page.topY, windowRight, page.bottomY))
                 continue
             # The page is marked as needing layout.
+            self.dirtyPages.discard(page)
+            if page.layoutDeferred:
+                # Something marked a deferred page dirty (edited it, or needed it to be
+                # laid out), and it is getting its real layout, now.
+                page.layoutDeferred = False
+                self.deferredPages.discard(page)
             if page.startIcon.nextInSeq() is None and \
                     page.startIcon.prevInSeq(includeModuleAnchor=True) is None:
+                # (The page has been removed from self.dirtyPages, so its layoutDirty
+                # flag must also be cleared, or it would be dirty but never laid out)
+                page.layoutDirty = False
                 if isinstance(page.startIcon, ModuleAnchorIcon):
                     continue
                 # The page contains a single icon that is not part of a sequence
@@ -6072,9 +6570,12 @@ class Window:
                 if filterRedundantParens:
                     self.filterRedundantParens(page.startIcon)
                 page.startIcon.layout()
+                page.discardIconIndex()
                 pageRect = page.startIcon.hierRect()
                 page.topY = pageRect[1]
                 page.bottomY = pageRect[3]
+                if pageTable is not None:
+                    pageTable.update(pageIdx)
                 redrawRegion.add(pageRect)
                 continue
             # Traverse the sequence of icons in the page looking for icons that need to
@@ -6088,12 +6589,16 @@ class Window:
             redrawRegion.add(redrawRect)
             page.unappliedOffset = 0
             page.layoutDirty = False
+            page.discardIconIndex()
             page.bottomY = bottomY
+            if pageTable is not None:
+                pageTable.update(pageIdx)
             if page.nextPage is not None:
                 offsetDelta = bottomY - page.nextPage.topY
                 nextIcon = page.nextPage.startIcon
                 if nextIcon is not None:
                     x, y = nextIcon.pos(preferSeqIn=True)
+                    x += page.nextPage.stmtOffsets.get(nextIcon, (0, 0))[0]
                     if x != seqOutX:
                         # X shifts are rare as edits are usually balanced, but can
                         # happen: propagate to next page and force layout.
@@ -6101,13 +6606,243 @@ class Window:
                         if hasattr(nextIcon, 'stmtComment'):
                             nextIcon.stmtComment.rect = comn.offsetRect(
                                 nextIcon.stmtComment.rect, seqOutX - x, 0)
-                        page.nextPage.layoutDirty = True
+                        page.nextPage.markLayoutDirty()
                         nextIcon.markLayoutDirty()
         # If a page was found with more than PAGE_SPLIT_THRESHOLD icons, split it up
         for page in pagesNeedingSplit:
             page.split()
+        if len(pagesNeedingSplit) > 0:
+            self.pageTables.pop(startPage, None)
         # Window content likely changed, update the scroll bars
-        return redrawRegion.get()
+        return redrawRegion
+
+    def deferPageLayouts(self):
+        """Put the pages of the module sequence in to the deferred-layout state (see
+        DEFERRED_LAYOUT_THRESHOLD), so that a large file can be opened without laying out
+        all of it.  Meant to be called right after the file's icons are added to the
+        window, before anything has been laid out.  Rather than being laid out on the
+        next layoutDirtyIcons call, each page is given an estimated y extent based on its
+        statement count, and its statements are moved to where their seqIn sites would be
+        under that estimate.  The x positions follow the block indentation implied by the
+        seqIn and seqOut site offsets of the statements above, which layout won't change,
+        so pages can later be laid out in any order.  Deferred pages are laid out by
+        layoutDeferredPages, or when marked dirty by some other means (such as an edit).
+        """
+        modSeqPage = self.topIcons[self.modSeqIcon]
+        # Pages are the unit of deferral, so long pages need to be split, now, rather
+        # than after layout, as is normally done.
+        for page in list(modSeqPage.traversePages()):
+            page.split()
+        self.pageTables.pop(modSeqPage, None)
+        x = self.modSeqIcon.rect[0] + self.modSeqIcon.sites.seqOut.xOffset
+        y = self.modSeqIcon.rect[1] + self.modSeqIcon.sites.seqOut.yOffset
+        for page in modSeqPage.traversePages():
+            page.topY = y
+            for ic in page.traverseSeq():
+                if ic.rect is None or not ic.hasSite('seqIn') or \
+                        not ic.hasSite('seqOut'):
+                    continue
+                seqInX, seqInY = ic.posOfSite('seqIn')
+                ic.rect = comn.offsetRect(ic.rect, x - seqInX, y - seqInY)
+                if hasattr(ic, 'stmtComment'):
+                    ic.stmtComment.rect = comn.offsetRect(ic.stmtComment.rect,
+                        x - seqInX, y - seqInY)
+                x += ic.sites.seqOut.xOffset - ic.sites.seqIn.xOffset
+                y += DEFERRED_LAYOUT_STMT_HEIGHT
+            page.bottomY = y
+            page.unappliedOffset = 0
+            page.stmtOffsets = {}
+            page.discardIconIndex()
+            page.layoutDirty = False
+            page.layoutDeferred = True
+            self.dirtyPages.discard(page)
+            self.deferredPages.add(page)
+        self.backgroundLayoutTotal = len(self.deferredPages)
+
+    def layoutDeferredPages(self, rect=None, updateScrollRanges=True):
+        """Lay out the deferred pages (see deferPageLayouts) overlapping the (content
+        coordinate) rectangle, rect, or all of the remaining deferred pages if rect is
+        None.  Since the actual height of a page will differ from its estimate, laying it
+        out moves the pages below it (correcting the scroll range), and can pull more
+        deferred pages in to rect, so this repeats until rect is clear of them.  If pages
+        above the top of the window change height, the scroll origin is adjusted so that
+        the content in view stays put.  Returns the region (comn.DamageRects) changed by
+        layout, or None if there was nothing to lay out.  The caller is responsible for
+        redrawing, and, if updateScrollRanges is False, for updating the scroll bars."""
+        if len(self.deferredPages) == 0:
+            return None
+        modSeqPage = self.topIcons[self.modSeqIcon]
+        redrawRegion = comn.DamageRects()
+        laidOut = False
+        while True:
+            if rect is None:
+                pages = list(self.deferredPages)
+            else:
+                pages = [page for seqStartPage in self.sequences for page in
+                    self.pageTable(seqStartPage).pagesInRange(rect[1], rect[3])
+                    if page.layoutDeferred]
+            if len(pages) == 0:
+                break
+            scrollX, scrollY = self.scrollOrigin
+            viewPages = self.pageTable(modSeqPage).pagesInRange(scrollY, scrollY)
+            anchorPage = viewPages[0] if len(viewPages) > 0 else None
+            anchorTopY = None if anchorPage is None else anchorPage.topY
+            for page in pages:
+                page.layoutDeferred = False
+                self.deferredPages.discard(page)
+                page.markLayoutDirty()
+            redrawRegion.add(self.layoutDirtyIcons(filterRedundantParens=False,
+                updateScrollRanges=updateScrollRanges))
+            laidOut = True
+            if anchorPage is not None and anchorPage.topY != anchorTopY:
+                shift = anchorPage.topY - anchorTopY
+                self.scrollOrigin = scrollX, scrollY + shift
+                if rect is not None:
+                    rect = comn.offsetRect(rect, 0, shift)
+                if updateScrollRanges:
+                    self._updateScrollRanges()
+        return redrawRegion if laidOut else None
+
+    def deferredLayoutRect(self):
+        """Return the area of the window content that should be laid out to draw the
+        window: the visible area, plus a window-height above and below it, so that
+        short scrolls don't each have to stop and lay out a page."""
+        left, top, right, bottom = self.visibleRect()
+        height = bottom - top
+        return left, top - height, right, bottom + height
+
+    def scheduleBackgroundLayout(self, delay=None):
+        """Schedule the next slice of background layout of deferred pages (see
+        BACKGROUND_LAYOUT), replacing any that is already scheduled.  If delay (in
+        milliseconds) is not specified, it is run when Tk is next idle."""
+        if not BACKGROUND_LAYOUT or len(self.deferredPages) == 0 and \
+                len(self.listLayoutsToRefine) == 0:
+            return
+        if self.pendingBackgroundLayout is not None:
+            self.top.after_cancel(self.pendingBackgroundLayout)
+        if delay is None:
+            self.pendingBackgroundLayout = self.top.after_idle(self._backgroundLayoutCb)
+        else:
+            self.pendingBackgroundLayout = self.top.after(delay, self._backgroundLayoutCb)
+
+    def _backgroundLayoutCb(self):
+        """Lay out deferred pages, nearest to the view first, for up to
+        BACKGROUND_LAYOUT_SLICE milliseconds, then update the scroll bars and the
+        progress shown in the window title, and schedule the next slice."""
+        self.pendingBackgroundLayout = None
+        if len(self.deferredPages) == 0:
+            # (Pages may have all been laid out by other means while we waited)
+            self._showBackgroundLayoutProgress()
+            self._refineListLayout()
+            return
+        startTime = msTime()
+        origScrollOrigin = self.scrollOrigin
+        changedRegion = comn.DamageRects()
+        while len(self.deferredPages) > 0 and \
+                msTime() - startTime < BACKGROUND_LAYOUT_SLICE:
+            viewTop = self.scrollOrigin[1]
+            page = min(self.deferredPages, key=lambda p: abs(p.topY - viewTop))
+            changedRegion.add(self.layoutDeferredPages((0, page.topY, 0, page.topY),
+                updateScrollRanges=False))
+            # Pages leave deferredPages when laid out or removed (see removePage), so
+            # the page must have been laid out.  If not, it's not in the page tables of
+            # any window sequence, and would be picked again forever, so drop it before
+            # reporting the inconsistency.
+            strandedPage = page.layoutDeferred
+            if strandedPage:
+                page.layoutDeferred = False
+                self.deferredPages.discard(page)
+            assert not strandedPage, "Deferred page not found in window page tables"
+        self._updateScrollRanges()
+        # Pages laid out above the view move the scroll origin along with the content
+        # below them, so the window image is still good, and pages below the view don't
+        # affect it.  Anything else that was changed needs to be redrawn.
+        if self.scrollOrigin == origScrollOrigin:
+            visibleRect = self.visibleRect()
+            for rect in changedRegion.rects:
+                if comn.rectsTouch(rect, visibleRect):
+                    self.refresh(comn.clipRect(rect, visibleRect))
+        self._showBackgroundLayoutProgress()
+        self.scheduleBackgroundLayout(BACKGROUND_LAYOUT_INTERVAL)
+
+    def requestListLayoutRefinement(self, listMgr):
+        """Called by iconlayout.ListLayoutMgr.calcLayouts when it runs out of budget
+        (see iconlayout.LIST_LAYOUT_BUDGET), to have the list laid out again with a
+        larger budget, once the user pauses."""
+        self.listLayoutsToRefine.add(listMgr)
+        self.scheduleBackgroundLayout(BACKGROUND_LAYOUT_INPUT_DELAY)
+
+    def _refineListLayout(self):
+        """Lay out one of the lists in .listLayoutsToRefine again, with the larger
+        iconlayout.LIST_LAYOUT_REFINE_BUDGET, and schedule the next."""
+        if len(self.listLayoutsToRefine) == 0:
+            return
+        if self.dragging is not None or self.inRectSelect or self.inStmtSelect or \
+                self.inLexSelDrag or self.inImmediateDrag:
+            # Don't change layouts out from under a mouse operation
+            self.scheduleBackgroundLayout(BACKGROUND_LAYOUT_INPUT_DELAY)
+            return
+        while len(self.listLayoutsToRefine) > 0:
+            listMgr = self.listLayoutsToRefine.pop()
+            ic = listMgr.icon
+            topIcon = ic.topLevelParentSafe()
+            if topIcon is None or topIcon not in self.topIcons:
+                continue  # Icon has since been removed from the window
+            listMgr.refining = True
+            ic.markLayoutDirty()
+            self.refreshDirty(minimizePendingArgs=False, fixSubscriptsAndSlices=False)
+            # (If the icon no longer uses listMgr, layout won't have reset the flag)
+            listMgr.refining = False
+            break
+        self.scheduleBackgroundLayout(BACKGROUND_LAYOUT_INTERVAL)
+
+    def _preemptBackgroundLayoutCb(self, evt):
+        """Called on every keystroke in the window, to put off the next slice of
+        background layout until typing pauses."""
+        if self.pendingBackgroundLayout is not None:
+            self.scheduleBackgroundLayout(BACKGROUND_LAYOUT_INPUT_DELAY)
+
+    def backgroundLayoutProgress(self):
+        """Return the fraction (0 to 1) of the pages deferred on opening the file that
+        have since been laid out, or None if no deferred pages remain."""
+        if len(self.deferredPages) == 0 or self.backgroundLayoutTotal == 0:
+            return None
+        return 1.0 - len(self.deferredPages) / self.backgroundLayoutTotal
+
+    def _showBackgroundLayoutProgress(self):
+        """Show the progress of background layout in the window title, as in
+        "laying out 40%" (or remove it, when done)."""
+        progress = self.backgroundLayoutProgress()
+        pct = None if progress is None else int(progress * 100)
+        if pct == self.backgroundLayoutPctShown:
+            return
+        self.backgroundLayoutPctShown = pct
+        self._updateTitle()
+
+    def _updateTitle(self):
+        """Set the window title from the window name and, while background layout is
+        in progress, the percentage of it done (see _showBackgroundLayoutProgress).  All
+        changes to the title should go through here, so that renaming the window and
+        reporting progress don't overwrite each other."""
+        title = WIN_TITLE_PREFIX + self.winName
+        if self.backgroundLayoutPctShown is not None:
+            title += f" (laying out {self.backgroundLayoutPctShown}%)"
+        self.top.title(title)
+
+    def _layoutDeferredPagesInView(self):
+        """Lay out any deferred pages in or near the visible area of the window (see
+        deferredLayoutRect).  Returns True if the visible content changed as a result
+        (and therefore needs to be redrawn in full)."""
+        if len(self.deferredPages) == 0:
+            return False
+        origScrollOrigin = self.scrollOrigin
+        changedRegion = self.layoutDeferredPages(self.deferredLayoutRect())
+        if changedRegion is None:
+            return False
+        if self.scrollOrigin != origScrollOrigin:
+            return True
+        visibleRect = self.visibleRect()
+        return any(comn.rectsTouch(rect, visibleRect) for rect in changedRegion.rects)
 
     def layoutIconsInSeq(self, seqStartIcon, filterRedundantParens, fromTopY=None,
             restrictToPage=None):
@@ -6116,10 +6851,19 @@ class Window:
         If fromTop specifies a value, line up the layout below that y value.  If fromTop
         is None, position the sequence or output site of seqStartIcon identically.  If
         restrictToPage is True, stop at the end of the page rather than processing the
-        entire sequence.  Returns three values: the modified region (rectangle) of the
-        window, the new bottomY of the sequence/page, and the seqOut site offset of the
-        last icon on the page."""
-        redrawRegion = comn.AccumRects()
+        entire sequence.  Returns three values: the modified region (comn.DamageRects) of
+        the window, the new bottomY of the sequence/page, and the seqOut site offset of the
+        last icon on the page.  When laying out a window page (restrictToPage), icons
+        of statements that do not need layout, but do need to move, are not moved, but
+        instead get an unapplied statement offset recorded in the page (see Page)."""
+        redrawRegion = comn.DamageRects()
+        # Statements on window pages may have unapplied offsets from earlier layouts, so
+        # positions read from their icons must be adjusted by stmtOffset().  Sequence
+        # start icons are never given a deferred offset, as their positions are also
+        # used by code outside of the page structure (such as the file writer).
+        stmtOffsets = restrictToPage.stmtOffsets if restrictToPage is not None else {}
+        def stmtOffset(ic):
+            return stmtOffsets.get(ic, (0, 0))
         if isinstance(seqStartIcon, ModuleAnchorIcon):
             x = seqStartIcon.rect[0] + seqStartIcon.sites.seqOut.xOffset
             y = seqStartIcon.rect[1] + seqStartIcon.sites.seqOut.yOffset
@@ -6128,28 +6872,36 @@ class Window:
             if seqStartIcon is None:
                 return
         else:
-            x, y = seqStartIcon.pos(preferSeqIn=True)
+            x, y = icon.addPoints(seqStartIcon.pos(preferSeqIn=True),
+                stmtOffset(seqStartIcon))
             if fromTopY is not None:
                 y = fromTopY
         if not seqStartIcon.hasSite('seqIn'):
             # Icon can not be laid out by sequence site.  Just lay it out by itself
-            redrawRegion.add(seqStartIcon.hierRect())
+            redrawRegion.add(comn.offsetRect(seqStartIcon.hierRect(),
+                *stmtOffset(seqStartIcon)))
+            stmtOffsets.pop(seqStartIcon, None)  # layout positions absolutely
             seqStartIcon.layout((x, y))
             hierRect = seqStartIcon.hierRect()
             redrawRegion.add(hierRect)
-            return redrawRegion.get(), hierRect[3], x
+            return redrawRegion, hierRect[3], x
         if filterRedundantParens:
             # filterRedundantParens can modify sequence, so must operate on a copy
             for ic in list(icon.traverseSeq(seqStartIcon, restrictToPage=restrictToPage)):
                 if ic.layoutDirty:
                     self.filterRedundantParens(ic)
         for seqIc in icon.traverseSeq(seqStartIcon, restrictToPage=restrictToPage):
-            seqIcOrigRect = seqIc.hierRect()
+            pendingX, pendingY = stmtOffset(seqIc)
+            seqIcOrigRect = comn.offsetRect(seqIc.hierRect(), pendingX, pendingY)
             xOffsetToSeqIn, yOffsetToSeqIn = seqIc.posOfSite('seqIn')
-            yOffsetToSeqIn -= seqIcOrigRect[1]
-            if seqIc.layoutDirty or hasattr(seqIc, 'stmtComment') and \
-                    seqIc.stmtComment.layoutDirty:
+            yOffsetToSeqIn += pendingY - seqIcOrigRect[1]
+            needsLayout = seqIc.layoutDirty or hasattr(seqIc, 'stmtComment') and \
+                    seqIc.stmtComment.layoutDirty
+            if needsLayout:
                 redrawRegion.add(seqIcOrigRect)
+                # Layout positions icons absolutely, so any unapplied offset is moot
+                stmtOffsets.pop(seqIc, None)
+                pendingX = pendingY = 0
                 layout = seqIc.layout((0, 0))
                 # Find y offset from top of layout to the seqIn site by which the icon
                 # needs to be positioned.  parentSiteOffset of layout may represent either
@@ -6169,20 +6921,37 @@ class Window:
                 y += yOffsetToSeqIn
             # Figure out how much to move the icons of the statement
             seqIcX, seqIcY = seqIc.posOfSite('seqIn')
-            yOffset = y - seqIcY
-            xOffset = x - seqIcX
-            # If the icons need to be moved, offset them
+            yOffset = y - seqIcY - pendingY
+            xOffset = x - seqIcX - pendingX
+            # If the icons need to be moved, offset them.  On a window page, a statement
+            # that was not laid out is just given an (additional) unapplied offset.
             if xOffset == 0 and yOffset == 0:
-                seqIcNewRect = seqIc.hierRect()  # Already in the right place
+                # Already in the right place
+                seqIcNewRect = comn.offsetRect(seqIc.hierRect(), pendingX, pendingY)
+            elif restrictToPage is not None and not needsLayout and \
+                    seqIc.prevInSeq(includeModuleAnchor=True) is not None:
+                redrawRegion.add(seqIcOrigRect)
+                pendingX += xOffset
+                pendingY += yOffset
+                if pendingX == 0 and pendingY == 0:
+                    del stmtOffsets[seqIc]
+                else:
+                    stmtOffsets[seqIc] = pendingX, pendingY
+                seqIcNewRect = comn.offsetRect(seqIc.hierRect(), pendingX, pendingY)
+                redrawRegion.add(seqIcNewRect)
             else:
                 redrawRegion.add(seqIcOrigRect)
+                stmtOffsets.pop(seqIc, None)
+                xOffset += pendingX
+                yOffset += pendingY
+                pendingX = pendingY = 0
                 for ic in seqIc.traverse(inclStmtComment=True):
                     ic.rect = comn.offsetRect(ic.rect, xOffset, yOffset)
                 seqIcNewRect = seqIc.hierRect()
                 redrawRegion.add(seqIcNewRect)
             y = seqIcNewRect[3] - 1  # Minimal line spacing (overlap icon borders)
-            x = seqIc.posOfSite('seqOut')[0]
-        return redrawRegion.get(), y, x
+            x = seqIc.posOfSite('seqOut')[0] + pendingX
+        return redrawRegion, y, x
 
     def siteAt(self, buttonLoc):
         """Return icon and site if content coordinate, buttonLoc, is near a cursor site.
@@ -6273,6 +7042,11 @@ class Window:
     def contentToImageRect(self, contentRect):
         return comn.offsetRect(contentRect, -self.scrollOrigin[0], -self.scrollOrigin[1])
 
+    def visibleRect(self):
+        """Return the (content coordinate) rectangle of the visible area of the window"""
+        left, top = self.scrollOrigin
+        return left, top, left + self.image.width, top + self.image.height
+
     def resetBlinkTimer(self, holdTime=CURSOR_BLINK_RATE):
         """Stop pending cursor blink event and reschedule it for holdTime milliseconds in
         the future."""
@@ -6320,15 +7094,55 @@ class Page:
     issue that pages address is the need to quickly find icons by position, without
     traversing the entire tree.  The initialization for a window object can pass
     its module sequence anchor icon in forModSeq to create the module sequence start page
-    (which persists for the life of the window)."""
-    def __init__(self, forModSeq=None):
+    (which persists for the life of the window).  Pages hold a reference to their
+    window, so that they can register themselves for layout (see markLayoutDirty) even
+    before they are given a start icon.  In addition to the page-wide vertical
+    offset, the page can also hold unapplied offsets for individual statements
+    (.stmtOffsets, mapping top-level icon to x, y offset), so that when layout moves
+    the statements below an edit within the page, it only has to record the move for
+    each statement, rather than touching every icon.  Statement offsets are applied along
+    with the page offset by applyOffset.  Pages of very large files can also have their
+    layout deferred (.layoutDeferred, see Window.deferPageLayouts), in which case their
+    y extent is only an estimate until they are laid out."""
+    def __init__(self, window, forModSeq=None):
+        self.window = window
         self.unappliedOffset = 0
+        self.stmtOffsets = {}
         self.layoutDirty = False
+        self.layoutDeferred = False
         self.topY = 0
         self.bottomY = 0
         self.iconCount = 1 if forModSeq else 0
         self.startIcon = forModSeq if forModSeq else None
         self.nextPage = None
+        self.iconIndexes = {}
+
+    def markLayoutDirty(self):
+        """Mark the page as needing layout.  Since layout can move any of the icons on
+        the page, this also discards the page's icon index(es), which will be rebuilt on
+        the next search of the page.  Also adds the page to the window's list of pages
+        to lay out (see Window.dirtyPages)."""
+        self.layoutDirty = True
+        self.iconIndexes = {}
+        self.window.dirtyPages.add(self)
+
+    def discardIconIndex(self):
+        """Discard the page's icon index(es), which must be done whenever icons on the
+        page are added, removed, or moved other than via applyOffset."""
+        self.iconIndexes = {}
+
+    def iconIndex(self, order="draw"):
+        """Return a PageIconIndex for locating icons on the page by position.  order
+        ("draw" or "pick") specifies the order in which the index will return icons
+        (see traverseSeq).  The index is built on first use, and retained until the page
+        is marked dirty or laid out.  Note that the caller is responsible for calling
+        applyOffset before using the index, as it reflects actual icon positions."""
+        index = self.iconIndexes.get(order)
+        if index is None:
+            index = PageIconIndex(self.traverseSeq(hier=True, order=order,
+                inclStmtComments=True, inclModSeqIcon=True))
+            self.iconIndexes[order] = index
+        return index
 
     def split(self):
         """Split this page, if it is too long, in to as many pages as necessary to bring
@@ -6336,6 +7150,11 @@ class Page:
         origStmtCnt = self.iconCount
         if origStmtCnt <= PAGE_SPLIT_THRESHOLD:
             return
+        self.discardIconIndex()
+        # Statement offsets are held per-page, so apply them before moving statements
+        # to new pages (page offset will still be uniform and is propagated, below).
+        if len(self.stmtOffsets) > 0:
+            self.applyOffset()
         numNewPages = 1 + (origStmtCnt - 1) // PAGE_SPLIT_THRESHOLD
         newPageMax = 1 + (origStmtCnt - 1) // numNewPages
         pageStmtCnt = 0
@@ -6353,13 +7172,17 @@ class Page:
                 # number of stmts on page exceeds max.  ic should start a new page
                 page.bottomY = ic.hierRect()[1] + page.unappliedOffset
                 page.iconCount = pageStmtCnt - 1
-                newPage = Page()
+                newPage = Page(self.window)
                 newPage.nextPage = page.nextPage
                 page.nextPage = newPage
                 newPage.unappliedOffset = page.unappliedOffset
-                newPage.layoutDirty = page.layoutDirty
                 newPage.topY = page.bottomY
                 newPage.startIcon = ic
+                if page.layoutDirty:
+                    newPage.markLayoutDirty()
+                if page.layoutDeferred:
+                    newPage.layoutDeferred = True
+                    ic.window.deferredPages.add(newPage)
                 page = newPage
                 pageStmtCnt = 1
             if page is not self:
@@ -6409,14 +7232,247 @@ class Page:
 
     def applyOffset(self):
         """If the page has an unapplied offset, apply it (move all of the icons on the
-        page vertically by unappliedOffset and set it to 0)."""
-        if self.unappliedOffset == 0:
+        page vertically by unappliedOffset and set it to 0).  Also applies any unapplied
+        statement offsets (.stmtOffsets) and clears them."""
+        if self.unappliedOffset == 0 and len(self.stmtOffsets) == 0:
             return
-        for ic in self.traverseSeq(hier=True, inclStmtComments=True):
-            l, t, r, b = ic.rect
-            ic.rect = l, t + self.unappliedOffset, r, b + self.unappliedOffset
+        if len(self.stmtOffsets) == 0:
+            for ic in self.traverseSeq(hier=True, inclStmtComments=True):
+                l, t, r, b = ic.rect
+                ic.rect = l, t + self.unappliedOffset, r, b + self.unappliedOffset
+            for index in self.iconIndexes.values():
+                index.yOffset += self.unappliedOffset
+        else:
+            for topIc in self.traverseSeq():
+                xOffset, yOffset = self.stmtOffsets.get(topIc, (0, 0))
+                yOffset += self.unappliedOffset
+                if xOffset != 0 or yOffset != 0:
+                    for ic in topIc.traverse(inclStmtComment=True):
+                        ic.rect = comn.offsetRect(ic.rect, xOffset, yOffset)
+            # Statements moved by different amounts, so the index can't just be shifted
+            self.stmtOffsets = {}
+            self.discardIconIndex()
         self.unappliedOffset = 0
 
+    def applyStmtOffset(self, topIc):
+        """Apply the unapplied statement offset (if any) for a single statement, topIc,
+        and remove it from .stmtOffsets.  This does not apply the page offset."""
+        stmtOffset = self.stmtOffsets.pop(topIc, None)
+        if stmtOffset is None:
+            return
+        xOffset, yOffset = stmtOffset
+        for ic in topIc.traverse(inclStmtComment=True):
+            ic.rect = comn.offsetRect(ic.rect, xOffset, yOffset)
+        self.discardIconIndex()
+
+class PageTable:
+    """Sorted arrays of the y extents of the pages of a sequence, for finding the pages
+    covering a given y range by binary search rather than walking the page list (which
+    for a large file can have hundreds of pages).  Pages in a sequence are stacked top
+    to bottom, so both .topYs and .bottomYs are in ascending order.  Changes to page
+    extents (from layout or from propagating offsets to following pages) must be
+    reflected in the table by calling update(), but changes to the page structure itself
+    require the table to be discarded and rebuilt."""
+    def __init__(self, seqStartPage):
+        self.pages = list(seqStartPage.traversePages())
+        self.pageIdxs = {page: idx for idx, page in enumerate(self.pages)}
+        self.topYs = [page.topY for page in self.pages]
+        self.bottomYs = [page.bottomY for page in self.pages]
+
+    def update(self, pageIdx):
+        """Copy the current y extent of the page at index pageIdx in to the table"""
+        page = self.pages[pageIdx]
+        self.topYs[pageIdx] = page.topY
+        self.bottomYs[pageIdx] = page.bottomY
+
+    def pagesInRange(self, top, bottom):
+        """Return the pages whose y extent overlaps the range between top and bottom"""
+        pageIdx = bisect.bisect_left(self.bottomYs, top)
+        lastIdx = bisect.bisect_right(self.topYs, bottom, lo=pageIdx)
+        return self.pages[pageIdx:lastIdx]
+
+class RenderTarget:
+    """Off-screen stand-in for the window image, to which a worker thread of a parallel
+    redraw directs icon drawing (see Window.renderTarget).  Provides the same drawing
+    attributes as the window: .image, .draw, .scrollOrigin (here, the content coordinate
+    of the top left corner of .image), .emptySiteTints, and contentToImageCoord."""
+    def __init__(self, image, origin):
+        self.image = image
+        self.draw = ImageDraw.Draw(image)
+        self.scrollOrigin = origin
+        self.emptySiteTints = []
+
+    def contentToImageCoord(self, contentX, contentY):
+        return contentX - self.scrollOrigin[0], contentY - self.scrollOrigin[1]
+
+# Thread pool for parallel redraws (created on first use, see redrawThreadPool)
+redrawPool = None
+
+def redrawThreadPool():
+    """Return the thread pool for parallel redraws, (re)creating it if it doesn't exist
+    or REDRAW_THREADS has changed since it was created."""
+    global redrawPool
+    if redrawPool is None or redrawPool.threadCount != REDRAW_THREADS:
+        if redrawPool is not None:
+            redrawPool.shutdown(wait=False)
+        redrawPool = concurrent.futures.ThreadPoolExecutor(REDRAW_THREADS,
+            thread_name_prefix='redraw')
+        redrawPool.threadCount = REDRAW_THREADS
+    return redrawPool
+
+class DirtyTiles:
+    """Tracks the areas of a window needing redraw, as a set of marked (content
+    coordinate) tiles of size REDRAW_TILE_SIZE, so that widely separated changes can be
+    redrawn without redrawing everything between them.  Has the same add/get/clear
+    interface as comn.AccumRects, with add marking the tiles touched by a rectangle (or
+    by each rectangle of a comn.DamageRects region), and get returning a rectangle
+    enclosing all of the marked tiles.  Marking is clipped to the visible area of the
+    window at the time of the request: areas outside of it will be drawn from scratch
+    if they are scrolled in to view.  Also keeps count of the
+    number of tiles redrawn per frame (see Window.refresh), to measure redraw effort."""
+    def __init__(self, window):
+        self.window = window
+        self.tiles = set()
+        self.framesDrawn = 0
+        self.tilesDrawn = 0
+        self.tilesDrawnLastFrame = 0
+
+    def add(self, rect):
+        if rect is None:
+            return
+        if isinstance(rect, comn.DamageRects):
+            for r in rect.rects:
+                self.add(r)
+            return
+        rect = comn.clipRect(rect, self.window.visibleRect())
+        if rect is None:
+            return
+        l, t, r, b = rect
+        cols = range(l // REDRAW_TILE_SIZE, r // REDRAW_TILE_SIZE + 1)
+        for row in range(t // REDRAW_TILE_SIZE, b // REDRAW_TILE_SIZE + 1):
+            for col in cols:
+                self.tiles.add((col, row))
+
+    def get(self):
+        """Return a rectangle enclosing all of the marked tiles (or None if no tiles are
+        marked)"""
+        if len(self.tiles) == 0:
+            return None
+        cols = [col for col, row in self.tiles]
+        rows = [row for col, row in self.tiles]
+        return min(cols) * REDRAW_TILE_SIZE, min(rows) * REDRAW_TILE_SIZE, \
+            (max(cols) + 1) * REDRAW_TILE_SIZE, (max(rows) + 1) * REDRAW_TILE_SIZE
+
+    def clear(self):
+        self.tiles = set()
+
+    def rects(self):
+        """Return a list of rectangles covering the marked tiles (clipped to the visible
+        area of the window).  Horizontally adjacent tiles are combined in to runs, and
+        runs spanning the same columns in adjacent rows are combined in to rectangles,
+        to reduce the number of separate draw and blit operations."""
+        runs = {}  # Maps (firstCol, lastCol) of run to [firstRow, lastRow]
+        rects = []
+        prevRow = None
+        for col, row in sorted(self.tiles, key=lambda tile: (tile[1], tile[0])):
+            if row != prevRow or col != runEndCol + 1:
+                if prevRow is not None:
+                    self._addRun(runs, rects, runStartCol, runEndCol, prevRow)
+                runStartCol = col
+            runEndCol = col
+            prevRow = row
+        if prevRow is not None:
+            self._addRun(runs, rects, runStartCol, runEndCol, prevRow)
+        for (startCol, endCol), (startRow, endRow) in runs.items():
+            rects.append((startCol * REDRAW_TILE_SIZE, startRow * REDRAW_TILE_SIZE,
+                (endCol + 1) * REDRAW_TILE_SIZE, (endRow + 1) * REDRAW_TILE_SIZE))
+        visibleRect = self.window.visibleRect()
+        clippedRects = (comn.clipRect(rect, visibleRect) for rect in rects)
+        return [rect for rect in clippedRects if rect is not None]
+
+    @staticmethod
+    def _addRun(runs, rects, startCol, endCol, row):
+        """Extend the rectangle in runs covering the same columns on the row above, if
+        there is one, or start a new one.  Rectangles that can no longer be extended are
+        moved from runs to rects."""
+        rowRange = runs.get((startCol, endCol))
+        if rowRange is not None and rowRange[1] == row - 1:
+            rowRange[1] = row
+            return
+        if rowRange is not None:
+            rects.append((startCol * REDRAW_TILE_SIZE, rowRange[0] * REDRAW_TILE_SIZE,
+                (endCol + 1) * REDRAW_TILE_SIZE, (rowRange[1] + 1) * REDRAW_TILE_SIZE))
+        runs[(startCol, endCol)] = [row, row]
+
+    @staticmethod
+    def tileCount(rect):
+        """Return the number of tiles touched by rect"""
+        l, t, r, b = rect
+        return (r // REDRAW_TILE_SIZE - l // REDRAW_TILE_SIZE + 1) * \
+            (b // REDRAW_TILE_SIZE - t // REDRAW_TILE_SIZE + 1)
+
+    def countFrame(self, tileCount):
+        """Record the number of tiles redrawn for a frame"""
+        self.framesDrawn += 1
+        self.tilesDrawn += tileCount
+        self.tilesDrawnLastFrame = tileCount
+
+class PageIconIndex:
+    """Spatial index for locating the icons of a page by position, without traversing
+    every icon on the page.  The page is divided in to horizontal bands of height
+    ICON_INDEX_BAND_HEIGHT, each of which holds a list of the icons whose rectangles
+    touch it.  Icons are identified within the bands by their position in the traversal
+    order in which they were passed to the constructor, so the icons found in a search
+    can be sorted back in to that (draw or pick) order.  Since icons on a page are only
+    ever moved as a group via Page.applyOffset (anything else marks the page dirty and
+    discards the index), vertical motion is handled by simply adjusting yOffset."""
+    def __init__(self, icons):
+        self.icons = []
+        self.bands = {}
+        self.yOffset = 0
+        for ic in icons:
+            iconNum = len(self.icons)
+            self.icons.append(ic)
+            if ic.rect is None:
+                continue
+            _, top, _, bottom = ic.rect
+            for band in range(top // ICON_INDEX_BAND_HEIGHT,
+                    bottom // ICON_INDEX_BAND_HEIGHT + 1):
+                bandIcons = self.bands.get(band)
+                if bandIcons is None:
+                    self.bands[band] = [iconNum]
+                else:
+                    bandIcons.append(iconNum)
+        self.minBand = min(self.bands) if len(self.bands) > 0 else 0
+        self.maxBand = max(self.bands) if len(self.bands) > 0 else -1
+
+    def _candidates(self, top, bottom):
+        """Return the indices (in to self.icons) of the icons registered in the bands
+        between content y coordinates top and bottom, in traversal order."""
+        firstBand = max(self.minBand, (top - self.yOffset) // ICON_INDEX_BAND_HEIGHT)
+        lastBand = min(self.maxBand, (bottom - self.yOffset) // ICON_INDEX_BAND_HEIGHT)
+        if firstBand == lastBand:
+            return self.bands.get(firstBand, ())
+        iconNums = set()
+        for band in range(firstBand, lastBand + 1):
+            bandIcons = self.bands.get(band)
+            if bandIcons is not None:
+                iconNums.update(bandIcons)
+        return sorted(iconNums)
+
+    def iconsInRect(self, rect):
+        """Return a list of the icons whose rectangles touch rect (in traversal order)"""
+        icons = self.icons
+        rectsTouch = comn.rectsTouch
+        return [icons[i] for i in self._candidates(rect[1], rect[3])
+            if rectsTouch(rect, icons[i].rect)]
+
+    def iconsNearY(self, y):
+        """Return a list of the icons registered in the band containing y, in traversal
+        order.  The returned icons are candidates for containing y (their rectangles
+        touch the band), but must be tested further to determine if they do."""
+        return [self.icons[i] for i in self._candidates(y, y)]
+
 class ModuleAnchorIcon(icon.Icon):
     def __init__(self,  window, location=None):
         icon.Icon.__init__(self, window)
@@ -6531,12 +7587,14 @@ class App:
         self.windows = []
         self.root = tk.Tk()
         self.root.overrideredirect(1)  # Stop vestigial root window from flashing up
-        self.root.iconbitmap("python-g.ico")
+        if sys.platform == 'win32':
+            self.root.iconbitmap("python-g.ico")
         self.root.withdraw()
         self.newWindow()
         self.frameCount = 0
         self.blinkCancelId = None
         self.settings = Settings()
+        icon.setTextCacheBudget(self.settings.textCacheBudgetKB * 1024)
         self.settingsDialog = None
         #self.animate()
 
@@ -6632,8 +7690,15 @@ class SettingsDialog:
         btn.grid(row=1, column=1, sticky=tk.W)
         isFrame.columnconfigure(0, weight=1)
         isFrame.columnconfigure(0, weight=0)
+        tcFrame = tk.Frame(self.top)
+        tcFrame.grid(row=2, column=0, sticky=tk.W)
+        label = tk.Label(tcFrame, text="Text image cache size (KB):")
+        label.grid(row=0, column=0)
+        self.textCacheKB = tk.StringVar(self.top, str(self.settings.textCacheBudgetKB))
+        entry = tk.Entry(tcFrame, textvariable=self.textCacheKB, width=8)
+        entry.grid(row=0, column=1, sticky=tk.W)
         btnFrame = tk.Frame(self.top)
-        btnFrame.grid(row=2, column=0)
+        btnFrame.grid(row=3, column=0)
         cancelBtn = tk.Button(btnFrame, text='Cancel', command=self.cancel)
         cancelBtn.grid(row=0, column=0)
         acceptBtn = tk.Button(btnFrame, text='Accept', command=self.accept)
@@ -6647,12 +7712,28 @@ class SettingsDialog:
     def accept(self, evt=None):
         self.settings.createReplaceSites = self.rsType.get() == 'sites'
         self.settings.dualMethodImmedSelect = self.immedSel.get() == 'dual'
+        try:
+            textCacheKB = int(self.textCacheKB.get())
+        except ValueError:
+            textCacheKB = None
+        if textCacheKB is not None and textCacheKB >= 0:
+            self.settings.textCacheBudgetKB = textCacheKB
+            icon.setTextCacheBudget(textCacheKB * 1024)
         appData.closeSettingsDialog()
 
 class Settings:
     def __init__(self):
         self.createReplaceSites = False
         self.dualMethodImmedSelect = True
+        # Memory budget for caching rendered text (see icon.setTextCacheBudget), which
+        # can be set from the environment (PYTHON_G_TEXT_CACHE_KB) or settings dialog
+        self.textCacheBudgetKB = icon.DEFAULT_TEXT_CACHE_BUDGET // 1024
+        envBudget = os.environ.get('PYTHON_G_TEXT_CACHE_KB')
+        if envBudget is not None:
+            try:
+                self.textCacheBudgetKB = int(envBudget)
+            except ValueError:
+                print(f"Ignoring invalid PYTHON_G_TEXT_CACHE_KB value: {envBudget}")
 
 def isStmtComment(ic):
     return isinstance(ic, commenticon.CommentIcon) and ic.attachedToStmt is not None
@@ -7081,14 +8162,6 @@ class StreamToTextWidget:
 #... Move to OS-dependent module (once that's created)
 import sys
 import subprocess
-class POINT(ctypes.Structure):
-    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
-def nudgeMouseCursor(x, y):
-    cursorPos = POINT()
-    ctypes.windll.user32.GetCursorPos(ctypes.byref(cursorPos))
-    cursorPos.x += x
-    cursorPos.y += y
-    ctypes.windll.user32.SetCursorPos(cursorPos.x, cursorPos.y)
 docChmFile = None
 def openPythonDocumentation(pythonDocRef):
     global docChmFile
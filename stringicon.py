@@ -473,7 +473,7 @@ class StringIcon(icon.Icon):
         if self.sites.attrIcon.att is None:
             attrLayouts = [None]
         else:
-            attrLayouts = self.sites.attrIcon.att.calcLayouts()
+            attrLayouts = self.sites.attrIcon.att.calcLayoutsCached()
         stringLayouts = self._enumerateStringLayouts()
         layouts = []
         for attrLayout, stringLayout in iconlayout.allCombinations((attrLayouts,
@@ -221,7 +221,7 @@ class SubscriptIcon(icon.Icon):
         bodyWidth -= icon.ATTR_SITE_DEPTH
         argListLayouts = self.argList.calcLayouts()
         if self.closed and self.sites.attrIcon.att is not None:
-            attrLayouts = self.sites.attrIcon.att.calcLayouts()
+            attrLayouts = self.sites.attrIcon.att.calcLayoutsCached()
         else:
             attrLayouts = [None]
         layouts = []
@@ -570,11 +570,11 @@ class SliceIcon(icon.Icon):
     def calcLayouts(self):
         indexLayouts = stepLayouts = upperLayouts = [None]
         if self.sites.indexIcon.att is not None:
-            indexLayouts = self.sites.indexIcon.att.calcLayouts()
+            indexLayouts = self.sites.indexIcon.att.calcLayoutsCached()
         if self.sites.upperIcon.att is not None:
-            upperLayouts = self.sites.upperIcon.att.calcLayouts()
+            upperLayouts = self.sites.upperIcon.att.calcLayoutsCached()
         if hasattr(self.sites, 'stepIcon') and self.sites.stepIcon.att is not None:
-            stepLayouts = self.sites.stepIcon.att.calcLayouts()
+            stepLayouts = self.sites.stepIcon.att.calcLayoutsCached()
         layouts = []
         for indexLayout, upperLayout, stepLayout, in iconlayout.allCombinations(
                 (indexLayouts, upperLayouts, stepLayouts)):
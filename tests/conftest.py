@@ -0,0 +1,31 @@
+# Copyright Mark Edel  All rights reserved
+# Shared set-up for the python-g tests.  The tests run against a real editor window
+# (created once, and shared), drawing to the null display backend (see
+# perfbench.makeWindow).  Tk still needs a display connection to create the window (on
+# a headless machine, a virtual one, such as Xvfb, will do), and the tests are skipped
+# without one.  The files in this directory with the .pyg extension are not tests, but
+# sample files for trying out the editor by hand.
+import os
+import sys
+import tkinter
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import perfbench
+import testutil
+
+# The shared window, created on first use (see window fixture)
+sharedWindow = None
+
+@pytest.fixture
+def window():
+    """The (shared) editor window, cleared of any icons and scrolled back to the top
+    after each test."""
+    global sharedWindow
+    if sharedWindow is None:
+        try:
+            sharedWindow = perfbench.makeWindow()
+        except tkinter.TclError as exc:
+            pytest.skip(f"Tk could not create a window: {exc}")
+    yield sharedWindow
+    testutil.clearWindow(sharedWindow)
@@ -0,0 +1,16 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that Cursor.drawAndHold holds the cursor visible for a full blink cycle, using
+# the blink rate in effect when it is called (it can't be bound when cursors.py is
+# imported, as python_g, which defines it, imports cursors before finishing itself).
+import python_g
+
+def test_drawAndHoldDefault(window, monkeypatch):
+    holdTimes = []
+    monkeypatch.setattr(window, 'resetBlinkTimer',
+        lambda holdTime=None: holdTimes.append(holdTime))
+    monkeypatch.setattr(python_g, 'CURSOR_BLINK_RATE', 321)
+    window.cursor.setToWindowPos((10, 10))
+    holdTimes.clear()
+    window.cursor.drawAndHold()
+    window.cursor.drawAndHold(holdTime=50)
+    assert holdTimes == [321, 50]
@@ -0,0 +1,96 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that opening a large file with deferred layout (python_g.DEFERRED_LAYOUT_THRESHOLD)
+# and then laying out the deferred pages, in whatever order, ends up with the same icon
+# positions as laying out the whole file when it is opened.
+import pytest
+import python_g
+import testutil
+from test_memoize import SAMPLE_TEXT
+
+def largeFileText():
+    """Return the text of a file that's long enough to be split in to many pages, with
+    nested blocks (which the deferred layout estimates need to indent properly), and
+    statements of different heights."""
+    chunks = []
+    for i in range(40):
+        chunks.append(SAMPLE_TEXT)
+        chunks.append(f"class C{i}:\n    def m(self, a):\n        if a:\n"
+            f"            for j in range({i}):\n                x = [j, [j, {i}]]\n"
+            f"        return a + {i}\n")
+        chunks += [f"v{i}_{j} = w({i}, {j})" for j in range(10)]
+    return "\n".join(chunks)
+
+def openText(window, tmp_path, text):
+    filename = tmp_path / 'large.py'
+    filename.write_text(text)
+    assert window.openFile(str(filename))
+    if window.pendingBackgroundLayout is not None:
+        window.top.after_cancel(window.pendingBackgroundLayout)
+        window.pendingBackgroundLayout = None
+
+def test_deferredLayoutMatchesEager(window, monkeypatch, tmp_path):
+    text = largeFileText()
+    monkeypatch.setattr(python_g, 'DEFERRED_LAYOUT_THRESHOLD', None)
+    openText(window, tmp_path, text)
+    assert len(window.deferredPages) == 0
+    eagerRects = testutil.iconRects(window)
+    testutil.clearWindow(window)
+    # Lay out the deferred pages via layoutDeferredPages, and by the background layout
+    # callback, starting from the middle of the file (so pages are laid out both above
+    # and below the pages laid out first)
+    monkeypatch.setattr(python_g, 'DEFERRED_LAYOUT_THRESHOLD', 200)
+    for layoutAll in (window.layoutDeferredPages, window._backgroundLayoutCb):
+        openText(window, tmp_path, text)
+        assert len(window.deferredPages) > 10
+        window.scrollOrigin = 0, window.scrollExtent[3] // 2
+        window.refresh(redraw=True)
+        while len(window.deferredPages) > 0:
+            layoutAll()
+        if window.pendingBackgroundLayout is not None:
+            window.top.after_cancel(window.pendingBackgroundLayout)
+            window.pendingBackgroundLayout = None
+        assert testutil.iconRects(window) == eagerRects
+        testutil.clearWindow(window)
+
+def test_layoutProgressTitle(window, monkeypatch, tmp_path):
+    titles = []
+    monkeypatch.setattr(window.top, 'title', titles.append)
+    monkeypatch.setattr(python_g, 'DEFERRED_LAYOUT_THRESHOLD', 200)
+    monkeypatch.setattr(python_g, 'BACKGROUND_LAYOUT_SLICE', 0)
+    origName = window.winName
+    plainTitle = python_g.WIN_TITLE_PREFIX + origName
+    text = largeFileText()
+    # Background layout shows its progress, which survives renaming the window
+    openText(window, tmp_path, text)
+    window._backgroundLayoutCb()
+    assert titles[-1].startswith(plainTitle + " (laying out ")
+    monkeypatch.setattr(window, 'winName', "renamed.pyg")
+    window._updateTitle()
+    assert titles[-1].startswith(python_g.WIN_TITLE_PREFIX + "renamed.pyg (laying out ")
+    monkeypatch.setattr(window, 'winName', origName)
+    window._updateTitle()
+    # Finishing the layout by other means removes the progress from the title
+    window.layoutDeferredPages()
+    assert len(window.deferredPages) == 0
+    assert titles[-1] == plainTitle
+    testutil.clearWindow(window)
+    # So does removing the file's content while background layout is in progress
+    openText(window, tmp_path, text)
+    window._backgroundLayoutCb()
+    assert titles[-1].startswith(plainTitle + " (laying out ")
+    testutil.clearWindow(window)
+    assert titles[-1] == plainTitle
+
+def test_strandedDeferredPage(window, monkeypatch):
+    # A deferred page that isn't in any window sequence can never be laid out, so
+    # background layout must drop it (rather than picking it again on every slice), and
+    # report it
+    monkeypatch.setattr(window.top, 'after', lambda delay, callback: None)
+    monkeypatch.setattr(window.top, 'after_idle', lambda callback: None)
+    page = python_g.Page(window)
+    page.layoutDeferred = True
+    window.deferredPages.add(page)
+    with pytest.raises(AssertionError, match="Deferred page not found"):
+        window._backgroundLayoutCb()
+    assert not page.layoutDeferred
+    assert page not in window.deferredPages
@@ -0,0 +1,37 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that pages marked as needing layout are always registered in the window's
+# dirtyPages set, which is how layoutDirtyIcons finds them.
+import pytest
+import python_g
+import testutil
+
+def test_pageWithoutStartIconRegisters(window):
+    page = python_g.Page(window)
+    page.markLayoutDirty()
+    assert page in window.dirtyPages
+    window.dirtyPages.discard(page)
+
+def test_noUnregisteredDirtyPages(window, monkeypatch):
+    monkeypatch.setattr(python_g, 'CHECK_DIRTY_PAGES', True)
+    # Long enough to be split in to pages, and with a statement outside of the module
+    # sequence (which gets a page, and a sequence, of its own).  With CHECK_DIRTY_PAGES
+    # set, every layout pass checks the pages, and raises if any are unregistered.
+    stmts = testutil.loadText(window,
+        "\n".join(f"a{i} = f{i}(x, {i})" for i in range(350)))
+    window.addTop(testutil.parseText(window, "loose = 1"))
+    window.layoutDirtyIcons()
+    # Edit statements on several pages, and remove some, splitting a page on the way
+    for stmt in stmts[5:300:40]:
+        stmt.markLayoutDirty()
+    window.removeIcons([ic for stmt in stmts[100:110] for ic in stmt.traverse()])
+    window.layoutDirtyIcons()
+
+def test_unregisteredDirtyPageReported(window, monkeypatch):
+    monkeypatch.setattr(python_g, 'CHECK_DIRTY_PAGES', True)
+    stmts = testutil.loadText(window, "a = 1\nb = 2")
+    page = window.topIcons[stmts[0]]
+    page.layoutDirty = True
+    with pytest.raises(AssertionError, match="not in dirtyPages"):
+        window.layoutDirtyIcons()
+    page.markLayoutDirty()
+    window.layoutDirtyIcons()
@@ -0,0 +1,18 @@
+# Copyright Mark Edel  All rights reserved
+# Tests of display backend selection (display.createDisplay).
+import pytest
+import display
+
+def test_namedBackend():
+    assert isinstance(display.createDisplay(None, 'null'), display.NullDisplay)
+
+def test_backendFromEnvironment(monkeypatch):
+    monkeypatch.setenv('PYTHON_G_DISPLAY', 'null')
+    assert isinstance(display.createDisplay(None), display.NullDisplay)
+
+def test_unknownBackend(monkeypatch):
+    with pytest.raises(ValueError, match="nonesuch"):
+        display.createDisplay(None, 'nonesuch')
+    monkeypatch.setenv('PYTHON_G_DISPLAY', 'nul')
+    with pytest.raises(ValueError, match="nul"):
+        display.createDisplay(None)
@@ -0,0 +1,72 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that blending the empty site highlights collected during a window redraw (see
+# icon.compositeEmptySiteTints) gives the same image as blending each one with PIL as
+# it is drawn.
+import random
+import pytest
+from PIL import Image, ImageChops
+import comn
+import icon
+import testutil
+
+TINT_COLORS = [icon.EMPTY_ARG_COLOR, icon.SELECT_TINT, icon.PENDING_REMOVE_TINT,
+    icon.IMMEDIATE_COPY_TINT]
+
+@pytest.mark.skipif(icon.numpy is None, reason="NumPy is not installed")
+def test_compositeMatchesPil(monkeypatch):
+    # Random overlapping rectangles (repeating colors, so sites of the same color
+    # overlap, too) over a noisy background
+    rand = random.Random(1)
+    background = Image.frombytes('RGB', (200, 100),
+        bytes(rand.randrange(256) for _ in range(200 * 100 * 3)))
+    tints = []
+    for _ in range(40):
+        l, t = rand.randrange(190), rand.randrange(90)
+        rect = l, t, l + rand.randrange(1, 30), t + rand.randrange(1, 20)
+        rect = rect[0], rect[1], min(200, rect[2]), min(100, rect[3])
+        tints.append((rect, rand.choice(TINT_COLORS)))
+    blendedImages = []
+    for numpyModule in (None, icon.numpy):
+        monkeypatch.setattr(icon, 'numpy', numpyModule)
+        image = background.copy()
+        icon.compositeEmptySiteTints(image, tints)
+        blendedImages.append(image)
+    assert ImageChops.difference(*blendedImages).getbbox() is None
+    assert ImageChops.difference(background, blendedImages[0]).getbbox() is not None
+
+def test_redrawMatchesPil(window):
+    # Statements with empty sites (left by removing icons) inside of blocks, so their
+    # highlights are near sequence rules and (in outline mode) site connectors, and
+    # some of them selected
+    stmts = testutil.loadText(window, "\n".join(
+        f"if c{i}:\n    a{i} = f{i}(x{i}, [y{i}, z{i}], w{i} + v{i})\n    b{i}()"
+        for i in range(8)))
+    removed = [ic for stmt in stmts for ic in stmt.traverse()
+        if getattr(ic, 'name', '')[:1] in ('x', 'z', 'v')]
+    window.removeIcons(removed)
+    window.layoutDirtyIcons()
+    # An icon (outside of the module sequence, so drawn later) placed over one of the
+    # empty sites, whose highlight must be drawn below it
+    opIcon = next(ic for stmt in testutil.moduleStatements(window)
+        for ic in stmt.traverse()
+        if ic.hasSite('rightArg') and ic.childAt('rightArg') is None)
+    siteX, siteY = opIcon.posOfSite('rightArg')
+    looseIcon = testutil.parseText(window, "overlapping")[0]
+    looseIcon.rect = icon.moveRect(looseIcon.rect, (siteX + 3, siteY - 4))
+    window.addTop(looseIcon)
+    window.layoutDirtyIcons()
+    assert comn.rectsTouch(looseIcon.rect, (siteX, siteY, siteX + 10, siteY + 1))
+    for stmt in testutil.moduleStatements(window)[::3]:
+        for ic in stmt.traverse():
+            window.select(ic)
+    region = window.visibleRect()
+    for showOutlines in (False, True):
+        window.redraw(showOutlines=showOutlines)
+        batchedImage = window.image.copy()
+        # Draw the same thing with the window not collecting highlights, so each is
+        # blended with PIL when its icon draws it
+        window.clearBgRect(region)
+        window._drawIcons(window, window.findIconsInRegion(region, inclSeqRules=True,
+            inclModSeqIcon=True), region, icon.STYLE_OUTLINE if showOutlines else 0,
+            showOutlines)
+        assert ImageChops.difference(batchedImage, window.image).getbbox() is None
@@ -0,0 +1,60 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that text drawn via the glyph atlas (icon.GLYPH_ATLAS_TEXT) is pixel-identical
+# to text drawn by ImageDraw.text.
+import pytest
+from PIL import Image, ImageChops
+import icon
+
+# Strings to render: plain ASCII, underscores running under descenders (where glyph
+# masks overlap), kerned pairs, and non-ASCII text
+TEXTS = ["x", "name_y", "print_j(a_g)", "AVATAR WAVE Type", "0123456789 += -> **",
+    "'quoted' \"text\"", "héllo wörld", "Ωμέγα", "naïve façade"]
+
+FONTS = {'global': icon.globalFont, 'bold': icon.boldFont, 'text': icon.textFont}
+
+COLORS = [icon.BLACK, icon.KEYWORD_COLOR, icon.TYPEOVER_COLOR, (200, 30, 30, 255)]
+
+def renderBothWays(monkeypatch, render):
+    """Call render with text drawn by ImageDraw.text and then via the glyph atlas, and
+    return the two resulting images (converted to RGB, since getbbox on an RGBA image
+    considers only the alpha channel)."""
+    images = []
+    for atlasText in (False, True):
+        monkeypatch.setattr(icon, 'GLYPH_ATLAS_TEXT', atlasText)
+        icon.renderCache.clear()
+        icon.glyphAtlases.clear()
+        images.append(render().convert('RGB'))
+    icon.renderCache.clear()
+    return images
+
+def assertIdentical(drawnImg, atlasImg):
+    assert drawnImg.size == atlasImg.size
+    assert ImageChops.difference(drawnImg, atlasImg).getbbox() is None
+
+@pytest.mark.parametrize('fontName', FONTS)
+@pytest.mark.parametrize('color', COLORS)
+def test_plainText(monkeypatch, fontName, color):
+    font = FONTS[fontName]
+    for text in TEXTS:
+        def render():
+            image = Image.new('RGBA', (300, 30), color=(255, 255, 255, 255))
+            icon.drawText(image, (3, 4), text, font, color)
+            return image
+        assertIdentical(*renderBothWays(monkeypatch, render))
+
+@pytest.mark.parametrize('fontName', FONTS)
+def test_boxedText(monkeypatch, fontName):
+    font = FONTS[fontName]
+    for text in TEXTS:
+        for color in (icon.BLACK, icon.KEYWORD_COLOR):
+            assertIdentical(*renderBothWays(monkeypatch,
+                lambda: icon.iconBoxedText(text, font, color)))
+            # The same boxed text, drawn as a selected icon in outline style
+            assertIdentical(*renderBothWays(monkeypatch, lambda: icon.tintSelectedImage(
+                icon.iconBoxedText(text, font, color), icon.STYLE_OUTLINE)))
+
+def test_typeoverText(monkeypatch):
+    for text in TEXTS:
+        for typeover in range(len(text) + 1):
+            assertIdentical(*renderBothWays(monkeypatch,
+                lambda: icon.iconBoxedText(text, typeover=typeover)))
@@ -0,0 +1,60 @@
+# Copyright Mark Edel  All rights reserved
+# Tests of the list layout budget (iconlayout.LIST_LAYOUT_BUDGET): a list whose layout
+# runs out of budget must reach the same layout as an unlimited search once refined,
+# and must keep that layout through later edits, rather than jumping back to the
+# budget-limited one.
+import iconlayout
+import testutil
+
+# A list long enough (with enough items having multiple layouts of their own) that
+# its layout exceeds LIST_LAYOUT_BUDGET, but not LIST_LAYOUT_REFINE_BUDGET
+LIST_TEXT = "[" + ", ".join(f"f(a{i}, b[{i}])" if i % 4 == 0 else f"a{i}"
+    for i in range(30)) + "]"
+
+def listRects(window):
+    """Return the rectangles of the icons of the list (the value of the first
+    statement), relative to the list icon, so edits that move the list don't count."""
+    listIcon = testutil.moduleStatements(window)[0].sites.values[0].att
+    x, y = listIcon.rect[:2]
+    return [(l - x, t - y, r - x, b - y) for l, t, r, b in
+        (ic.rect for ic in listIcon.traverse())]
+
+def refineAll(window):
+    while len(window.listLayoutsToRefine) > 0:
+        window._refineListLayout()
+
+def test_refinedLayoutMatchesUnlimited(window, monkeypatch):
+    monkeypatch.setattr(iconlayout, 'LIST_LAYOUT_BUDGET', None)
+    testutil.loadText(window, "x = " + LIST_TEXT)
+    assert len(window.listLayoutsToRefine) == 0
+    unlimitedRects = listRects(window)
+    testutil.clearWindow(window)
+    monkeypatch.undo()
+    iconlayout.listLayoutStats.clear()
+    testutil.loadText(window, "x = " + LIST_TEXT)
+    assert iconlayout.listLayoutStats.budgetsExhausted > 0
+    assert len(window.listLayoutsToRefine) > 0
+    refineAll(window)
+    assert listRects(window) == unlimitedRects
+
+def test_overBudgetLayoutStable(window):
+    stmt = testutil.loadText(window, "x = " + LIST_TEXT)[0]
+    refineAll(window)
+    refinedRects = listRects(window)
+    # Typing in to the last item of the list re-lays out the list (which runs out of
+    # budget, again), as does anything else that changes the statement
+    lastIcon = list(stmt.traverse())[-1]
+    for _ in range(3):
+        iconlayout.listLayoutStats.clear()
+        lastIcon.markLayoutDirty()
+        window.layoutDirtyIcons()
+        assert iconlayout.listLayoutStats.budgetsExhausted > 0
+        assert listRects(window) == refinedRects
+    target = stmt.sites.targets0[0].att
+    newTarget = testutil.parseText(window, "aMuchLongerTargetName")[0]
+    stmt.replaceChild(newTarget, 'targets0_0')
+    window.layoutDirtyIcons()
+    assert listRects(window) == refinedRects
+    stmt.replaceChild(target, 'targets0_0')
+    window.layoutDirtyIcons()
+    assert listRects(window) == refinedRects
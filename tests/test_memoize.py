@@ -0,0 +1,94 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that reusing cached child layouts (icon.MEMOIZE_LAYOUTS) produces the same
+# layout as recalculating every layout from scratch, both on load and after edits, and
+# that cached layouts are discarded when an icon or any of its ancestors is marked dirty.
+import icon
+import testutil
+
+SAMPLE_TEXT = '''
+import os, sys  # module comment
+TABLE = [[1, 2, 3], [4, [5, 6, [7, 8, 9]], 10], {'a': (1, 2), 'b': [x for x in range(3)]}]
+def process(items, scale=2.5, *args, verbose=False, **kwargs):
+    """Process items"""
+    # Statement comment, long enough that it will need to be wrapped somewhere along the way when laid out in the window
+    result = {key: [value * scale for value in values if value is not None] for key, values in items.items()}
+    for index, (name, value) in enumerate(sorted(result.items(), key=lambda kv: (len(kv[1]), kv[0]))):
+        if verbose and index % 2 == 0 or name.startswith('_') and not kwargs.get('hidden', False):
+            print(f"{index}: {name}", value, sep=', ', end='\\n', file=sys.stderr)
+        else:
+            total = sum(v for v in value) + len(args) * someFunctionWithALongName(argumentNumberOne, argumentNumberTwo, argumentNumberThree, argumentNumberFour)
+    return [[a, b] for a in range(10) for b in range(a) if (a + b) % 3 == 0 and not a == b]
+while os.path.exists('/tmp/x'):
+    data = process({'first': [1, 2, 3], 'second': [4, 5, 6], 'third': [7, 8, 9, 10, 11, 12, 13, 14, 15, 16]}, verbose=True)
+'''
+
+def findIcon(window, name):
+    """Return the first identifier icon in the module sequence with the given name"""
+    return next(ic for stmt in testutil.moduleStatements(window)
+        for ic in stmt.traverse() if getattr(ic, 'name', None) == name)
+
+def replaceIcon(window, oldIcon, text):
+    """Replace oldIcon with the (expression) icon parsed from text, and mark it for
+    layout"""
+    newIcon = testutil.parseText(window, text)[0]
+    parent = oldIcon.parent()
+    parent.replaceChild(newIcon, parent.siteOf(oldIcon))
+    newIcon.markLayoutDirty()
+
+def layoutLoadAndEdit(window):
+    """Load SAMPLE_TEXT, and make a series of edits that change the layout of
+    statements deep in the file, returning the icon rectangles after loading and after
+    each edit."""
+    testutil.loadText(window, SAMPLE_TEXT)
+    rects = [testutil.iconRects(window)]
+    # Lengthen a deeply nested list, causing it (and everything enclosing it) to wrap
+    replaceIcon(window, findIcon(window, 'argumentNumberTwo'),
+        "[" + ", ".join(f"element{i}" for i in range(30)) + "]")
+    window.layoutDirtyIcons()
+    rects.append(testutil.iconRects(window))
+    # Shorten a long line, so it no longer wraps
+    replaceIcon(window, findIcon(window, 'someFunctionWithALongName').parent(), "f()")
+    window.layoutDirtyIcons()
+    rects.append(testutil.iconRects(window))
+    # Lengthen an element of a comprehension
+    replaceIcon(window, findIcon(window, 'value'), "valueWithAMuchLongerName")
+    window.layoutDirtyIcons()
+    rects.append(testutil.iconRects(window))
+    testutil.clearWindow(window)
+    return rects
+
+def test_memoizedLayoutsMatch(window, monkeypatch):
+    rectsByMode = {}
+    for memoize in (False, True):
+        monkeypatch.setattr(icon, 'MEMOIZE_LAYOUTS', memoize)
+        rectsByMode[memoize] = layoutLoadAndEdit(window)
+    for unmemoized, memoized in zip(rectsByMode[False], rectsByMode[True]):
+        assert len(unmemoized) > 100
+        assert unmemoized == memoized
+    # Make sure that each of the edits really did change the layout
+    for before, after in zip(rectsByMode[True], rectsByMode[True][1:]):
+        assert before != after
+
+def test_cachedLayoutsReused(window):
+    testutil.loadText(window, SAMPLE_TEXT)
+    listIcon = findIcon(window, 'TABLE').parent().childAt('values_0')
+    layouts = listIcon.calcLayoutsCached()
+    assert isinstance(layouts, tuple) and len(layouts) > 1
+    assert listIcon.calcLayoutsCached() is layouts
+
+def test_ancestorMarkedDirty(window):
+    # Filtering the layouts of an icon (as the layout debugging commands do) changes
+    # what it returns from calcLayouts, with only an ancestor marked dirty
+    testutil.loadText(window, SAMPLE_TEXT)
+    assignIcon = findIcon(window, 'TABLE').parent()
+    listIcon = assignIcon.childAt('values_0')
+    innerList = listIcon.childAt('argIcons_1')
+    origLayouts = innerList.calcLayoutsCached()
+    assert len(origLayouts) > 1
+    innerList.debugLayoutFilterIdx = 1
+    assignIcon.markLayoutDirty()
+    window.layoutDirtyIcons()
+    filteredLayouts = innerList.calcLayoutsCached()
+    assert len(filteredLayouts) == 1
+    assert filteredLayouts[0].badness == origLayouts[1].badness
+    assert filteredLayouts[0].width == origLayouts[1].width
@@ -0,0 +1,91 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that mouse motion arriving faster than python_g.MAX_MOTION_RATE is coalesced in
+# to single (timer-driven) updates, and that a pending update is processed, rather than
+# lost, when the button is released.
+import python_g
+
+class MotionEvent:
+    def __init__(self, x, y, state=python_g.LEFT_MOUSE_MASK):
+        self.x = x
+        self.y = y
+        self.state = state
+
+def setUpRectSelect(window, monkeypatch):
+    """Put the window in the middle of a (left-button) rectangular selection, with a
+    fake clock, timers that are recorded rather than run, and _updateRectSelect
+    replaced by a counter.  Returns a dictionary of the clock time ('now'), the list of
+    scheduled timer callbacks ('timers'), canceled timer ids ('canceled'), and the
+    number of selection updates ('updates')."""
+    state = {'now': 1000, 'timers': [], 'canceled': [], 'updates': 0}
+    def after(delay, callback):
+        state['timers'].append((delay, callback))
+        return f"after#{len(state['timers'])}"
+    def updateRectSelect():
+        state['updates'] += 1
+    monkeypatch.setattr(python_g, 'msTime', lambda: state['now'])
+    monkeypatch.setattr(window.top, 'after', after, raising=False)
+    monkeypatch.setattr(window.top, 'after_cancel', state['canceled'].append,
+        raising=False)
+    monkeypatch.setattr(window, '_updateRectSelect', updateRectSelect)
+    monkeypatch.setattr(window, 'buttonDownTime', 900)
+    monkeypatch.setattr(window, 'inRectSelect', True)
+    monkeypatch.setattr(window, 'lastMotionTime', 0)
+    monkeypatch.setattr(window, 'pendingMotion', None)
+    return state
+
+def test_motionCoalesced(window, monkeypatch):
+    monkeypatch.setattr(python_g, 'MAX_MOTION_RATE', 50)
+    state = setUpRectSelect(window, monkeypatch)
+    received = window.motionEventsReceived
+    processed = window.motionEventsProcessed
+    # The first event after a quiet period is processed immediately
+    window._motionCb(MotionEvent(10, 10))
+    assert state['updates'] == 1 and state['timers'] == []
+    # Events within 1/MAX_MOTION_RATE of it schedule one update for the remaining time,
+    # and those arriving while it's pending are dropped
+    state['now'] = 1005
+    for x in range(11, 20):
+        window._motionCb(MotionEvent(x, 10))
+    assert state['updates'] == 1
+    assert len(state['timers']) == 1
+    delay, callback = state['timers'][0]
+    assert delay == 1000 // 50 - 5
+    assert window.pendingMotion is not None
+    state['now'] = 1020
+    callback()
+    assert state['updates'] == 2 and window.pendingMotion is None
+    # Once the interval has passed, the next event is again processed immediately
+    state['now'] = 1045
+    window._motionCb(MotionEvent(30, 10))
+    assert state['updates'] == 3 and len(state['timers']) == 1
+    assert window.motionEventsReceived - received == 11
+    assert window.motionEventsProcessed - processed == 3
+
+def test_pendingMotionFlushed(window, monkeypatch):
+    monkeypatch.setattr(python_g, 'MAX_MOTION_RATE', 50)
+    state = setUpRectSelect(window, monkeypatch)
+    window._motionCb(MotionEvent(10, 10))
+    state['now'] = 1001
+    window._motionCb(MotionEvent(11, 10))
+    assert state['updates'] == 1
+    pendingId = window.pendingMotion
+    assert pendingId is not None
+    # Flushing (as button release does) cancels the timer and processes the update now
+    window._flushMotion()
+    assert state['canceled'] == [pendingId]
+    assert state['updates'] == 2 and window.pendingMotion is None
+    # With nothing pending, flushing does nothing
+    window._flushMotion()
+    assert state['updates'] == 2 and state['canceled'] == [pendingId]
+
+def test_coalescingDisabled(window, monkeypatch):
+    monkeypatch.setattr(python_g, 'MAX_MOTION_RATE', 0)
+    state = setUpRectSelect(window, monkeypatch)
+    for x in range(10, 20):
+        window._motionCb(MotionEvent(x, 10))
+    assert state['updates'] == 10 and state['timers'] == []
+
+def test_motionIgnoredWithoutButton(window, monkeypatch):
+    state = setUpRectSelect(window, monkeypatch)
+    window._motionCb(MotionEvent(10, 10, state=0))
+    assert state['updates'] == 0 and state['timers'] == []
@@ -0,0 +1,40 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that redrawing the window in parallel bands (python_g.REDRAW_THREADS) produces
+# exactly the same image as drawing it serially.
+from PIL import ImageChops
+import python_g
+import testutil
+from test_memoize import SAMPLE_TEXT
+
+def redrawImage(window, monkeypatch, threadCount, region=None, showOutlines=False):
+    """Redraw region of the window with threadCount threads, and return the window
+    image.  The image is scribbled over, first, so that any part of region that the
+    redraw missed can't pass for drawn, and the rest of the image is predictable."""
+    monkeypatch.setattr(python_g, 'REDRAW_THREADS', threadCount)
+    window.image.paste((255, 0, 255), (0, 0, *window.image.size))
+    window.redraw(region, showOutlines=showOutlines)
+    return window.image.copy().convert('RGB')
+
+def test_parallelRedrawMatchesSerial(window, monkeypatch):
+    monkeypatch.setattr(python_g, 'PARALLEL_REDRAW_MIN_HEIGHT', 10)
+    # A file long enough to span several pages (so band cuts fall both on page tops and
+    # between them), with a few icons selected, so they are drawn tinted
+    text = SAMPLE_TEXT + "\n".join(f"a{i} = b[{i}] + f(c, d={i}) * 'x'"
+        for i in range(300))
+    stmts = testutil.loadText(window, text)
+    for stmt in stmts[3:40:6]:
+        window.select(stmt)
+    width, height = window.image.size
+    for scrollY in (0, 317, 2000):
+        window.scrollOrigin = 0, scrollY
+        regions = (None, (40, scrollY + 13, width - 100, scrollY + height - 31))
+        for region in regions:
+            for showOutlines in (False, True):
+                serialImage = redrawImage(window, monkeypatch, 1, region, showOutlines)
+                for threadCount in (2, 4):
+                    parallelImage = redrawImage(window, monkeypatch, threadCount,
+                        region, showOutlines)
+                    diffBox = ImageChops.difference(serialImage,
+                        parallelImage).getbbox()
+                    assert diffBox is None, f"{threadCount} threads at {scrollY}, " \
+                        f"region {region}, outlines {showOutlines}, differs in {diffBox}"
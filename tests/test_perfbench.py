@@ -0,0 +1,23 @@
+# Copyright Mark Edel  All rights reserved
+# Smoke test for perfbench.py: the benchmarks are not run routinely, so make sure that
+# they all still import and run (on tiny inputs), so they're usable when needed.
+import perfbench
+
+# Arguments to make each benchmark run on a tiny input (every benchmark must be listed)
+TINY_ARGS = {
+    'traverse': dict(reps=1),
+    'scroll': dict(stmtCount=60),
+    'glyphs': dict(tokenCount=10),
+    'bands': dict(stmtCount=60, reps=1),
+    'open': dict(stmtCount=60),
+    'listlayout': dict(elemCount=20, reps=1),
+}
+
+def test_allBenchmarksListed():
+    assert set(TINY_ARGS) == set(perfbench.benchmarks)
+
+def test_benchmarksRun(window, capsys):
+    for name, benchmark in perfbench.benchmarks.items():
+        benchmark(window, **TINY_ARGS[name])
+        output = capsys.readouterr().out
+        assert name.replace('listlayout', 'list layout') in output
@@ -0,0 +1,40 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that blit scrolling (python_g.BLIT_SCROLLING), which shifts the window image and
+# redraws only the exposed strips, produces the same image as redrawing the whole
+# window at the new scroll origin.
+from PIL import ImageChops
+import python_g
+import testutil
+
+# Scroll distances (dx, dy) to apply in turn: down, up, right, left, diagonally, and by
+# more than the window height (which falls back to a full redraw) in each direction
+SCROLL_STEPS = [(0, 37), (0, 150), (0, -61), (45, 0), (-23, 0), (17, 29), (-17, -29),
+    (0, 2000), (0, -1500)]
+
+def fullRedrawImage(window):
+    window.redraw()
+    return window.image.copy()
+
+def test_blitScrollMatchesRedraw(window, monkeypatch):
+    monkeypatch.setattr(python_g, 'BLIT_SCROLLING', True)
+    # Statements of varying width and height, including a few wider than the window
+    lines = []
+    for i in range(200):
+        if i % 20 == 7:
+            lines.append(f"a{i} = [" + ", ".join(f"item{j}" for j in range(60)) + "]")
+        elif i % 5 == 0:
+            lines.append(f"def f{i}(x, y={i}):\n    return x * y  # comment {i}")
+        else:
+            lines.append(f"a{i} = b[{i}] + f(c, d={i}) * 'x'")
+    testutil.loadText(window, "\n".join(lines))
+    window.scrollOrigin = 0, 0
+    window.refresh(redraw=True)
+    for dx, dy in SCROLL_STEPS:
+        oldScrollOrigin = window.scrollOrigin
+        x, y = oldScrollOrigin
+        window.scrollOrigin = x + dx, y + dy
+        window.refreshScrolled(oldScrollOrigin)
+        scrolledImage = window.image.copy()
+        diffBox = ImageChops.difference(scrolledImage.convert('RGB'),
+            fullRedrawImage(window).convert('RGB')).getbbox()
+        assert diffBox is None, f"scroll by {(dx, dy)} differs in {diffBox}"
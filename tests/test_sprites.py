@@ -0,0 +1,61 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that icons drawn from flattened drawList sprites (icon.FLATTEN_DRAW_LISTS) look
+# exactly the same as icons drawn part by part, and that sprites are remade when their
+# icons' drawLists change.
+from PIL import Image, ImageChops
+import icon
+import testutil
+from test_memoize import SAMPLE_TEXT
+
+def redrawImage(window, monkeypatch, flatten, showOutlines=False):
+    monkeypatch.setattr(icon, 'FLATTEN_DRAW_LISTS', flatten)
+    window.image.paste((255, 0, 255), (0, 0, *window.image.size))
+    window.redraw(showOutlines=showOutlines)
+    return window.image.copy().convert('RGB')
+
+def assertSpritesMatchParts(window, monkeypatch):
+    for showOutlines in (False, True):
+        partsImage = redrawImage(window, monkeypatch, False, showOutlines)
+        spriteImage = redrawImage(window, monkeypatch, True, showOutlines)
+        diffBox = ImageChops.difference(partsImage, spriteImage).getbbox()
+        assert diffBox is None, f"outlines {showOutlines}, differs in {diffBox}"
+
+def test_spritesMatchParts(window, monkeypatch):
+    stmts = testutil.loadText(window, SAMPLE_TEXT)
+    for stmt in stmts[1::4]:
+        window.select(stmt)
+    assertSpritesMatchParts(window, monkeypatch)
+    assert icon.spriteMemoryUsage()[0] > 0
+
+def test_spriteRemadeOnChange(window, monkeypatch):
+    stmts = testutil.loadText(window, "a = f(b, c, d, e)\nx = [1, 2, 3]")
+    redrawImage(window, monkeypatch, True)
+    callIcon = stmts[0].childAt('values_0').childAt('attrIcon')
+    sprite = callIcon._sprite
+    assert sprite is not None
+    # Replacing the drawList (directly or with +=) discards the sprite
+    callIcon.drawList += []
+    assert callIcon._sprite is None
+    redrawImage(window, monkeypatch, True)
+    assert callIcon._sprite is not None and callIcon._sprite is not sprite
+    # Removing arguments changes the number of commas in the call's drawList
+    window.removeIcons([callIcon.childAt('argIcons_2'), callIcon.childAt('argIcons_3')])
+    window.layoutDirtyIcons()
+    assertSpritesMatchParts(window, monkeypatch)
+
+def test_outlinesDrawnPerPart(window, monkeypatch):
+    # Parts that overlap with partial transparency, for which a single outline around
+    # the whole sprite would differ from the outlines drawn behind each part
+    ic = testutil.parseText(window, "a")[0]
+    parts = [((0, 0), Image.new('RGBA', (20, 12), color=(200, 0, 0, 255))),
+        ((15, 4), Image.new('RGBA', (20, 12), color=(0, 0, 200, 100))),
+        ((30, 2), Image.new('RGBA', (10, 12), color=(0, 150, 0, 180)))]
+    for style in (icon.STYLE_OUTLINE, icon.STYLE_OUTLINE | icon.STYLE_SELECTED):
+        images = []
+        for flatten in (False, True):
+            monkeypatch.setattr(icon, 'FLATTEN_DRAW_LISTS', flatten)
+            ic.drawList = list(parts)
+            image = Image.new('RGB', (50, 20), color=(255, 255, 255))
+            ic._drawFromDrawList(image, (2, 3), None, style)
+            images.append(image)
+        assert ImageChops.difference(*images).getbbox() is None, f"style {style}"
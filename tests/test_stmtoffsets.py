@@ -0,0 +1,72 @@
+# Copyright Mark Edel  All rights reserved
+# Tests of unapplied statement offsets (see python_g.Page): layout records the move of
+# the statements below an edit on a page rather than moving their icons, but once layout
+# is done, the icons of every laid-out page must have up-to-date rectangles, since much
+# of the editor (the cursor, the selection, text editing, undo, and dragging) reads them
+# directly.
+import filefmt
+import testutil
+
+def loadAndEditFirstStmtOfPage(window):
+    """Load a file long enough to be split in to several pages, and make the first
+    statement of the second page taller (by replacing an argument with a long, wrapping
+    list), leaving it marked for layout.  Returns the statements of the edited page, in order, and the
+    hierarchical rectangle of the edited statement before the edit."""
+    testutil.loadText(window, "\n".join(f"a{i} = f{i}(x, {i})" for i in range(250)))
+    modSeqPage = window.topIcons[window.modSeqIcon]
+    page = modSeqPage.nextPage
+    assert page is not None
+    stmts = list(page.traverseSeq())
+    assert len(stmts) > 10
+    editedStmt = stmts[0]
+    origRect = editedStmt.hierRect()
+    argIcon = next(ic for ic in editedStmt.traverse()
+        if getattr(ic, 'name', None) == 'x')
+    listText = "[" + ", ".join(f"element{j}" for j in range(80)) + "]"
+    listIcon = filefmt.parseTextToIcons(listText, window, source="Test text",
+        forImport=True)[0][0]
+    parent = argIcon.parent()
+    parent.replaceChild(listIcon, parent.siteOf(argIcon))
+    listIcon.markLayoutDirty()
+    return stmts, origRect
+
+def assertStmtsInPlace(window, stmts):
+    """Check that the (raw) icon rectangles of stmts are where they are after all
+    page and statement offsets are applied, and that the statements are stacked
+    without overlapping."""
+    rawRects = [[ic.rect for ic in stmt.traverse(inclStmtComment=True)]
+        for stmt in stmts]
+    window.topIcons[stmts[0]].applyOffset()
+    assert rawRects == [[ic.rect for ic in stmt.traverse(inclStmtComment=True)]
+        for stmt in stmts]
+    for stmt, nextStmt in zip(stmts, stmts[1:]):
+        assert stmt.hierRect()[3] <= nextStmt.hierRect()[1] + 1
+
+def test_cursorStmtMovedByEdit(window):
+    stmts, origRect = loadAndEditFirstStmtOfPage(window)
+    cursorStmt = stmts[5]
+    window.cursor.setToIconSite(cursorStmt, 'seqOut')
+    window.layoutDirtyIcons()
+    assert stmts[0].hierRect()[3] > origRect[3]
+    cursorX, cursorY = cursorStmt.posOfSite('seqOut')
+    assertStmtsInPlace(window, stmts)
+    assert cursorStmt.posOfSite('seqOut') == (cursorX, cursorY)
+
+def test_selectionMovedByEdit(window):
+    stmts, origRect = loadAndEditFirstStmtOfPage(window)
+    selectedStmt = stmts[-1]
+    for ic in selectedStmt.traverse():
+        window.select(ic)
+    window.layoutDirtyIcons()
+    assert stmts[0].hierRect()[3] > origRect[3]
+    assertStmtsInPlace(window, stmts)
+
+def test_stmtsMovedByEdit(window):
+    # With neither the cursor nor the selection on the page, every statement on it must
+    # still be in place, and none left with an unapplied offset
+    stmts, origRect = loadAndEditFirstStmtOfPage(window)
+    window.cursor.setToWindowPos((0, 0))
+    window.layoutDirtyIcons()
+    assert stmts[0].hierRect()[3] > origRect[3]
+    assert window.topIcons[stmts[0]].stmtOffsets == {}
+    assertStmtsInPlace(window, stmts)
@@ -0,0 +1,61 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that mapping a pixel offset to a character offset in text (comn.findTextOffset,
+# by binary search over comn.PrefixWidths) finds the nearest character boundary, and in
+# particular, lands exactly on each boundary when given its pixel position.
+import pytest
+import comn
+import icon
+
+TEXTS = ["x", "ab", "name_y", "print_j(a_g)", "AVATAR WAVE Type", "iiiiWWWWiiii",
+    "    indented", "# A comment long enough to take quite a few steps to search"]
+
+FONTS = {'global': icon.globalFont, 'bold': icon.boldFont, 'text': icon.textFont}
+
+class CountingFont:
+    """Wrapper for a font that counts calls to getsize"""
+    def __init__(self, font):
+        self.font = font
+        self.calls = 0
+
+    def getsize(self, text):
+        self.calls += 1
+        return self.font.getsize(text)
+
+def nearestOffsetBruteForce(edges, pixelOffset):
+    """Reference version of findTextOffset, given the pixel position of every character
+    boundary (edges).  On a tie, the earlier offset wins."""
+    return min(range(len(edges)), key=lambda i: (abs(edges[i] - pixelOffset), i))
+
+@pytest.mark.parametrize('fontName', FONTS)
+def test_characterEdges(fontName):
+    font = FONTS[fontName]
+    comn.prefixWidthCache.clear()
+    for text in TEXTS:
+        edges = [font.getsize(text[:i])[0] for i in range(len(text) + 1)]
+        for i, edge in enumerate(edges):
+            assert comn.textPrefixWidth(font, text, i) == edge
+            assert comn.findTextOffset(font, text, edge) == i
+        # Every pixel across (and beyond) the text, including those one to either side
+        # of each edge and at the midpoints between them
+        for pixelOffset in range(-3, edges[-1] + 4):
+            assert comn.findTextOffset(font, text, pixelOffset) == \
+                nearestOffsetBruteForce(edges, pixelOffset), (text, pixelOffset)
+
+def test_emptyText():
+    assert comn.findTextOffset(icon.globalFont, "", 0) == 0
+    assert comn.findTextOffset(icon.globalFont, "", 25) == 0
+
+def test_measurementsReused():
+    comn.prefixWidthCache.clear()
+    font = CountingFont(icon.textFont)
+    text = TEXTS[-1]
+    comn.findTextOffset(font, text, 100)
+    # A binary search measures about log2(n) prefixes (plus the whole text)
+    assert font.calls <= len(text).bit_length() + 2
+    callsForFirstSearch = font.calls
+    comn.findTextOffset(font, text, 100)
+    comn.textPrefixWidth(font, text, comn.findTextOffset(font, text, 100))
+    assert font.calls == callsForFirstSearch
+    # A change to the text starts over
+    comn.findTextOffset(font, text + "!", 100)
+    assert font.calls > callsForFirstSearch
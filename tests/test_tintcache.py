@@ -0,0 +1,55 @@
+# Copyright Mark Edel  All rights reserved
+# Tests that tintSelectedImage returns cached images that match freshly tinted ones, and
+# that tintCache stays within its memory budget without its id-based keys ever matching
+# the wrong image.
+from PIL import Image, ImageChops
+import comn
+import icon
+
+STYLES = [icon.STYLE_SELECTED, icon.STYLE_OUTLINE, icon.STYLE_SELECTED | icon.STYLE_OUTLINE,
+    icon.STYLE_PENDING_REMOVE, icon.STYLE_SYNTAX_ERR | icon.STYLE_OUTLINE]
+
+def useFreshCache(monkeypatch, maxBytes):
+    cache = comn.LRUCache(maxBytes=maxBytes, sizeOf=icon.tintCache.sizeOf)
+    monkeypatch.setattr(icon, 'tintCache', cache)
+    return cache
+
+def assertIdentical(img1, img2):
+    assert img1.size == img2.size
+    assert ImageChops.difference(img1, img2).getbbox() is None
+
+def test_cachedTint(monkeypatch):
+    cache = useFreshCache(monkeypatch, icon.TINT_CACHE_BUDGET)
+    image = icon.iconBoxedText("tinted", icon.globalFont, icon.BLACK)
+    for style in STYLES:
+        tinted = icon.tintSelectedImage(image, style)
+        assert tinted is not image
+        assert icon.tintSelectedImage(image, style) is tinted
+        # The cached image must match one tinted from scratch
+        cache.clear()
+        assertIdentical(icon.tintSelectedImage(image, style), tinted)
+    assert cache.hits == len(STYLES)
+    # Drawing in plain style neither tints nor caches
+    assert icon.tintSelectedImage(image, 0) is image
+    # Entries are charged for both the source and the tinted image
+    cache.clear()
+    icon.tintSelectedImage(image, icon.STYLE_SELECTED)
+    assert cache.byteCount == 2 * image.width * image.height * 4
+
+def test_evictionKeepsIdsValid(monkeypatch):
+    # With a budget of just a few entries, tint a long run of short-lived images of
+    # differing colors (whose ids Python is free to reuse once they are freed), and check
+    # that every result is the tinted version of its own source image
+    imageBytes = 40 * 20 * 4
+    cache = useFreshCache(monkeypatch, 3 * 2 * imageBytes)
+    for i in range(200):
+        image = Image.new('RGBA', (40, 20), color=(i, 255 - i, i // 2, 255))
+        tinted = icon.tintSelectedImage(image, icon.STYLE_SELECTED)
+        expected = Image.blend(image, Image.new('RGBA', image.size,
+            color=icon.SELECT_TINT[:3] + (255,)), icon.SELECT_TINT[3] / 255.0)
+        assertIdentical(tinted, expected)
+        assert cache.byteCount <= cache.maxBytes
+        del image, tinted
+    assert len(cache.entries) == 3
+    assert cache.evictions == 200 - 3
+    assert cache.hits == 0
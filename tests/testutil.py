@@ -0,0 +1,53 @@
+# Copyright Mark Edel  All rights reserved
+# Helper functions for the python-g tests (see conftest.py for the window fixture)
+import filefmt
+import icon
+
+def loadText(window, text):
+    """Parse Python source text in to icons, add them to the window's module sequence
+    (as Window.openFile does), and lay them out.  Returns the list of statements of the
+    module sequence."""
+    seqs = filefmt.parseTextToIcons(text, window, source="Test text", forImport=True,
+        asModule=True)
+    for seq in seqs:
+        window.addTop(seq)
+    window.layoutDirtyIcons(filterRedundantParens=False)
+    return moduleStatements(window)
+
+def parseText(window, text):
+    """Parse Python source text in to icons (not added to the window), and return the
+    list of top-level icons of the first sequence."""
+    return filefmt.parseTextToIcons(text, window, source="Test text",
+        forImport=True)[0]
+
+def moduleStatements(window):
+    """Return the top-level icons of the window's module sequence, in sequence order"""
+    firstStmt = window.modSeqIcon.sites.seqOut.att
+    return [] if firstStmt is None else list(icon.traverseSeq(firstStmt))
+
+def iconRects(window):
+    """Return the rectangles of all of the icons (and statement comments) in the
+    window's module sequence, in sequence and drawing order, after applying any
+    unapplied page and statement offsets, so that they reflect the current layout."""
+    for page in window.topIcons[window.modSeqIcon].traversePages():
+        page.applyOffset()
+    return [ic.rect for stmt in moduleStatements(window)
+        for ic in stmt.traverse(inclStmtComment=True)]
+
+def clearWindow(window):
+    """Remove all of the icons from window, clear the selection and put the cursor on
+    the window background, cancel any pending background layout, lay out what remains,
+    and return it to the top-left of its content."""
+    window.clearSelection()
+    window.cursor.setToWindowPos((0, 0))
+    stmts = [ic for ic in window.topIcons if ic is not window.modSeqIcon]
+    if len(stmts) > 0:
+        window.removeIcons([ic for stmt in stmts
+            for ic in stmt.traverse(inclStmtComment=True)])
+    window.listLayoutsToRefine.clear()
+    if window.pendingBackgroundLayout is not None:
+        window.top.after_cancel(window.pendingBackgroundLayout)
+        window.pendingBackgroundLayout = None
+    window.layoutDirtyIcons(filterRedundantParens=False)
+    window.scrollOrigin = 0, 0
+    window.refreshRequests.clear()